@@ -19,6 +19,10 @@ setuptools.setup(
     url="https://github.com/ysenarath/textflow",
     packages=setuptools.find_packages(),
     install_requires=requirements,
+    extras_require={
+        # columnar (parquet, arrow) exports
+        'parquet': ['pyarrow'],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
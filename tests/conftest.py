@@ -0,0 +1,20 @@
+""" Shared Test Fixtures """
+import pytest
+
+from testing import create_context
+
+
+@pytest.fixture
+def ctx():
+    """ Fresh in-memory database """
+    ctx = create_context()
+    yield ctx
+    ctx.engine.dispose()
+
+
+@pytest.fixture
+def session(ctx):
+    """ Session of the fresh database """
+    session = ctx.Session()
+    yield session
+    session.close()
@@ -0,0 +1,74 @@
+import unittest
+
+import sqlalchemy as sa
+
+from textflow import schemas
+from textflow.database import op
+from textflow.models import Annotation, AnnotationSet, AnnotationSpan, \
+    Label, Task
+
+from testing import DatabaseTestCase
+
+
+class AnnotationSetTreeTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        op.create_project(self.session, project=schemas.Project(name='P'))
+        for username in ('alice', 'bob'):
+            op.create_user(self.session, user=schemas.User(
+                username=username, password=username,
+            ))
+        for _ in op.create_documents(self.session, project_id=1, documents=[
+            {'text': 'Paris and Rome ' * 20},
+        ]):
+            pass
+        task = Task(project_id=1, type='sequence-labeling')
+        task.labels = [Label(value=value, label=value, order=i)
+                       for i, value in enumerate(['LOC', 'CITY'])]
+        self.session.add(task)
+        for user_id, num_annotations in [(1, 20), (2, 3)]:
+            annotation_set = AnnotationSet(document_id=1, user_id=user_id)
+            annotation_set.annotations = [
+                Annotation(span=AnnotationSpan(start=15 * i, length=5),
+                           labels=task.labels)
+                for i in range(num_annotations)
+            ]
+            self.session.add(annotation_set)
+        self.session.commit()
+        self.session.expunge_all()
+        self.statements = []
+        sa.event.listen(self.ctx.engine, 'before_cursor_execute',
+                        self.count_statement)
+
+    def tearDown(self):
+        sa.event.remove(self.ctx.engine, 'before_cursor_execute',
+                        self.count_statement)
+        super().tearDown()
+
+    def count_statement(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_get_annotation_set_tree(self):
+        tree = op.get_annotation_set_tree(self.session, annotation_set_id=1)
+        self.assertEqual(len(self.statements), 3)
+        self.assertIsInstance(tree, schemas.AnnotationSetTree)
+        self.assertEqual(len(tree.annotations), 20)
+        annotation = tree.annotations[1]
+        self.assertEqual((annotation.span.start, annotation.span.length),
+                         (15, 5))
+        self.assertEqual(sorted(label.value for label in annotation.labels),
+                         ['CITY', 'LOC'])
+        self.assertIsNone(op.get_annotation_set_tree(self.session,
+                                                     annotation_set_id=9))
+
+    def test_list_annotation_set_trees(self):
+        trees = op.list_annotation_set_trees(self.session, document_id=1)
+        self.assertEqual(len(self.statements), 3)
+        self.assertEqual([len(tree.annotations) for tree in trees], [20, 3])
+        trees = op.list_annotation_set_trees(self.session, document_id=1,
+                                             user_id=2)
+        self.assertEqual([tree.user_id for tree in trees], [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
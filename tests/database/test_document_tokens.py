@@ -0,0 +1,80 @@
+from textflow import schemas
+from textflow.database import op
+from textflow.models import Document, DocumentTokens
+from textflow.utils.text import TokenCache, Tokenizer, WhitespaceTokenizer
+
+from testing import DatabaseTestCase
+
+
+class DocumentTokensTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project = op.create_project(
+            self.session, project=schemas.Project(name='Project')
+        )
+        self.project_id = project.id
+        for _ in op.create_documents(
+            self.session, project_id=self.project_id,
+            documents=[{'text': f'text {i}, done.'} for i in range(25)],
+        ):
+            pass
+
+    def tokenize(self, **kwargs):
+        return list(op.create_document_tokens(
+            self.session, project_id=self.project_id, batch_size=10,
+            **kwargs
+        ))
+
+    def test_create_document_tokens_in_batches(self):
+        self.assertEqual(self.tokenize(), [(10, 10), (20, 20), (25, 25)])
+        stored = op.list_document_tokens(self.session,
+                                         document_ids=[1, 2, 99])
+        self.assertEqual(sorted(stored), [1, 2])
+        text = self.session.get(Document, 1).text
+        self.assertEqual(stored[1][1], Tokenizer.offsets(text))
+        self.assertEqual(self.session.get(DocumentTokens, 1).num_tokens, 5)
+
+    def test_only_outdated_documents_are_tokenized(self):
+        self.tokenize()
+        self.session.get(Document, 3).text = 'edited text'
+        self.session.commit()
+        self.assertEqual(self.tokenize()[-1], (1, 25))
+        stored = op.list_document_tokens(self.session, document_ids=[3])
+        self.assertEqual(stored[3][1].tokens('edited text'),
+                         ['edited', 'text'])
+        # another tokenizer replaces the offsets
+        self.assertEqual(self.tokenize(tokenizer='whitespace')[-1], (25, 25))
+        self.assertEqual(op.list_document_tokens(self.session,
+                                                 document_ids=[3]), {})
+        self.assertEqual(self.session.query(DocumentTokens).count(), 25)
+
+    def test_tokenize_in_worker_processes(self):
+        self.tokenize(tokenizer='whitespace', n_jobs=2)
+        stored = op.list_document_tokens(self.session,
+                                         document_ids=range(1, 26),
+                                         tokenizer='whitespace')
+        for document in self.session.query(Document):
+            self.assertEqual(stored[document.id][1],
+                             WhitespaceTokenizer.offsets(document.text))
+
+    def test_cache_loads_stored_offsets(self):
+        self.tokenize()
+        cache = TokenCache()
+        loaded = []
+
+        def load(ids):
+            loaded.extend(ids)
+            return op.list_document_tokens(self.session, document_ids=ids)
+
+        text = self.session.get(Document, 1).text
+        offsets = cache.get_many([(1, text), (2, 'not the stored text')],
+                                 load=load)
+        self.assertEqual(loaded, [1, 2])
+        self.assertEqual(offsets[0], Tokenizer.offsets(text))
+        self.assertEqual(offsets[1].tokens('not the stored text'),
+                         ['not', 'the', 'stored', 'text'])
+
+    def test_delete_documents_deletes_tokens(self):
+        self.tokenize()
+        op.delete_documents_by(self.session, project_id=self.project_id)
+        self.assertEqual(self.session.query(DocumentTokens).count(), 0)
@@ -0,0 +1,127 @@
+import io
+import unittest
+
+from textflow import schemas
+from textflow.database import op
+from textflow.models import Annotation, AnnotationLabel, AnnotationSet, \
+    AnnotationSpan, Document, DocumentTokens, Label, Suggestion, Task
+from textflow.utils import readers
+
+from testing import DatabaseTestCase
+
+
+class CreateDocumentsTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project = op.create_project(
+            self.session, project=schemas.Project(name='Project')
+        )
+        self.project_id = project.id
+
+    def test_create_documents_in_batches(self):
+        documents = [{'text': f'text {i}', 'source_id': i} for i in range(25)]
+        progress = list(op.create_documents(
+            self.session, project_id=self.project_id,
+            documents=documents, batch_size=10,
+        ))
+        self.assertEqual(progress, [(10, 25), (20, 25), (25, 25)])
+        self.assertEqual(self.session.query(Document).count(), 25)
+        doc = self.session.query(Document).filter_by(source_id='3').one()
+        self.assertEqual(doc.text, 'text 3')
+
+    def test_create_documents_from_csv(self):
+        fp = io.StringIO('text,source_id,meta\n'
+                         'hello,1,"{""lang"": ""en""}"\n'
+                         'world,2,\n')
+        for _ in op.create_documents(
+            self.session, project_id=self.project_id,
+            documents=readers.read_records(fp, 'csv'),
+        ):
+            pass
+        docs = self.session.query(Document).order_by(Document.id).all()
+        self.assertEqual([d.text for d in docs], ['hello', 'world'])
+        self.assertEqual(docs[0].meta, {'lang': 'en'})
+        self.assertIsNone(docs[1].meta)
+
+    def test_invalid_document_keeps_previous_batches(self):
+        fp = io.StringIO('{"text": "a"}\n{"text": "b"}\n{"source_id": 1}\n')
+        progress = op.create_documents(
+            self.session, project_id=self.project_id,
+            documents=readers.read_records(fp, 'jsonl'), batch_size=2,
+        )
+        with self.assertRaises(ValueError):
+            for _ in progress:
+                pass
+        self.assertEqual(self.session.query(Document).count(), 2)
+
+
+class DeleteDocumentsTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        user = op.create_user(self.session, user=schemas.User(
+            username='alice', password='alice',
+        ))
+        for name in ('Project', 'Other'):
+            project = op.create_project(
+                self.session, project=schemas.Project(name=name)
+            )
+            for _ in op.create_documents(
+                self.session, project_id=project.id,
+                documents=[{'text': f'text {i}'} for i in range(5)],
+            ):
+                pass
+            for _ in op.create_document_tokens(
+                self.session, project_id=project.id,
+            ):
+                pass
+            task = Task(project_id=project.id, type='sequence-labeling')
+            label = Label(value='LOC', label='LOC', order=0)
+            task.labels = [label]
+            self.session.add(task)
+            self.session.flush()
+            for document in project_documents(self.session, project.id):
+                annotation_set = AnnotationSet(
+                    document_id=document.id, user_id=user.id, completed=True,
+                )
+                annotation_set.annotations = [Annotation(
+                    span=AnnotationSpan(start=0, length=4), labels=[label],
+                )]
+                self.session.add_all([annotation_set, Suggestion(
+                    document_id=document.id, task_id=task.id,
+                    label_id=label.id, score=1.0, snapshot='s',
+                )])
+        self.session.commit()
+
+    def count(self):
+        return [self.session.query(Model).count() for Model in (
+            Document, DocumentTokens, Suggestion, AnnotationSet, Annotation,
+            AnnotationSpan, AnnotationLabel,
+        )]
+
+    def test_delete_documents_in_batches(self):
+        self.assertEqual(self.count(), [10] * 7)
+        progress = list(op.delete_documents(
+            self.session, project_id=1, batch_size=2,
+        ))
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+        # no orphaned rows, the other project is kept
+        self.assertEqual(self.count(), [5] * 7)
+        self.assertEqual(project_documents(self.session, 1), [])
+        self.assertEqual(len(project_documents(self.session, 2)), 5)
+        self.assertEqual(op.delete_documents_by(self.session, project_id=2),
+                         5)
+        self.assertEqual(self.count(), [0] * 7)
+
+    def test_delete_document_by(self):
+        op.delete_document_by(self.session, document_id=1)
+        self.assertEqual(self.count(), [9] * 7)
+        self.assertIsNone(op.delete_document_by(self.session,
+                                                document_id=1))
+
+
+def project_documents(session, project_id):
+    return session.query(Document).filter_by(project_id=project_id).all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from textflow.database.base import DatabaseContext
+from textflow.database.engine import get_engine_options
+
+
+class EngineOptionsTestCase(unittest.TestCase):
+    def test_backend_defaults(self):
+        options = get_engine_options('postgresql://u:p@localhost/textflow')
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertNotIn('connect_args', options)
+        options = get_engine_options('sqlite:///textflow.db')
+        self.assertEqual(options, {
+            'connect_args': {'check_same_thread': False},
+        })
+
+    def test_options_are_merged(self):
+        options = get_engine_options('sqlite:///textflow.db', {
+            'connect_args': {'timeout': 30},
+            'echo': True,
+        })
+        self.assertEqual(options['connect_args'], {
+            'check_same_thread': False, 'timeout': 30,
+        })
+        self.assertTrue(options['echo'])
+        options = get_engine_options('mysql+pymysql://u:p@localhost/db', {
+            'pool_size': 20,
+            'pool_recycle': None,
+        })
+        self.assertEqual(options['pool_size'], 20)
+        self.assertNotIn('pool_recycle', options)
+
+    def test_context_uses_options(self):
+        ctx = DatabaseContext({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'SQLALCHEMY_ENGINE_OPTIONS': {'query_cache_size': 100},
+        })
+        self.assertEqual(ctx.engine._compiled_cache.capacity, 100)
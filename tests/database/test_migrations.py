@@ -0,0 +1,101 @@
+from unittest import mock
+
+import sqlalchemy as sa
+
+from textflow import schemas
+from textflow.database import op
+from textflow.database.migrations import upgrade
+from textflow.models import mapper_registry, AnnotationSet, Document
+
+from testing import DatabaseTestCase
+
+
+class UpgradeTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        op.create_project(self.session, project=schemas.Project(name='P'))
+        op.create_document(self.session, doc=schemas.Document(
+            text='doc', project_id=1,
+        ))
+        self.session.add(AnnotationSet(document_id=1, user_id=1,
+                                       completed=True))
+        self.session.commit()
+        self.session.close()
+
+    def _indexes(self, table):
+        inspector = sa.inspect(self.ctx.engine)
+        return {i['name'] for i in inspector.get_indexes(table)}
+
+    def test_upgrade_is_noop_for_current_schema(self):
+        self.assertEqual(upgrade(self.ctx.engine, mapper_registry.metadata),
+                         [])
+
+    def test_upgrade_adds_missing_indexes_and_columns(self):
+        with self.ctx.engine.begin() as conn:
+            conn.execute(sa.text('DROP INDEX ix_annotation_set_document_id_'
+                                 'completed'))
+            conn.execute(sa.text('DROP INDEX ix_document_project_id_'
+                                 'num_completed_desc'))
+            conn.execute(sa.text('DROP INDEX ix_document_project_id_'
+                                 'num_completed_desc_priority'))
+            conn.execute(sa.text('ALTER TABLE document '
+                                 'DROP COLUMN num_completed'))
+        self.assertNotIn('ix_annotation_set_document_id_completed',
+                         self._indexes('annotation_set'))
+        applied = upgrade(self.ctx.engine, mapper_registry.metadata)
+        self.assertIn('add column document.num_completed', applied)
+        self.assertIn('ix_annotation_set_document_id_completed',
+                      self._indexes('annotation_set'))
+        self.assertIn('ix_document_project_id_num_completed_desc',
+                      self._indexes('document'))
+        self.assertIn('ix_document_project_id_num_completed_desc_priority',
+                      self._indexes('document'))
+        # derived counters are recomputed
+        with self.ctx.Session() as session:
+            self.assertEqual(session.get(Document, 1).num_completed, 1)
+
+    def test_upgrade_skips_counters_without_new_columns(self):
+        with self.ctx.engine.begin() as conn:
+            conn.execute(sa.text('DROP INDEX ix_annotation_set_document_id_'
+                                 'completed'))
+        refresh = 'textflow.database.migrations.refresh_document_counters'
+        with mock.patch(refresh) as refresh_document_counters, \
+                self.assertLogs('textflow.database.migrations') as logs:
+            applied = upgrade(self.ctx.engine, mapper_registry.metadata)
+        self.assertEqual(applied,
+                         ['create index ix_annotation_set_document_id_'
+                          'completed'])
+        self.assertEqual(len(logs.records), 1)
+        refresh_document_counters.assert_not_called()
+
+    def _replace_unique_index(self):
+        # the schema before the (user_id, document_id) index was unique
+        with self.ctx.engine.begin() as conn:
+            conn.execute(sa.text('DROP INDEX uq_annotation_set_user_id_'
+                                 'document_id'))
+            conn.execute(sa.text('CREATE INDEX ix_annotation_set_user_id_'
+                                 'document_id ON annotation_set '
+                                 '(user_id, document_id)'))
+
+    def test_upgrade_replaces_superseded_index(self):
+        self._replace_unique_index()
+        applied = upgrade(self.ctx.engine, mapper_registry.metadata)
+        self.assertEqual(applied, [
+            'create index uq_annotation_set_user_id_document_id',
+            'drop index ix_annotation_set_user_id_document_id',
+        ])
+        indexes = self._indexes('annotation_set')
+        self.assertIn('uq_annotation_set_user_id_document_id', indexes)
+        self.assertNotIn('ix_annotation_set_user_id_document_id', indexes)
+
+    def test_upgrade_reports_duplicates(self):
+        self._replace_unique_index()
+        with self.ctx.engine.begin() as conn:
+            conn.execute(sa.insert(AnnotationSet.__table__).values(
+                document_id=1, user_id=1, completed=False,
+            ))
+        with self.assertRaisesRegex(ValueError, r'\(1, 1\) x2'):
+            upgrade(self.ctx.engine, mapper_registry.metadata)
+        # nothing is applied
+        self.assertIn('ix_annotation_set_user_id_document_id',
+                      self._indexes('annotation_set'))
@@ -0,0 +1,105 @@
+import unittest
+
+import sqlalchemy as sa
+
+from textflow import schemas
+from textflow.database import op
+from textflow.models import AnnotationSet, Document
+
+from testing import DatabaseTestCase
+
+
+class NextDocumentTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project = op.create_project(
+            self.session, project=schemas.Project(name='P', redundancy=2)
+        )
+        self.project_id = project.id
+        self.user_ids = []
+        for username in ('alice', 'bob', 'carol'):
+            user = op.create_user(self.session, user=schemas.User(
+                username=username, password=username,
+            ))
+            op.create_assignment(self.session, assignment=schemas.Assignment(
+                user_id=user.id, project_id=self.project_id,
+            ))
+            self.user_ids.append(user.id)
+        for _ in op.create_documents(
+            self.session, project_id=self.project_id,
+            documents=[{'text': f'doc {i}'} for i in range(3)],
+        ):
+            pass
+
+    def _counters(self, document_id):
+        doc = self.session.get(Document, document_id)
+        self.session.refresh(doc)
+        return doc.num_completed, doc.num_in_progress
+
+    def _annotate(self, user_id, document_id, **kwargs):
+        annotation_set = op.create_annotation_set(
+            self.session, annotation_set=schemas.AnnotationSet(
+                user_id=user_id, document_id=document_id,
+            ))
+        if kwargs:
+            annotation_set = annotation_set.copy(update=kwargs)
+            op.update_annotation_set(
+                self.session, annotation_set=annotation_set)
+        return annotation_set
+
+    def test_counters_follow_annotation_sets(self):
+        alice, bob, carol = self.user_ids
+        doc = op.get_next_document(
+            self.session, user_id=alice, project_id=self.project_id)
+        annotation_set = self._annotate(alice, doc.id)
+        self.assertEqual(self._counters(doc.id), (0, 1))
+        annotation_set = annotation_set.copy(update={'completed': True})
+        op.update_annotation_set(self.session, annotation_set=annotation_set)
+        self.assertEqual(self._counters(doc.id), (1, 0))
+        self._annotate(bob, doc.id, skipped=True)
+        self.assertEqual(self._counters(doc.id), (1, 0))
+        obj = self.session.get(AnnotationSet, annotation_set.id)
+        self.session.delete(obj)
+        self.session.commit()
+        self.assertEqual(self._counters(doc.id), (0, 0))
+
+    def test_next_document_respects_redundancy(self):
+        alice, bob, carol = self.user_ids
+        first = op.get_next_document(
+            self.session, user_id=alice, project_id=self.project_id)
+        self._annotate(alice, first.id, completed=True)
+        # documents closest to the redundancy are handed out first
+        doc = op.get_next_document(
+            self.session, user_id=bob, project_id=self.project_id)
+        self.assertEqual(doc.id, first.id)
+        self._annotate(bob, doc.id, completed=True)
+        # the document reached the redundancy of the project
+        doc = op.get_next_document(
+            self.session, user_id=carol, project_id=self.project_id)
+        self.assertNotEqual(doc.id, first.id)
+        # the user does not get the documents that they completed
+        doc = op.get_next_document(
+            self.session, user_id=alice, project_id=self.project_id)
+        self.assertNotEqual(doc.id, first.id)
+
+    def test_refresh_document_counters(self):
+        alice, bob, _ = self.user_ids
+        self._annotate(alice, 1, completed=True)
+        self._annotate(bob, 1)
+        self.session.query(Document).update({
+            'num_completed': 0, 'num_in_progress': 0,
+        })
+        self.session.commit()
+        op.refresh_document_counters(
+            self.session, project_id=self.project_id)
+        self.assertEqual(self._counters(1), (1, 1))
+
+    def test_one_annotation_set_per_user_and_document(self):
+        alice = self.user_ids[0]
+        self._annotate(alice, 1)
+        with self.assertRaises(sa.exc.IntegrityError):
+            self._annotate(alice, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from textflow import schemas
+from textflow.database import PaginationArgs, op
+from textflow.models import Document
+
+from testing import DatabaseTestCase
+
+
+class KeysetPaginationTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project = op.create_project(
+            self.session, project=schemas.Project(name='Project')
+        )
+        self.project_id = project.id
+        for i in range(25):
+            op.create_document(self.session, doc=schemas.Document(
+                text=f'document {i}', source_id=f'{i % 7}',
+                project_id=self.project_id,
+            ))
+
+    def _collect(self, **kwargs):
+        ids, after = [], None
+        while True:
+            page = op.list_documents_by(
+                self.session, project_id=self.project_id,
+                page=PaginationArgs(per_page=10, keyset=True, after=after,
+                                    **kwargs),
+            )
+            ids.extend(doc.id for doc in page.items)
+            if not page.has_next:
+                return ids, page
+            after = page.next_after
+
+    def test_keyset_matches_offset(self):
+        offset_ids = []
+        for i in range(1, 4):
+            page = op.list_documents_by(
+                self.session, project_id=self.project_id,
+                page=PaginationArgs(page=i, per_page=10),
+            )
+            offset_ids.extend(doc.id for doc in page.items)
+        keyset_ids, last = self._collect()
+        self.assertEqual(offset_ids, keyset_ids)
+        self.assertEqual(len(keyset_ids), 25)
+        self.assertEqual(last.total, 25)
+        self.assertIsNone(last.next_after)
+
+    def test_keyset_sort_column(self):
+        ids, _ = self._collect(sort='source_id', order='desc')
+        docs = [op.get_document(self.session, document_id=i) for i in ids]
+        keys = [(d.source_id, d.id) for d in docs]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_keyset_sort_nullable_column(self):
+        """ Rows with NULL sort values are neither dropped nor repeated """
+        self.session.query(Document) \
+            .filter(Document.id % 3 == 0) \
+            .update({'source_id': None}, synchronize_session=False)
+        self.session.commit()
+        for order in ('asc', 'desc'):
+            offset_ids = []
+            for i in range(1, 4):
+                page = op.list_documents_by(
+                    self.session, project_id=self.project_id,
+                    page=PaginationArgs(page=i, per_page=10,
+                                        sort='source_id', order=order),
+                )
+                offset_ids.extend(doc.id for doc in page.items)
+            keyset_ids, _ = self._collect(sort='source_id', order=order)
+            self.assertEqual(keyset_ids, offset_ids)
+            self.assertEqual(len(set(keyset_ids)), 25)
+
+    def test_without_total(self):
+        page = op.list_documents_by(
+            self.session, project_id=self.project_id,
+            page=PaginationArgs(page=3, per_page=10, with_total=False),
+        )
+        self.assertIsNone(page.total)
+        self.assertEqual(len(page.items), 5)
+        self.assertFalse(page.has_next)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            op.list_documents_by(
+                self.session, project_id=self.project_id,
+                page=PaginationArgs(after='not-a-cursor'),
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+import sqlalchemy as sa
+
+from textflow import schemas
+from textflow.database import op
+from textflow.database.base import DatabaseContext
+from textflow.models import Project
+
+from testing import create_context
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.primary_uri = self._create('primary')
+        self.replica_uri = self._create('replica')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _create(self, name):
+        uri = f'sqlite:///{os.path.join(self.tmpdir.name, name)}.db'
+        ctx = create_context({'SQLALCHEMY_DATABASE_URI': uri})
+        with ctx.Session() as session:
+            op.create_project(session, project=schemas.Project(name=name))
+        ctx.engine.dispose()
+        return uri
+
+    def _context(self, *replica_uris):
+        return DatabaseContext({
+            'SQLALCHEMY_DATABASE_URI': self.primary_uri,
+            'SQLALCHEMY_REPLICA_URIS': list(replica_uris),
+        })
+
+    def _project_names(self, session):
+        return [project.name for project in op.list_projects(session)]
+
+    def test_readonly_operations_use_replica(self):
+        ctx = self._context(self.replica_uri)
+        with ctx.Session() as session:
+            self.assertEqual(self._project_names(session), ['replica'])
+            # other operations use the primary
+            self.assertEqual(op.get_project(session, project_id=1).name,
+                             'primary')
+
+    def test_read_your_writes(self):
+        ctx = self._context(self.replica_uri)
+        with ctx.Session() as session:
+            op.create_project(session, project=schemas.Project(name='new'))
+            self.assertEqual(self._project_names(session),
+                             ['primary', 'new'])
+
+    def test_flush_state(self):
+        ctx = self._context(self.replica_uri)
+        flushing = []
+        with ctx.Session() as session:
+            sa.event.listen(session, 'before_flush',
+                            lambda s, *args: flushing.append(s.flushing))
+            session.add(Project(name='new'))
+            session.flush()
+            self.assertEqual(flushing, [True])
+            self.assertFalse(session.flushing)
+
+    def test_fallback_to_primary(self):
+        missing = os.path.join(self.tmpdir.name, 'missing', 'replica.db')
+        ctx = self._context(f'sqlite:///{missing}')
+        with ctx.Session() as session:
+            self.assertEqual(self._project_names(session), ['primary'])
+        self.assertIsNone(ctx.replicas.choose())
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import threading
+
+import sqlalchemy as sa
+
+from textflow.database import sqlite
+from textflow.models import Project
+
+from testing import DatabaseTestCase
+
+
+class SQLiteProfileTestCase(DatabaseTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmpdir.cleanup()
+
+    def get_config(self):
+        path = os.path.join(self.tmpdir.name, 'textflow.db')
+        return {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'SQLALCHEMY_SQLITE_PROFILE': 'production',
+        }
+
+    def test_pragmas(self):
+        with self.ctx.engine.connect() as conn:
+            self.assertEqual(
+                conn.execute(sa.text('PRAGMA journal_mode')).scalar(), 'wal')
+            # NORMAL
+            self.assertEqual(
+                conn.execute(sa.text('PRAGMA synchronous')).scalar(), 1)
+
+    def test_writer_lock(self):
+        lock = sqlite._writer_locks[self.ctx.engine]
+        with self.ctx.Session() as session:
+            session.add(Project(name='P'))
+            session.flush()
+            # held until the transaction ends
+            self.assertTrue(lock.locked())
+            session.commit()
+            self.assertFalse(lock.locked())
+            session.add(Project(name='Q'))
+            session.flush()
+            self.assertTrue(lock.locked())
+        self.assertFalse(lock.locked())
+
+    def test_writer_lock_is_reentrant(self):
+        lock = sqlite._writer_locks[self.ctx.engine]
+        acquired = []
+
+        def acquire():
+            acquired.append(lock.acquire(timeout=0.01))
+
+        with self.ctx.Session() as session:
+            session.add(Project(name='P'))
+            session.flush()
+            # another session of the writing thread does not wait
+            with self.ctx.Session() as other, other.begin():
+                sqlite._acquire_writer_lock(other)
+                self.assertIn(sqlite._INFO_KEY, other.info)
+            self.assertTrue(lock.locked())
+            # other threads do
+            thread = threading.Thread(target=acquire)
+            thread.start()
+            thread.join()
+            self.assertEqual(acquired, [False])
+        self.assertFalse(lock.locked())
+
+    def test_invalid_profile(self):
+        with self.assertRaises(ValueError):
+            sqlite.configure(self.ctx.engine, 'fast')
@@ -1,3 +1,4 @@
+import math
 import unittest
 
 from textflow.metrics.agreement import AgreementScore
@@ -112,5 +113,35 @@ class KappaAgreementTestCase(unittest.TestCase):
         self.assertEqual(0, scores.shape[0])
 
 
+class FleissAgreementTestCase(unittest.TestCase):
+    def test_agreement(self):
+        scorer = AgreementScore(MULTI_CLASS_EXAMPLE)
+        scores = scorer.fleiss()
+        # equals Scott's pi for two raters
+        self.assertAlmostEqual(0.341, scores.iloc[0]['Agreement'], places=3)
+
+    def test_undefined_agreement(self):
+        scorer = AgreementScore(MULTI_LABEL_MINI_EXAMPLE)
+        scores = scorer.fleiss().set_index('Label')
+        self.assertTrue(math.isnan(scores.loc['high', 'Agreement']))
+
+    def test_one_annotation_agreement(self):
+        scorer = AgreementScore(TWO_ANNOTATOR_LIST)
+        scores = scorer.fleiss()
+        self.assertEqual(0, scores.shape[0])
+
+
+class AlphaAgreementTestCase(unittest.TestCase):
+    def test_agreement(self):
+        scorer = AgreementScore(MULTI_CLASS_EXAMPLE)
+        scores = scorer.alpha()
+        self.assertAlmostEqual(0.374, scores.iloc[0]['Agreement'], places=3)
+
+    def test_empty_list_agreement(self):
+        scorer = AgreementScore(EMPTY_LIST)
+        scores = scorer.alpha()
+        self.assertEqual(0, scores.shape[0])
+
+
 if __name__ == '__main__':
     unittest.main()
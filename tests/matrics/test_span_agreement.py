@@ -0,0 +1,102 @@
+import math
+import random
+import unittest
+
+from textflow.metrics.span_agreement import SpanAgreementScore
+
+NER_EXAMPLE = [
+    ("r1", "I01", 0, 5, "PER"), ("r2", "I01", 0, 5, "PER"),
+    ("r1", "I01", 10, 4, "LOC"), ("r2", "I01", 11, 4, "LOC"),
+    ("r1", "I02", 3, 2, "PER"), ("r2", "I02", 3, 2, "LOC"),
+    ("r2", "I02", 20, 3, "PER"),
+]
+
+NO_SPANS_EXAMPLE = [
+    ("r1", "I01", 0, 5, "PER"), ("r2", "I01", None, None, None),
+    ("r1", "I02", 0, 5, "PER"), ("r2", "I02", 0, 5, "PER"),
+    ("r1", "I03", 0, 5, "PER"),
+]
+
+
+def brute_force(data):
+    """Quadratic reference implementation of partial match counts."""
+    def matched(spans, others):
+        return sum(any(i == j and l == m and s < t + n and t < s + k
+                       for j, t, n, m in others)
+                   for i, s, k, l in spans)
+    a = [row[1:] for row in data if row[0] == 'r1']
+    b = [row[1:] for row in data if row[0] == 'r2']
+    return matched(a, b), matched(b, a)
+
+
+class ExactSpanAgreementTestCase(unittest.TestCase):
+    def test_agreement(self):
+        scores = SpanAgreementScore(NER_EXAMPLE).exact()
+        self.assertEqual(1, scores.shape[0])
+        self.assertEqual(2, scores.iloc[0]['Items'])
+        self.assertAlmostEqual(1 / 4, scores.iloc[0]['Precision'])
+        self.assertAlmostEqual(1 / 3, scores.iloc[0]['Recall'])
+        self.assertAlmostEqual(2 / 7, scores.iloc[0]['F1'])
+
+    def test_without_labels(self):
+        data = [row[:4] for row in NER_EXAMPLE]
+        scores = SpanAgreementScore(data).exact()
+        self.assertAlmostEqual(4 / 7, scores.iloc[0]['F1'])
+
+    def test_items_without_spans(self):
+        scores = SpanAgreementScore(NO_SPANS_EXAMPLE).exact()
+        self.assertEqual(2, scores.iloc[0]['Items'])
+        self.assertAlmostEqual(1, scores.iloc[0]['Precision'])
+        self.assertAlmostEqual(1 / 2, scores.iloc[0]['Recall'])
+
+    def test_missing_labels(self):
+        # a span without a label is not compared with spans of other items
+        data = [
+            ("r1", "I01", 0, 5, "PER"), ("r2", "I01", None, None, None),
+            ("r1", "I02", 3, 2, None), ("r2", "I02", 0, 5, None),
+            ("r1", "I03", 0, 5, None), ("r2", "I03", 0, 5, None),
+        ]
+        scores = SpanAgreementScore(data).exact()
+        self.assertEqual(3, scores.iloc[0]['Items'])
+        self.assertAlmostEqual(1 / 2, scores.iloc[0]['Precision'])
+        self.assertAlmostEqual(1 / 3, scores.iloc[0]['Recall'])
+
+    def test_empty_list_agreement(self):
+        scores = SpanAgreementScore([]).exact()
+        self.assertEqual(0, scores.shape[0])
+
+
+class PartialSpanAgreementTestCase(unittest.TestCase):
+    def test_agreement(self):
+        scores = SpanAgreementScore(NER_EXAMPLE).partial()
+        self.assertAlmostEqual(2 / 4, scores.iloc[0]['Precision'])
+        self.assertAlmostEqual(2 / 3, scores.iloc[0]['Recall'])
+
+    def test_adjacent_spans_do_not_overlap(self):
+        scores = SpanAgreementScore([
+            ("r1", "I01", 0, 5, "PER"), ("r2", "I01", 5, 5, "PER"),
+        ]).partial()
+        self.assertTrue(math.isnan(scores.iloc[0]['F1']))
+
+    def test_matches_brute_force(self):
+        rng = random.Random(0)
+        data = list({
+            (rater, f"I{rng.randrange(20)}", rng.randrange(500),
+             rng.randrange(1, 20), rng.choice(["PER", "LOC"]))
+            for rater in ("r1", "r2") for _ in range(800)
+        })
+        scores = SpanAgreementScore(data).partial()
+        matched_a, matched_b = brute_force(data)
+        num_a = sum(row[0] == 'r1' for row in data)
+        num_b = len(data) - num_a
+        row = scores.iloc[0]
+        rater_a = row['Rater 1']
+        if rater_a != 'r1':
+            matched_a, matched_b, num_a, num_b = \
+                matched_b, matched_a, num_b, num_a
+        self.assertAlmostEqual(matched_a / num_a, row['Recall'])
+        self.assertAlmostEqual(matched_b / num_b, row['Precision'])
+
+
+if __name__ == '__main__':
+    unittest.main()
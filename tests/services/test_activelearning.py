@@ -0,0 +1,105 @@
+""" Test Active Learning """
+import numpy as np
+import pytest
+
+from textflow import schemas
+from textflow.database import events, op
+from textflow.models import Annotation, AnnotationSet, Document, Label, Task
+from textflow.services import activelearning
+from textflow.services.activelearning import iter_prioritize, prioritize
+from textflow.services.automodel import AutoModelManager, uncertainty_scores
+from textflow.services.scheduler import DocumentScheduler
+
+POSITIVE = ['a great movie', 'great acting and a great plot']
+NEGATIVE = ['a terrible movie', 'boring and terrible plot']
+UNLABELED = ['a great great movie', 'great and terrible', 'terrible plot']
+
+
+@pytest.fixture
+def session(session):
+    op.create_project(session, project=schemas.Project(
+        name='P', redundancy=1, ordering='uncertainty',
+    ))
+    user = op.create_user(session, user=schemas.User(username='alice',
+                                                     password='alice'))
+    op.create_assignment(session, assignment=schemas.Assignment(
+        user_id=user.id, project_id=1,
+    ))
+    for _ in op.create_documents(session, project_id=1, documents=[
+        {'text': text} for text in POSITIVE + NEGATIVE + UNLABELED
+    ]):
+        pass
+    task = Task(project_id=1, type='text-classification')
+    session.add(task)
+    session.flush()
+    pos, neg = [Label(task_id=task.id, value=value, label=value, order=0)
+                for value in ['POS', 'NEG']]
+    session.add_all([pos, neg])
+    for document_id in range(1, 5):
+        annotation_set = AnnotationSet(document_id=document_id, user_id=1,
+                                       completed=True)
+        annotation_set.annotations = [
+            Annotation(labels=[pos if document_id <= 2 else neg])
+        ]
+        session.add(annotation_set)
+    session.commit()
+    yield session
+
+
+@pytest.fixture
+def model(session, tmp_path):
+    manager = AutoModelManager(directory=str(tmp_path), n_jobs=1)
+    manager.train(session, project_id=1, task_id=1)
+    return manager
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = DocumentScheduler()
+    yield scheduler
+    events.remove(events.ANNOTATION_SET_CHANGED, scheduler._on_changes)
+    events.remove(events.DOCUMENTS_CHANGED, scheduler._on_documents_changed)
+
+
+def test_uncertainty_scores():
+    proba = np.array([[1.0, 0.0], [0.5, 0.5], [0.8, 0.2]])
+    entropy = uncertainty_scores(proba, 'entropy')
+    assert entropy[:2].tolist() == [0, 1]
+    assert 0 < entropy[2] < 1
+    assert uncertainty_scores(proba, 'margin') == \
+        pytest.approx([0, 1, 0.4])
+    with pytest.raises(ValueError):
+        uncertainty_scores(proba, 'variance')
+
+
+def test_iter_prioritize(session, model, scheduler):
+    """ Least certain documents are handed out first """
+    automodel = model.get_model(1, 1)
+    assert list(iter_prioritize(session, project_id=1, task_id=1,
+                                model=automodel, batch_size=2)) == [2, 3]
+    priorities = dict(session.query(Document.id, Document.priority))
+    # annotated documents are not scored
+    assert all(priorities[i] == 0 for i in range(1, 5))
+    expected = max(range(5, 8), key=priorities.get)
+    assert priorities[expected] > 0
+    document = op.get_next_document(session, user_id=1, project_id=1)
+    assert document.id == expected
+    assert scheduler.acquire(session, project_id=1, user_id=1) == expected
+    # sequential projects ignore the priorities
+    op.update_project(session, project=schemas.Project(
+        id=1, name='P', redundancy=1, ordering='sequential',
+    ))
+    assert op.get_next_document(session, user_id=1, project_id=1).id == 5
+
+
+def test_prioritize_job(session, model, scheduler, monkeypatch):
+    """ The scoring job uses the latest model of the task """
+    monkeypatch.setattr(activelearning, 'automodels', model)
+    monkeypatch.setattr(activelearning, 'scheduler', scheduler)
+    progress = prioritize(session, project_id=1, task_id=1, method='margin')
+    assert list(progress) == [3]
+    priorities = session.query(Document.priority) \
+        .filter(Document.num_completed == 0).all()
+    assert all(priority > 0 for priority, in priorities)
+    with pytest.raises(ValueError):
+        list(prioritize(session, project_id=1, task_id=2))
@@ -0,0 +1,207 @@
+""" Test Live Agreement """
+import math
+
+import pytest
+
+from textflow import TextFlow, schemas
+from textflow.database import events, op
+from textflow.metrics import AgreementScore
+from textflow.models import Annotation, AnnotationSet, Label, Task
+from textflow.services import agreement as agreement_module
+from textflow.services.agreement import AgreementTracker
+
+
+@pytest.fixture
+def session(session):
+    op.create_project(session, project=schemas.Project(name='P',
+                                                       redundancy=3))
+    for username in ('alice', 'bob', 'carol'):
+        op.create_user(session, user=schemas.User(
+            username=username, password=username,
+        ))
+    for _ in op.create_documents(session, project_id=1, documents=[
+        {'text': f'doc {i}'} for i in range(6)
+    ]):
+        pass
+    # labels 1-3 of task 1 and labels 4-5 of task 2
+    for values in (['POS', 'NEG', 'NEU'], ['TOXIC', 'CLEAN']):
+        task = Task(project_id=1, type='classification')
+        session.add(task)
+        session.flush()
+        session.add_all([Label(task_id=task.id, value=value, label=value,
+                               order=i)
+                         for i, value in enumerate(values)])
+    session.commit()
+    yield session
+
+
+@pytest.fixture
+def agreement():
+    # counts are not rebuilt during a test
+    agreement = AgreementTracker(ttl=60)
+    yield agreement
+    events.remove(events.ANNOTATIONS_CHANGED,
+                  agreement._on_annotations_changed)
+    events.remove(events.DOCUMENTS_CHANGED,
+                  agreement._on_documents_changed)
+
+
+def annotate(session, user_id, document_id, label_ids, completed=True):
+    labels = [session.get(Label, label_id) for label_id in label_ids]
+    annotation_set = AnnotationSet(document_id=document_id, user_id=user_id,
+                                   completed=completed)
+    annotation_set.annotations = [Annotation(labels=[label])
+                                  for label in labels]
+    session.add(annotation_set)
+    session.commit()
+    return annotation_set
+
+
+def expected_report(session, task_id):
+    """ Scores of task recomputed from scratch """
+    triples = []
+    for annotation_set in session.query(AnnotationSet) \
+            .filter_by(completed=True):
+        for annotation in annotation_set.annotations:
+            for label in annotation.labels:
+                if label.task_id == task_id:
+                    triples.append((annotation_set.user_id,
+                                    annotation_set.document_id, label.id))
+    scorer = AgreementScore(triples)
+    return scorer.kappa(), scorer.alpha(), scorer.fleiss()
+
+
+def assert_close(a, b):
+    if b is None or (isinstance(b, float) and math.isnan(b)):
+        assert a is None
+    else:
+        assert a == pytest.approx(b)
+
+
+def assert_up_to_date(session, agreement):
+    report = agreement.get_report(session, project_id=1)
+    tasks = [task['task_id'] for task in report['tasks']]
+    assert tasks == sorted(tasks)
+    for task_id in (1, 2):
+        assert_task_up_to_date(session, agreement, task_id)
+
+
+def assert_task_up_to_date(session, agreement, task_id):
+    reports = agreement.get_report(session, project_id=1,
+                                   task_id=task_id)['tasks']
+    report = reports[0] if reports else {'pairs': [], 'labels': []}
+    if not any(label.task_id == task_id
+               for annotation_set in session.query(AnnotationSet)
+               .filter_by(completed=True)
+               for annotation in annotation_set.annotations
+               for label in annotation.labels):
+        assert report['pairs'] == [] and report['labels'] == []
+        return
+    kappa, alpha, fleiss = expected_report(session, task_id)
+    assert len(report['pairs']) == len(kappa)
+    for pair, (_, row) in zip(report['pairs'], kappa.iterrows()):
+        assert pair['user_ids'] == sorted([row['Rater 1'], row['Rater 2']])
+        assert pair['items'] == row['Items']
+        assert_close(pair['kappa'], row['Agreement'])
+    # labels only used on documents with a single annotator are left out
+    unused = {'alpha': None, 'fleiss': None}
+    labels = {label['label_id']: label for label in report['labels']}
+    for (_, a), (_, f) in zip(alpha.iterrows(), fleiss.iterrows()):
+        assert_close(labels.get(a['Label'], unused)['alpha'], a['Agreement'])
+        assert_close(labels.get(f['Label'], unused)['fleiss'],
+                     f['Agreement'])
+
+
+def test_agreement_is_maintained_incrementally(session, agreement):
+    """ Completed and reopened annotation sets update the scores """
+    assert agreement.get_report(session, project_id=1) == {'tasks': []}
+    annotate(session, 1, 1, [1, 4])
+    annotate(session, 2, 1, [1, 5])
+    annotate(session, 1, 2, [2])
+    annotate(session, 2, 2, [1, 4])
+    annotate(session, 3, 2, [2, 3, 4])
+    annotate(session, 1, 3, [3])
+    annotate(session, 3, 4, [1], completed=False)
+    report = agreement.get_report(session, project_id=1)
+    assert [task['task_id'] for task in report['tasks']] == [1, 2]
+    pairs = report['tasks'][0]['pairs']
+    assert [pair['user_ids'] for pair in pairs] == [[1, 2], [1, 3], [2, 3]]
+    assert pairs[0]['percentage'] == pytest.approx(0.5)
+    # annotators without labels of a task did not rate the document
+    pairs = report['tasks'][1]['pairs']
+    assert [(pair['user_ids'], pair['items']) for pair in pairs] == \
+        [([1, 2], 1), ([2, 3], 1)]
+    assert_up_to_date(session, agreement)
+    reopened = session.query(AnnotationSet) \
+        .filter_by(document_id=2, user_id=3).one()
+    op.update_annotation_set(session, annotation_set=schemas.AnnotationSet(
+        id=reopened.id, document_id=2, user_id=3, completed=False,
+    ))
+    assert_up_to_date(session, agreement)
+    # reports of cached counts do not read the database
+    assert agreement.get_report(None, project_id=1) == \
+        agreement.get_report(session, project_id=1)
+    completed = session.query(AnnotationSet) \
+        .filter_by(document_id=4, user_id=3).one()
+    op.update_annotation_set(session, annotation_set=schemas.AnnotationSet(
+        id=completed.id, document_id=4, user_id=3, completed=True,
+    ))
+    annotate(session, 2, 4, [1])
+    assert_up_to_date(session, agreement)
+
+
+def test_changed_labels_update_agreement(session, agreement):
+    """ Labels changed after an annotation set was completed update the
+    scores """
+    annotate(session, 1, 1, [1])
+    annotation_set = annotate(session, 2, 1, [1])
+    assert_up_to_date(session, agreement)
+    annotation = annotation_set.annotations[0]
+    annotation.labels = [session.get(Label, 2), session.get(Label, 4)]
+    session.commit()
+    # the counts are updated on commit
+    assert agreement._projects[1].tasks[1].items[1] == {
+        1: frozenset([1]), 2: frozenset([2]),
+    }
+    assert_up_to_date(session, agreement)
+    op.create_annotation(session, annotation=Annotation(
+        annotation_set_id=annotation_set.id,
+        labels=[session.get(Label, 3)],
+    ))
+    assert_up_to_date(session, agreement)
+    op.delete_annotation(session, annotation=annotation)
+    assert_up_to_date(session, agreement)
+
+
+def test_new_documents_invalidate_agreement(session, agreement):
+    """ Changing documents drops the cached counts """
+    annotate(session, 1, 1, [1])
+    agreement.get_report(session, project_id=1)
+    assert 1 in agreement._projects
+    for _ in op.create_documents(session, project_id=1, documents=[
+        {'text': 'new document'}
+    ]):
+        pass
+    assert 1 not in agreement._projects
+
+
+def test_agreement_cache_ttl_config(tmp_path, monkeypatch):
+    """ A missing or null AGREEMENT_CACHE_TTL uses the default """
+    monkeypatch.setattr(agreement_module.agreement, 'ttl', None)
+    uri = f'sqlite:///{tmp_path}/textflow.db'
+    TextFlow({'SQLALCHEMY_DATABASE_URI': uri, 'AGREEMENT_CACHE_TTL': None})
+    assert agreement_module.agreement.ttl == \
+        agreement_module.AGREEMENT_CACHE_TTL
+    TextFlow({'SQLALCHEMY_DATABASE_URI': uri, 'AGREEMENT_CACHE_TTL': '2'})
+    assert agreement_module.agreement.ttl == 2
+
+
+def test_deleted_annotation_sets_update_agreement(session, agreement):
+    """ Deleting a completed annotation set removes its labels """
+    annotate(session, 1, 1, [1])
+    annotation_set = annotate(session, 2, 1, [1])
+    assert_up_to_date(session, agreement)
+    session.delete(annotation_set)
+    session.commit()
+    assert 2 not in agreement._projects[1].tasks[1].items[1]
+    assert_up_to_date(session, agreement)
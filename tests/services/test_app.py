@@ -1,6 +1,11 @@
 """ Test App """
+import pytest
+from fastapi.testclient import TestClient
 
 from textflow import TextFlow
+from textflow.database import db, op
+from textflow.database.pagination import encode_cursor
+from textflow.models import BackgroundJob
 
 
 def test_create_app_no_config():
@@ -14,3 +19,42 @@ def test_create_app_no_config():
     except AttributeError:
         pass
     assert tf is None
+
+
+@pytest.fixture
+def client(tmp_path):
+    tf = TextFlow({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/textflow.db',
+    })
+    db.create_all()
+    client = TestClient(tf.create_app())
+    token = client.post('/api/tokens/', data={
+        'username': 'admin', 'password': 'admin',
+    }).json()['access_token']
+    client.headers['Authorization'] = f'Bearer {token}'
+    return client
+
+
+@pytest.mark.parametrize('url', ['/api/projects/', '/api/projects/1/tasks/'])
+def test_invalid_listing_params(client, url):
+    """ Unknown sort columns and malformed cursors are client errors """
+    assert client.get(url, params={'page': 1}).status_code == 200
+    response = client.get(url, params={'sort': 'unknown'})
+    assert response.status_code == 422
+    response = client.get(url, params={'after': 'not-a-cursor'})
+    assert response.status_code == 422
+    response = client.get(url, params={'after': encode_cursor([1, 2, 3])})
+    assert response.status_code == 422
+
+
+def test_cancel_running_job_without_progress(client):
+    """ Running jobs that cannot stop early are not reported as cancelled """
+    with db.session() as session:
+        job = op.create_background_job(session, job=BackgroundJob(
+            name='train_automodel', params={},
+        ))
+        op.claim_background_job(session, worker='test', job_id=job.id)
+    response = client.post(f'/api/jobs/{job.id}/cancel')
+    assert response.status_code == 409
+    response = client.get(f'/api/jobs/{job.id}')
+    assert response.json()['status'] == 'running'
@@ -0,0 +1,59 @@
+""" Test Assignment Cache """
+import pytest
+
+from textflow import TextFlow, schemas
+from textflow.api import dependencies
+from textflow.database import op
+
+
+@pytest.fixture
+def session(session):
+    op.create_project(session, project=schemas.Project(name='P'))
+    dependencies.assignment_cache.clear()
+    yield session
+    dependencies.assignment_cache.clear()
+
+
+@pytest.fixture
+def user(session):
+    return op.create_user(session, user=schemas.User(username='alice',
+                                                     password='alice'))
+
+
+def get_role(session, user):
+    assignment = dependencies.get_current_assignment(
+        project_id=1, user=user, session=session,
+    )
+    return None if assignment is None else assignment.role.value
+
+
+def test_assignments_are_invalidated(session, user):
+    """ Created and updated assignments replace cached ones """
+    assert get_role(session, user) is None
+    assert (user.id, 1) in dependencies.assignment_cache
+    assignment = op.create_assignment(session, assignment=schemas.Assignment(
+        user_id=user.id, project_id=1, role='default',
+    ))
+    assert get_role(session, user) == 'default'
+    assignment.role = 'manager'
+    op.update_assignment(session, assignment=assignment)
+    assert get_role(session, user) == 'manager'
+
+
+def test_roles_required_uses_assignment(session, user):
+    """ Role checks are resolved from the assignment of the request """
+    check = dependencies.roles_required('default', raise_exception=False)
+    assignment = schemas.Assignment(user_id=user.id, project_id=1)
+    assert check(user=user, assignment=assignment) is True
+    assert check(user=user, assignment=None) is False
+
+
+def test_assignment_cache_ttl_config(tmp_path, monkeypatch):
+    """ A missing or null ASSIGNMENT_CACHE_TTL uses the default """
+    monkeypatch.setattr(dependencies.assignment_cache, 'ttl', None)
+    uri = f'sqlite:///{tmp_path}/textflow.db'
+    TextFlow({'SQLALCHEMY_DATABASE_URI': uri, 'ASSIGNMENT_CACHE_TTL': None})
+    assert dependencies.assignment_cache.ttl == \
+        dependencies.ASSIGNMENT_CACHE_TTL
+    TextFlow({'SQLALCHEMY_DATABASE_URI': uri, 'ASSIGNMENT_CACHE_TTL': '2'})
+    assert dependencies.assignment_cache.ttl == 2
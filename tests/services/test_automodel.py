@@ -0,0 +1,126 @@
+""" Test Auto-Models """
+import os
+
+import pytest
+
+from textflow import schemas
+from textflow.database import op
+from textflow.models import Annotation, AnnotationSet, AnnotationSpan, \
+    Label, Task
+from textflow.services import automodel
+from textflow.services.automodel import AutoModelManager, load_examples, \
+    train_automodel
+
+POSITIVE = ['a great movie', 'great acting and a great plot',
+            'I loved it', 'loved the great cast']
+NEGATIVE = ['a terrible movie', 'boring and terrible plot',
+            'I hated it', 'hated the boring cast']
+
+
+@pytest.fixture
+def session(session):
+    op.create_project(session, project=schemas.Project(name='P'))
+    op.create_user(session, user=schemas.User(username='alice',
+                                              password='alice'))
+    for _ in op.create_documents(session, project_id=1, documents=[
+        {'text': text} for text in POSITIVE + NEGATIVE + ['Paris and Rome']
+    ]):
+        pass
+    classification = Task(project_id=1, type='text-classification')
+    sequence = Task(project_id=1, type='sequence-labeling')
+    session.add_all([classification, sequence])
+    session.flush()
+    pos, neg, loc = [
+        Label(task_id=task.id, value=value, label=value, order=0)
+        for task, value in [(classification, 'POS'), (classification, 'NEG'),
+                            (sequence, 'LOC')]
+    ]
+    session.add_all([pos, neg, loc])
+    for document_id in range(1, 9):
+        annotation_set = AnnotationSet(document_id=document_id, user_id=1,
+                                       completed=True)
+        annotation_set.annotations = [
+            Annotation(labels=[pos if document_id <= 4 else neg])
+        ]
+        session.add(annotation_set)
+    annotation_set = AnnotationSet(document_id=9, user_id=1, completed=True)
+    annotation_set.annotations = [
+        Annotation(span=AnnotationSpan(start=0, length=5), labels=[loc]),
+        Annotation(span=AnnotationSpan(start=10, length=4), labels=[loc]),
+    ]
+    session.add(annotation_set)
+    session.commit()
+    yield session
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return AutoModelManager(directory=str(tmp_path), n_jobs=1)
+
+
+def test_load_examples(session):
+    """ Labels and spans of the task are read per annotation set """
+    examples = load_examples(session, project_id=1, task_id=1,
+                             task_type='text-classification')
+    assert len(examples) == 9
+    assert examples[0].labels == frozenset([1])
+    assert examples[8].labels == frozenset()
+    examples = load_examples(session, project_id=1, task_id=2,
+                             task_type='sequence-labeling')
+    assert examples[8].labels == ((0, 5, 3), (10, 14, 3))
+    assert examples[0].labels == ()
+
+
+def test_train_text_classifier(session, manager):
+    """ Trained models predict and are cached by annotation snapshot """
+    model = manager.train(session, project_id=1, task_id=1)
+    scores = model.predict_proba(['a great plot', 'a boring movie'])
+    assert scores.argmax(axis=1).tolist() == [0, 1]
+    model.threshold = 0
+    predictions = model.predict(['a great plot'])
+    assert [p['label_id'] for p in predictions[0]] == [1, 2]
+    assert predictions[0][0]['score'] == pytest.approx(scores[0, 0])
+    status = manager.get_status(1, 1)
+    assert status['status'] == 'ready'
+    assert os.path.exists(manager.get_path(1, 1, status['snapshot']))
+    # unchanged annotations are not trained again
+    assert manager.train(session, project_id=1, task_id=1) is model
+    fresh = AutoModelManager(directory=manager.directory, n_jobs=1)
+    assert fresh.get_model(1, 1) is not None
+    # changed annotations are
+    session.get(AnnotationSet, 1).completed = False
+    session.commit()
+    assert manager.train(session, project_id=1, task_id=1) is not model
+    assert manager.get_status(1, 1)['snapshot'] != status['snapshot']
+
+
+def test_feature_extraction_in_worker_processes(session, manager,
+                                                monkeypatch):
+    """ Chunks of documents are vectorized in a process pool """
+    monkeypatch.setattr(automodel, 'DEFAULT_CHUNK_SIZE', 3)
+    model = manager.train(session, project_id=1, task_id=1)
+    serial = model.predict_proba(POSITIVE + NEGATIVE)
+    parallel = model.predict_proba(POSITIVE + NEGATIVE, n_jobs=2)
+    assert (serial == parallel).all()
+
+
+def test_train_automodel_job(session, manager, monkeypatch):
+    """ The training job stores a new model of the task """
+    monkeypatch.setattr(automodel, 'automodels', manager)
+    result = train_automodel(session, project_id=1, task_id=1)
+    status = manager.get_status(1, 1)
+    assert status['status'] == 'ready'
+    assert status['snapshot'] == result['snapshot']
+    with pytest.raises(ValueError):
+        train_automodel(session, project_id=1, task_id=3)
+
+
+def test_train_sequence_tagger(session, manager):
+    pytest.importorskip('sklearn_crfsuite')
+    model = manager.train(session, project_id=1, task_id=2)
+    predictions = model.predict(['Paris and Rome'])
+    assert {(p['start'], p['length']) for p in predictions[0]} <= \
+        {(0, 5), (10, 4)}
+    uncertainty = model.uncertainty(['Paris and Rome', ''], method='margin')
+    assert uncertainty.shape == (2,)
+    assert ((uncertainty >= 0) & (uncertainty <= 1)).all()
@@ -0,0 +1,101 @@
+""" Test Project Export """
+import json
+
+import pytest
+
+from textflow import schemas
+from textflow.database import op
+from textflow.models import Annotation, AnnotationSet, AnnotationSpan, \
+    Label, Task
+from textflow.services import export
+
+
+@pytest.fixture
+def session(session):
+    op.create_project(session, project=schemas.Project(name='P'))
+    op.create_user(session, user=schemas.User(username='alice',
+                                              password='alice'))
+    for _ in op.create_documents(session, project_id=1, documents=[
+        {'text': f'doc {i}'} for i in range(5)
+    ]):
+        pass
+    task = Task(project_id=1, type='sequence-labeling')
+    session.add(task)
+    session.flush()
+    labels = [Label(task_id=task.id, value=value, label=value, order=i)
+              for i, value in enumerate(['PER', 'LOC'])]
+    completed = AnnotationSet(document_id=2, user_id=1, completed=True)
+    completed.annotations = [
+        Annotation(span=AnnotationSpan(start=0, length=3), labels=labels),
+        Annotation(labels=labels[:1]),
+    ]
+    session.add_all(labels + [
+        completed, AnnotationSet(document_id=4, user_id=1),
+    ])
+    session.commit()
+    yield session
+
+
+def test_export_documents_with_annotations(session):
+    """ Documents are exported in order with their annotation trees """
+    documents = list(export.iter_documents(session, project_id=1,
+                                           batch_size=2))
+    assert [d['id'] for d in documents] == [1, 2, 3, 4, 5]
+    annotation_sets = documents[1]['annotation_sets']
+    assert len(annotation_sets) == 1
+    annotations = annotation_sets[0]['annotations']
+    assert annotations[0]['span'] == {'start': 0, 'length': 3}
+    assert [label['value'] for label in annotations[0]['labels']] == \
+        ['PER', 'LOC']
+    assert annotations[1]['span'] is None
+    assert len(documents[3]['annotation_sets'][0]['annotations']) == 0
+
+
+def test_export_completed_only(session):
+    """ Incomplete annotation sets are left out on request """
+    documents = list(export.iter_documents(session, project_id=1,
+                                           completed_only=True))
+    assert documents[3]['annotation_sets'] == []
+    assert len(documents[1]['annotation_sets']) == 1
+
+
+def test_export_tokens(session):
+    """ Token offsets are exported on request """
+    documents = list(export.iter_documents(session, project_id=1,
+                                           tokens=True))
+    assert documents[0]['tokens'] == [[0, 3], [4, 5]]
+    assert 'tokens' not in next(export.iter_documents(session,
+                                                      project_id=1))
+
+
+def test_export_ndjson(session):
+    """ One JSON document per line """
+    data = b''.join(export.iter_ndjson(session, project_id=1, batch_size=3))
+    lines = data.decode('utf-8').splitlines()
+    assert [json.loads(line)['text'] for line in lines] == \
+        [f'doc {i}' for i in range(5)]
+
+
+def test_export_parquet(session):
+    """ Annotations are written as rows with one row group per batch """
+    pytest.importorskip('pyarrow')
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    data = b''.join(export.iter_parquet(session, project_id=1,
+                                        batch_size=2))
+    parquet_file = pq.ParquetFile(pa.BufferReader(data))
+    assert parquet_file.metadata.num_row_groups == 2
+    table = parquet_file.read()
+    assert table.column('value').to_pylist() == ['PER', 'LOC', 'PER']
+    assert table.column('start').to_pylist() == [0, 0, None]
+    assert set(table.column('document_id').to_pylist()) == {2}
+
+
+def test_export_arrow_empty_project(session):
+    """ Projects without annotations export an empty table """
+    pytest.importorskip('pyarrow')
+    import pyarrow as pa
+    data = b''.join(export.iter_arrow(session, project_id=2))
+    table = pa.ipc.open_stream(data).read_all()
+    assert table.num_rows == 0
+    assert 'task_id' in table.column_names
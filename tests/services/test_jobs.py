@@ -0,0 +1,136 @@
+""" Test Background Jobs """
+import pytest
+
+from textflow import schemas
+from textflow.database import op
+from textflow.services import jobs as jobs_module
+from textflow.services.jobs import JobRunner, is_cancellable, job_type
+
+from testing import create_context
+
+STATUS = schemas.JobStatusEnum
+
+
+@job_type('test_count')
+def count(session, *, n):
+    for i in range(n):
+        yield i + 1, n
+    return {'n': n}
+
+
+@job_type('test_fail')
+def fail(session):
+    raise ValueError('boom')
+
+
+@job_type('test_cancel')
+def cancel(session):
+    # cancels itself while it is running
+    for job in op.list_background_jobs(session, status=[STATUS.running]):
+        op.cancel_background_job(session, job_id=job.id)
+    yield 1
+    yield 2
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    # a file database, jobs run in other threads
+    ctx = create_context({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/jobs.db',
+    })
+    monkeypatch.setattr(jobs_module.db, 'session', ctx.Session)
+    session = ctx.Session()
+    op.create_project(session, project=schemas.Project(name='P'))
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def runner():
+    return JobRunner(mode='worker', max_workers=2, progress_interval=0,
+                     poll_interval=0.01)
+
+
+def get_job(session, job_id):
+    session.expire_all()
+    return op.get_background_job(session, job_id=job_id)
+
+
+def test_run_job(session, runner):
+    """ Progress and result of a job are stored """
+    job = runner.submit(session, 'test_count', params={'n': 3},
+                        project_id=1)
+    assert job.status == STATUS.queued
+    assert job.created_on is not None
+    assert runner.run(job.id)
+    job = get_job(session, job.id)
+    assert job.status == STATUS.done
+    assert (job.progress, job.total) == (3, 3)
+    assert job.result == {'n': 3}
+    assert job.finished_on is not None
+    # jobs run once
+    assert not runner.run(job.id)
+
+
+def test_failed_job(session, runner):
+    job = runner.submit(session, 'test_fail', project_id=1)
+    runner.run(job.id)
+    job = get_job(session, job.id)
+    assert job.status == STATUS.failed
+    assert job.error == 'boom'
+
+
+def test_cancel_job(session, runner):
+    """ Queued jobs are cancelled at once and running jobs at the next
+    progress update """
+    job = runner.submit(session, 'test_count', params={'n': 3},
+                        project_id=1)
+    job = op.cancel_background_job(session, job_id=job.id)
+    assert job.status == STATUS.cancelled
+    assert not runner.run(job.id)
+    job = runner.submit(session, 'test_cancel', project_id=1)
+    runner.run(job.id)
+    job = get_job(session, job.id)
+    assert job.status == STATUS.cancelled
+    assert job.progress == 1
+
+
+def test_cancel_running_job_without_progress(session, runner):
+    """ Jobs that are not generators are only cancelled while queued """
+    assert is_cancellable('test_count')
+    assert not is_cancellable('test_fail')
+    job = runner.submit(session, 'test_fail', project_id=1)
+    op.claim_background_job(session, worker='test', job_id=job.id)
+    job = op.cancel_background_job(session, job_id=job.id, running=False)
+    assert job.status == STATUS.running
+    assert not job.cancel_requested
+    job = runner.submit(session, 'test_fail', project_id=1)
+    job = op.cancel_background_job(session, job_id=job.id, running=False)
+    assert job.status == STATUS.cancelled
+
+
+def test_submit(session, runner):
+    with pytest.raises(ValueError):
+        runner.submit(session, 'unknown', project_id=1)
+    job = runner.submit(session, 'test_count', params={'n': 3},
+                        project_id=1, unique=True)
+    same = runner.submit(session, 'test_count', params={'n': 3},
+                         project_id=1, unique=True)
+    other = runner.submit(session, 'test_count', params={'n': 4},
+                          project_id=1, unique=True)
+    assert same.id == job.id
+    assert other.id != job.id
+
+
+def test_work(session, runner):
+    """ A worker runs the queued jobs in its thread pool """
+    job_ids = [
+        runner.submit(session, 'test_count', params={'n': n},
+                      project_id=1).id
+        for n in range(1, 4)
+    ]
+    runner.work(burst=True)
+    for n, job_id in enumerate(job_ids, 1):
+        job = get_job(session, job_id)
+        assert job.status == STATUS.done
+        assert job.result == {'n': n}
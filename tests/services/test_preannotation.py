@@ -0,0 +1,88 @@
+""" Test Pre-Annotation """
+import pytest
+
+from textflow import schemas
+from textflow.database import op
+from textflow.models import Annotation, AnnotationSet, Document, Label, \
+    Suggestion, Task
+from textflow.services import preannotation
+from textflow.services.automodel import AutoModelManager
+from textflow.services.preannotation import iter_preannotate, preannotate
+
+POSITIVE = ['a great movie', 'great acting and a great plot']
+NEGATIVE = ['a terrible movie', 'boring and terrible plot']
+UNLABELED = ['a great cast', 'a boring cast', 'great and terrible']
+
+
+@pytest.fixture
+def session(session):
+    op.create_project(session, project=schemas.Project(name='P'))
+    op.create_user(session, user=schemas.User(username='alice',
+                                              password='alice'))
+    for _ in op.create_documents(session, project_id=1, documents=[
+        {'text': text} for text in POSITIVE + NEGATIVE + UNLABELED
+    ]):
+        pass
+    task = Task(project_id=1, type='text-classification')
+    session.add(task)
+    session.flush()
+    pos, neg = [Label(task_id=task.id, value=value, label=value, order=0)
+                for value in ['POS', 'NEG']]
+    session.add_all([pos, neg])
+    for document_id in range(1, 5):
+        annotation_set = AnnotationSet(document_id=document_id, user_id=1,
+                                       completed=True)
+        annotation_set.annotations = [
+            Annotation(labels=[pos if document_id <= 2 else neg])
+        ]
+        session.add(annotation_set)
+    session.commit()
+    yield session
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return AutoModelManager(directory=str(tmp_path), n_jobs=1)
+
+
+def test_iter_preannotate(session, manager):
+    """ Unannotated documents get suggestions once per model """
+    model = manager.train(session, project_id=1, task_id=1)
+    model.threshold = 0
+    progress = list(iter_preannotate(session, project_id=1, task_id=1,
+                                     model=model, batch_size=2))
+    assert progress == [2, 3]
+    suggestions = session.query(Suggestion).all()
+    assert {s.document_id for s in suggestions} == {5, 6, 7}
+    assert {s.snapshot for s in suggestions} == {model.snapshot}
+    document_suggestions = op.list_suggestions(session, document_id=5)
+    assert [s.label_id for s in document_suggestions] == [1, 2]
+    assert document_suggestions[0].score > document_suggestions[1].score
+    # nothing to do for the same model
+    assert list(iter_preannotate(session, project_id=1, task_id=1,
+                                 model=model)) == []
+    # a new model replaces the suggestions
+    model.snapshot = 'new'
+    assert list(iter_preannotate(session, project_id=1, task_id=1,
+                                 model=model)) == [3]
+    assert session.query(Suggestion).count() == len(suggestions)
+    # suggestions are removed with their documents
+    op.delete_document(session, doc=session.get(Document, 5))
+    assert op.list_suggestions(session, document_id=5) == []
+
+
+def test_preannotate_job(session, manager, monkeypatch):
+    """ The pre-annotation job uses the latest model of the task """
+    monkeypatch.setattr(preannotation, 'automodels', manager)
+    with pytest.raises(ValueError):
+        list(preannotate(session, project_id=1, task_id=1))
+    model = manager.train(session, project_id=1, task_id=1)
+    progress = preannotate(session, project_id=1, task_id=1, batch_size=2)
+    assert list(progress) == [2, 3]
+    assert len(op.list_suggestions(session, document_id=7)) == 1
+    progress = preannotate(session, project_id=1, task_id=1)
+    try:
+        next(progress)
+    except StopIteration as stop:
+        result = stop.value
+    assert result == {'num_documents': 0, 'snapshot': model.snapshot}
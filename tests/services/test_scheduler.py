@@ -0,0 +1,102 @@
+""" Test Document Scheduler """
+import pytest
+
+from textflow import schemas
+from textflow.database import events, op
+from textflow.services.scheduler import DocumentScheduler
+
+
+@pytest.fixture
+def session(session):
+    op.create_project(session, project=schemas.Project(name='P',
+                                                       redundancy=2))
+    for username in ('alice', 'bob', 'carol'):
+        user = op.create_user(session, user=schemas.User(
+            username=username, password=username,
+        ))
+        op.create_assignment(session, assignment=schemas.Assignment(
+            user_id=user.id, project_id=1,
+        ))
+    for _ in op.create_documents(session, project_id=1, documents=[
+        {'text': f'doc {i}'} for i in range(3)
+    ]):
+        pass
+    yield session
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = DocumentScheduler()
+    yield scheduler
+    events.remove(events.ANNOTATION_SET_CHANGED, scheduler._on_changes)
+    events.remove(events.DOCUMENTS_CHANGED, scheduler._on_documents_changed)
+
+
+def complete(session, user_id, document_id):
+    op.create_annotation_set(session, annotation_set=schemas.AnnotationSet(
+        user_id=user_id, document_id=document_id, completed=True,
+    ))
+
+
+def test_leases_respect_redundancy(session, scheduler):
+    """ Concurrent users do not exceed the redundancy of the project """
+    alice = scheduler.acquire(session, project_id=1, user_id=1)
+    bob = scheduler.acquire(session, project_id=1, user_id=2)
+    carol = scheduler.acquire(session, project_id=1, user_id=3)
+    assert alice == bob == 1
+    assert carol == 2
+    # the lease is extended until the user completes the document
+    assert scheduler.acquire(session, project_id=1, user_id=1) == 1
+
+
+def test_completed_documents_are_not_handed_out(session, scheduler):
+    """ Completing a document ends the lease and takes its slot """
+    assert scheduler.acquire(session, project_id=1, user_id=1) == 1
+    complete(session, 1, 1)
+    assert scheduler.acquire(session, project_id=1, user_id=1) == 2
+    assert scheduler.acquire(session, project_id=1, user_id=2) == 1
+    complete(session, 2, 1)
+    assert scheduler.acquire(session, project_id=1, user_id=3) == 2
+
+
+def test_expired_leases_are_reclaimed(session, scheduler):
+    """ Expired leases free the slot for other users """
+    scheduler.lease_time = 0
+    assert scheduler.acquire(session, project_id=1, user_id=1) == 1
+    assert scheduler.acquire(session, project_id=1, user_id=2) == 1
+    scheduler.lease_time = 60
+    assert scheduler.acquire(session, project_id=1, user_id=3) == 1
+
+
+def test_new_documents_rebuild_queue(session, scheduler):
+    """ Added documents are handed out after the queue is rebuilt """
+    for user_id in (1, 2):
+        for document_id in (1, 2, 3):
+            complete(session, user_id, document_id)
+    assert scheduler.acquire(session, project_id=1, user_id=3) is None
+    for _ in op.create_documents(session, project_id=1, documents=[
+        {'text': 'new document'}
+    ]):
+        pass
+    assert scheduler.acquire(session, project_id=1, user_id=3) == 4
+
+
+def test_done_documents_are_passed_over(session, scheduler):
+    """ Documents done by a user are not read again for the user """
+    for document_id in (1, 2):
+        assert scheduler.acquire(session, project_id=1,
+                                 user_id=1) == document_id
+        complete(session, 1, document_id)
+    queue = scheduler._projects[1]
+    assert queue.passed[1] == [(0, 1)]
+    assert scheduler.acquire(session, project_id=1, user_id=1) == 3
+    assert queue.passed[1] == [(0, 2)]
+    # other users still receive the documents done by the user first
+    assert scheduler.acquire(session, project_id=1, user_id=2) == 1
+    # documents that are not done anymore are handed out again
+    op.update_annotation_set(session, annotation_set=schemas.AnnotationSet(
+        id=1, user_id=1, document_id=1, completed=False,
+    ))
+    assert 1 not in queue.passed
+    complete(session, 1, 3)
+    assert scheduler.acquire(session, project_id=1, user_id=1) == 1
@@ -0,0 +1,101 @@
+""" Test Project Statistics """
+import pytest
+
+from textflow import TextFlow, schemas
+from textflow.database import events, op
+from textflow.services import stats as stats_module
+from textflow.services.stats import ProjectStatistics
+
+
+@pytest.fixture
+def session(session):
+    op.create_project(session, project=schemas.Project(name='P',
+                                                       redundancy=2))
+    for username in ('alice', 'bob'):
+        op.create_user(session, user=schemas.User(
+            username=username, password=username,
+        ))
+    for _ in op.create_documents(session, project_id=1, documents=[
+        {'text': f'doc {i}'} for i in range(4)
+    ]):
+        pass
+    yield session
+
+
+@pytest.fixture
+def stats():
+    stats = ProjectStatistics()
+    yield stats
+    events.remove(events.ANNOTATION_SET_CHANGED, stats._on_changes)
+    events.remove(events.DOCUMENTS_CHANGED, stats._on_documents_changed)
+
+
+def annotate(session, user_id, document_id, **kwargs):
+    return op.create_annotation_set(
+        session, annotation_set=schemas.AnnotationSet(
+            user_id=user_id, document_id=document_id, **kwargs
+        ))
+
+
+def assert_up_to_date(session, stats):
+    """ Incrementally maintained reports match recounted reports """
+    fresh = ProjectStatistics()
+    try:
+        assert stats.get_project_report(session, project_id=1) == \
+            fresh.get_project_report(session, project_id=1)
+        for user_id in (1, 2):
+            assert stats.get_user_report(
+                session, project_id=1, user_id=user_id
+            ) == fresh.get_user_report(session, project_id=1, user_id=user_id)
+    finally:
+        events.remove(events.ANNOTATION_SET_CHANGED, fresh._on_changes)
+        events.remove(events.DOCUMENTS_CHANGED, fresh._on_documents_changed)
+
+
+def test_reports_are_maintained_incrementally(session, stats):
+    """ Reports follow completed, skipped and deleted annotation sets """
+    report = stats.get_project_report(session, project_id=1)
+    assert report == {'num_documents': 4, 'num_completed': 0,
+                      'num_remaining': 4, 'progress': 0}
+    stats.get_user_report(session, project_id=1, user_id=1)
+    stats.get_user_report(session, project_id=1, user_id=2)
+    annotate(session, 1, 1, completed=True)
+    annotate(session, 1, 2, skipped=True)
+    assert_up_to_date(session, stats)
+    annotation_set = annotate(session, 2, 1)
+    op.update_annotation_set(session, annotation_set=annotation_set.copy(
+        update={'completed': True}))
+    assert stats.get_project_report(
+        session, project_id=1)['num_completed'] == 1
+    assert stats.get_user_report(session, project_id=1, user_id=1) == {
+        'num_documents': 3, 'num_completed': 1, 'num_remaining': 2,
+        'progress': 33,
+    }
+    assert_up_to_date(session, stats)
+    op.update_annotation_set(session, annotation_set=annotation_set.copy(
+        update={'completed': False}))
+    assert stats.get_project_report(
+        session, project_id=1)['num_completed'] == 0
+    assert_up_to_date(session, stats)
+
+
+def test_new_documents_invalidate_reports(session, stats):
+    """ Adding documents invalidates the cached report """
+    assert stats.get_project_report(session, project_id=1)[
+        'num_documents'] == 4
+    for _ in op.create_documents(session, project_id=1, documents=[
+        {'text': 'new document'}
+    ]):
+        pass
+    assert stats.get_project_report(session, project_id=1)[
+        'num_documents'] == 5
+
+
+def test_stats_cache_ttl_config(tmp_path, monkeypatch):
+    """ A missing or null STATS_CACHE_TTL uses the default """
+    monkeypatch.setattr(stats_module.stats, 'ttl', None)
+    uri = f'sqlite:///{tmp_path}/textflow.db'
+    TextFlow({'SQLALCHEMY_DATABASE_URI': uri, 'STATS_CACHE_TTL': None})
+    assert stats_module.stats.ttl == stats_module.STATS_CACHE_TTL
+    TextFlow({'SQLALCHEMY_DATABASE_URI': uri, 'STATS_CACHE_TTL': '2'})
+    assert stats_module.stats.ttl == 2
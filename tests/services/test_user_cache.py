@@ -0,0 +1,65 @@
+""" Test Authenticated User Cache """
+import pytest
+import sqlalchemy as sa
+
+from textflow import TextFlow, schemas
+from textflow.api import dependencies
+from textflow.database import op
+from textflow.models import User
+
+
+@pytest.fixture
+def session(session):
+    op.create_user(session, user=schemas.User(username='alice',
+                                              password='alice'))
+    dependencies.user_cache.clear()
+    yield session
+    dependencies.user_cache.clear()
+
+
+def get_current_user(session):
+    token = dependencies.create_access_token({'sub': 'alice'})
+    return dependencies.get_current_user(token=token, session=session)
+
+
+def test_user_is_cached(session):
+    """ Users are resolved from the cache after the first request """
+    assert get_current_user(session).username == 'alice'
+    assert 'alice' in dependencies.user_cache
+    session.close()
+    session.bind = None
+    assert get_current_user(session).username == 'alice'
+
+
+def test_changed_user_is_invalidated(session):
+    """ Committed changes of users remove them from the cache """
+    assert get_current_user(session).disabled is False
+    session.query(User).filter_by(username='alice').one().disabled = True
+    session.commit()
+    assert 'alice' not in dependencies.user_cache
+    assert get_current_user(session).disabled is True
+
+
+def test_user_changed_elsewhere_expires(session, monkeypatch):
+    """ Changes that fire no events (e.g. of other processes) are picked up
+    once the entries expire """
+    assert get_current_user(session).disabled is False
+    session.execute(sa.update(User.__table__).values(disabled=True))
+    session.commit()
+    assert get_current_user(session).disabled is False
+    monkeypatch.setattr(dependencies.user_cache, 'ttl', 0)
+    dependencies.user_cache.clear()
+    assert get_current_user(session).disabled is True
+    session.execute(sa.update(User.__table__).values(disabled=False))
+    session.commit()
+    assert get_current_user(session).disabled is False
+
+
+def test_user_cache_ttl_config(tmp_path, monkeypatch):
+    """ A missing or null USER_CACHE_TTL uses the default """
+    monkeypatch.setattr(dependencies.user_cache, 'ttl', None)
+    uri = f'sqlite:///{tmp_path}/textflow.db'
+    TextFlow({'SQLALCHEMY_DATABASE_URI': uri, 'USER_CACHE_TTL': None})
+    assert dependencies.user_cache.ttl == dependencies.USER_CACHE_TTL
+    TextFlow({'SQLALCHEMY_DATABASE_URI': uri, 'USER_CACHE_TTL': '2.5'})
+    assert dependencies.user_cache.ttl == 2.5
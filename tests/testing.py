@@ -0,0 +1,38 @@
+""" Shared Test Helpers """
+import typing
+import unittest
+
+from textflow.database.base import DatabaseContext
+from textflow.models import mapper_registry
+
+# in-memory database (one per context)
+MEMORY_URI = 'sqlite://'
+
+
+def create_context(config: typing.Optional[dict] = None) -> DatabaseContext:
+    """Create a database context with all tables.
+
+    :param config: configuration merged over an in-memory database.
+    :return: database context.
+    """
+    ctx = DatabaseContext({'SQLALCHEMY_DATABASE_URI': MEMORY_URI,
+                           **(config or {})})
+    mapper_registry.metadata.create_all(ctx.engine)
+    return ctx
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Test case with a fresh database (`ctx`) and a session (`session`)."""
+    # configuration of the database (an in-memory database if None)
+    config: typing.Optional[dict] = None
+
+    def setUp(self):
+        self.ctx = create_context(self.get_config())
+        self.session = self.ctx.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.ctx.engine.dispose()
+
+    def get_config(self) -> typing.Optional[dict]:
+        return self.config
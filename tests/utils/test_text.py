@@ -0,0 +1,78 @@
+""" Test Tokenization """
+import numpy as np
+
+from textflow.utils.text import TokenCache, TokenOffsets, Tokenizer, \
+    WhitespaceTokenizer, get_tokenizer
+
+TEXT = 'Hello world! It costs $5.50'
+
+
+def test_offsets_match_tokenize():
+    """ Array offsets are the offsets of `tokenize` """
+    offsets = Tokenizer.offsets(TEXT)
+    assert list(offsets) == [(s, e) for s, e, _ in Tokenizer.tokenize(TEXT)]
+    assert offsets.tokens(TEXT) == \
+        ['Hello', 'world', '!', 'It', 'costs', '$5.50']
+    assert len(Tokenizer.offsets('')) == 0
+
+
+def test_registry():
+    """ Tokenizers are looked up by name with a default """
+    assert get_tokenizer() is Tokenizer
+    assert get_tokenizer('whitespace') is WhitespaceTokenizer
+    assert get_tokenizer('unknown') is Tokenizer
+    assert WhitespaceTokenizer.offsets(TEXT).tokens(TEXT)[1] == 'world!'
+
+
+def test_snap():
+    """ Spans are extended to the tokens they overlap """
+    offsets = Tokenizer.offsets(TEXT)
+    assert offsets.snap(1, 8) == (0, 11)
+    assert offsets.snap(6, 11) == (6, 11)
+    assert offsets.snap(5, 6) is None
+    starts, ends, valid = offsets.snap_many([1, 5, 23], [8, 6, 24])
+    assert starts.tolist() == [0, 5, 22]
+    assert ends.tolist() == [11, 6, 27]
+    assert valid.tolist() == [True, False, True]
+
+
+def test_batch_offsets_match_offsets():
+    """ Offsets of a batch of many texts are the offsets of each text """
+    random = np.random.default_rng(0)
+    words = np.array(TEXT.split() + ['', '\n', 'naïve', '  '])
+    texts = [' '.join(random.choice(words, size=random.integers(0, 50)))
+             for _ in range(2000)]
+    for tokenizer in (Tokenizer, WhitespaceTokenizer):
+        batch = tokenizer.batch_offsets(texts)
+        assert len(batch) == len(texts)
+        for text, offsets in zip(texts, batch):
+            assert list(offsets) == \
+                [(s, e) for s, e, _ in tokenizer.tokenize(text)]
+            assert offsets == tokenizer.offsets(text)
+            assert offsets.starts.flags['C_CONTIGUOUS']
+
+
+def test_serialization():
+    offsets = Tokenizer.offsets(TEXT)
+    assert TokenOffsets.from_bytes(offsets.to_bytes()) == offsets
+    assert len(offsets.to_bytes()) == offsets.nbytes
+
+
+def test_cached_offsets_own_their_arrays():
+    """ Cached offsets do not keep the arrays of their batch alive """
+    cache = TokenCache()
+    offsets = cache.get_many([(1, TEXT), (2, 'a b')])
+    assert offsets[1].tolist() == [[0, 1], [2, 3]]
+    for value in offsets:
+        assert value.starts.base is None and value.ends.base is None
+
+
+def test_cache_is_keyed_by_text():
+    """ Cached offsets are reused until the text changes """
+    cache = TokenCache(maxsize=2)
+    offsets = cache.get(1, TEXT)
+    assert cache.get(1, TEXT) is offsets
+    assert len(cache.get(1, 'Hello')) == 1
+    assert len(cache) == 2
+    cache.get_many([(2, 'a b'), (3, 'c')])
+    assert len(cache) == 2
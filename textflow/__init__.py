@@ -1,3 +1,4 @@
+import anyio.to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -8,8 +9,54 @@ from textflow.views import app as views_app
 class TextFlow(object):
     def __init__(self, local_config, url_prefix='/', **kwargs):
         from textflow.database import db
+        from textflow.services.automodel import automodels
+        from textflow.services.jobs import jobs
+        from textflow.services.agreement import agreement, \
+            AGREEMENT_CACHE_TTL
+        from textflow.services.stats import stats, STATS_CACHE_TTL
+        from textflow.api.dependencies import assignment_cache, \
+            user_cache, ASSIGNMENT_CACHE_TTL, USER_CACHE_TTL
         db.init_context(local_config)
+        # a user that is disabled or changed by another process is still
+        # accepted with its old state for up to USER_CACHE_TTL seconds
+        user_cache.ttl = float(local_config.get('USER_CACHE_TTL') or
+                               USER_CACHE_TTL)
+        # the same holds for revoked or changed assignments
+        assignment_cache.ttl = float(
+            local_config.get('ASSIGNMENT_CACHE_TTL') or ASSIGNMENT_CACHE_TTL
+        )
+        # progress reports follow the changes of other processes after up to
+        # STATS_CACHE_TTL seconds
+        stats.ttl = float(local_config.get('STATS_CACHE_TTL') or
+                          STATS_CACHE_TTL)
+        # and agreement reports after up to AGREEMENT_CACHE_TTL seconds
+        agreement.ttl = float(local_config.get('AGREEMENT_CACHE_TTL') or
+                              AGREEMENT_CACHE_TTL)
+        # trained models are cached in AUTOMODEL_DIR
+        automodels.configure(directory=local_config.get('AUTOMODEL_DIR'),
+                             n_jobs=local_config.get('AUTOMODEL_N_JOBS'))
+        # background jobs run in this process unless JOBS_MODE is 'worker'
+        jobs.configure(local_config)
+        self.jobs = jobs
         self.url_prefix = url_prefix
+        # number of worker threads that run the (blocking) routes
+        self.thread_pool_size = local_config.get('THREAD_POOL_SIZE')
+
+    def _init_thread_pool(self):
+        # routes and dependencies are plain functions that fastapi runs in
+        # the anyio worker thread pool, so that database access does not
+        # block the event loop. the pool is bounded by the default limiter.
+        if self.thread_pool_size is not None:
+            limiter = anyio.to_thread.current_default_thread_limiter()
+            limiter.total_tokens = int(self.thread_pool_size)
+
+    def _start_jobs(self):
+        # run the jobs queued before the application started
+        if self.jobs.mode == 'local':
+            self.jobs.start()
+
+    def _stop_jobs(self):
+        self.jobs.stop(wait=False)
 
     def create_app(self):
         if not hasattr(self, '_app'):
@@ -24,5 +71,8 @@ class TextFlow(object):
             app.include_router(api_router)
             app.mount('/', views_app)
             self._app = FastAPI()
+            self._app.add_event_handler('startup', self._init_thread_pool)
+            self._app.add_event_handler('startup', self._start_jobs)
+            self._app.add_event_handler('shutdown', self._stop_jobs)
             self._app.mount(self.url_prefix, app)
         return self._app
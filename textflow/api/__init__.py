@@ -7,6 +7,8 @@ from textflow.api.routes import (
     tokens,
     assignments,
     documents,
+    exports,
+    jobs,
 )
 
 __all__ = [
@@ -23,3 +25,5 @@ router.include_router(projects.router)
 router.include_router(tasks.router)
 router.include_router(assignments.router)
 router.include_router(documents.router)
+router.include_router(exports.router)
+router.include_router(jobs.router)
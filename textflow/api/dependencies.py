@@ -8,13 +8,16 @@ from sqlalchemy.orm import Session
 from jose import jwt, JWTError
 import pydantic
 
-from textflow.database import db, op
+from textflow.database import db, events, op
 from textflow import schemas
+from textflow.database.base import validate_pagination_args
 from textflow.database.pagination import PaginationArgs
+from textflow.utils.cache import TTLCache
 
 __all__ = [
     'oauth2_scheme',
     'get_listing_query_params',
+    'listing_query_params',
 ]
 
 
@@ -25,6 +28,41 @@ SECRET_KEY = '74c461c6be01eb70373a790ce7cf6c052c08772a63ea5ca087a7dad0e95c82a5'
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='api/tokens')
 
+# seconds a resolved user is reused without reading it again (config
+# `USER_CACHE_TTL`)
+USER_CACHE_TTL = 5
+# resolved users by username (token subject). changes committed in this
+# process invalidate the entries at once. changes committed by other
+# processes (e.g. disabling a user or changing its role) are picked up when
+# the entries expire, so they take effect there after up to USER_CACHE_TTL
+# seconds.
+user_cache = TTLCache(maxsize=4096, ttl=USER_CACHE_TTL)
+# seconds a resolved assignment is reused without reading it again (config
+# `ASSIGNMENT_CACHE_TTL`)
+ASSIGNMENT_CACHE_TTL = 5
+# assignments (None if not assigned) by (user_id, project_id). like users,
+# assignments revoked or changed by other processes are picked up when the
+# entries expire.
+assignment_cache = TTLCache(maxsize=16384, ttl=ASSIGNMENT_CACHE_TTL)
+
+
+@events.listen(events.USERS_CHANGED)
+def _invalidate_users(usernames):
+    if None in usernames:
+        user_cache.clear()
+        return
+    for username in usernames:
+        user_cache.pop(username)
+
+
+@events.listen(events.ASSIGNMENTS_CHANGED)
+def _invalidate_assignments(keys):
+    if None in keys:
+        assignment_cache.clear()
+        return
+    for key in keys:
+        assignment_cache.pop(key)
+
 
 def get_session():
     with db.session() as sess:
@@ -36,7 +74,7 @@ class TokenData:
     username: typing.Union[str, None] = None
 
 
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     session: Session = Depends(get_session),
 ) -> schemas.User:
@@ -53,31 +91,73 @@ async def get_current_user(
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
+    user = user_cache.get(token_data.username)
+    if user is not None:
+        return user.copy()
+    version = user_cache.version
     user = op.get_user_by(session, username=token_data.username)
     if user is None:
         raise credentials_exception
+    user_cache.set(token_data.username, user.copy(), version=version)
     return user
 
 
-async def get_listing_query_params(
-    page: typing.Optional[int] = None,
-    per_page: typing.Optional[int] = None,
-    search: typing.Optional[str] = None,
-    sort: typing.Optional[str] = None,
-    order: typing.Optional[str] = None,
-) -> typing.Dict[str, typing.Any]:
-    query_params = {}
-    if page is not None:
-        query_params['page'] = PaginationArgs(page=page, per_page=per_page)
-    else:
-        query_params['page'] = PaginationArgs()
-    if search is not None:
-        query_params['search'] = search
-    if sort is not None:
-        query_params['sort'] = sort
-    if order is not None:
-        query_params['order'] = order
-    return query_params
+def listing_query_params(entity: typing.Any = None) -> typing.Callable:
+    """Get a dependency that reads the listing (pagination, sorting and
+    search) parameters of a route.
+
+    Parameters
+    ----------
+    entity : typing.Any
+        Mapped class that is listed. The sort column and the `after` cursor
+        are checked against it if provided.
+
+    Returns
+    -------
+    typing.Callable
+        Dependency.
+    """
+
+    async def get_listing_query_params(
+        page: typing.Optional[int] = None,
+        per_page: typing.Optional[int] = None,
+        search: typing.Optional[str] = None,
+        sort: typing.Optional[str] = None,
+        order: typing.Optional[str] = None,
+        after: typing.Optional[str] = None,
+        keyset: bool = False,
+        with_total: bool = True,
+    ) -> typing.Dict[str, typing.Any]:
+        query_params = {}
+        page_params = {'keyset': keyset, 'with_total': with_total}
+        if page is not None:
+            page_params['page'] = page
+        if per_page is not None:
+            page_params['per_page'] = per_page
+        if sort is not None:
+            page_params['sort'] = sort
+        if order is not None:
+            page_params['order'] = order
+        if after is not None:
+            page_params['after'] = after
+        try:
+            query_params['page'] = PaginationArgs(**page_params)
+        except pydantic.ValidationError as ex:
+            raise HTTPException(status_code=422, detail=ex.errors())
+        if entity is not None:
+            try:
+                validate_pagination_args(entity, query_params['page'])
+            except ValueError as ex:
+                raise HTTPException(status_code=422, detail=str(ex))
+        if search is not None:
+            query_params['search'] = search
+        return query_params
+
+    return get_listing_query_params
+
+
+# listing parameters of routes that do not sort by columns of an entity
+get_listing_query_params = listing_query_params()
 
 
 async def get_current_active_user(
@@ -102,6 +182,31 @@ def create_access_token(
     return encoded_jwt
 
 
+def get_current_assignment(
+    project_id: typing.Optional[int] = None,
+    user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+) -> typing.Optional[schemas.Assignment]:
+    """Get the assignment of the current user to the project of the request.
+
+    Dependencies are cached per request so the assignment is resolved once
+    however many `roles_required` checks a route has.
+    """
+    if project_id is None:
+        return None
+    key = (user.id, project_id)
+    version = assignment_cache.version
+    assignment = assignment_cache.get(key, default=False)
+    if assignment is False:
+        assignment = op.get_assignment_by(
+            session,
+            user_id=user.id,
+            project_id=project_id
+        )
+        assignment_cache.set(key, assignment, version=version)
+    return None if assignment is None else assignment.copy()
+
+
 def roles_required(
     role: typing.Union[str, typing.Collection[str]],
     allow_admin: bool = True,
@@ -118,9 +223,10 @@ def roles_required(
         role.add(schemas.AssignmentRoleEnum.default)
 
     def check_user_role(
-        project_id: typing.Optional[int] = None,
         user: schemas.User = Depends(get_current_active_user),
-        session: Session = Depends(get_session),
+        assignment: typing.Optional[schemas.Assignment] = Depends(
+            get_current_assignment
+        ),
     ) -> bool:
         if allow_admin and user.role == schemas.UserRoleEnum.admin:
             return True
@@ -131,14 +237,6 @@ def roles_required(
                 status_code=403,
                 detail='You do not have permission to perform this action',
             )
-        if project_id is None and role:
-            assignment = None
-        else:
-            assignment = op.get_assignment_by(
-                session,
-                user_id=user.id,
-                project_id=project_id
-            )
         if not assignment or assignment.role not in role:
             if not raise_exception:
                 return False
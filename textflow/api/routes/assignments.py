@@ -29,7 +29,7 @@ router = APIRouter(
 
 
 @router.post('/{username}/role', response_model=schemas.Assignment)
-async def assign_project(
+def assign_project(
     project_id: int,
     username: str,
     role: schemas.AssignmentRoleEnum,
@@ -67,7 +67,7 @@ async def assign_project(
     assignment = schemas.Assignment(
         user_id=user.id,
         project_id=project_id,
-        role=role.role
+        role=role
     )
     assignment = op.create_assignment(
         session, assignment=assignment
@@ -81,7 +81,7 @@ async def assign_project(
         404: {'description': 'Assignment not found'},
     }
 )
-async def update_project_role(
+def update_project_role(
     project_id: int, username: str,
     role: schemas.AssignmentRoleEnum,
     session: Session = Depends(get_session),
@@ -125,7 +125,7 @@ async def update_project_role(
             status_code=404,
             detail='Assignment not found'
         )
-    assignment.role = role.role
+    assignment.role = role
     assignment = op.update_assignment(
         session,
         assignment=assignment,
@@ -1,5 +1,9 @@
-"""Routes for assignments."""
-from fastapi import APIRouter, Depends
+"""Routes for documents."""
+import logging
+import shutil
+import typing
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile
 
 from sqlalchemy.orm import Session
 
@@ -11,11 +15,17 @@ from textflow.api.dependencies import (
 
 from textflow import schemas
 from textflow.database import op
+from textflow.services.jobs import jobs
+from textflow.services.scheduler import scheduler
+from textflow.utils import readers
+from textflow.utils.text import token_cache
 
 __all__ = [
     'router',
 ]
 
+logger = logging.getLogger(__name__)
+
 
 router = APIRouter(
     prefix='/projects/{project_id}/documents',
@@ -28,7 +38,7 @@ router = APIRouter(
 
 
 @router.put('/')
-async def create_document(
+def create_document(
     project_id: int,
     document: schemas.DocumentBase,
     session: Session = Depends(get_session),
@@ -41,8 +51,117 @@ async def create_document(
     return document
 
 
+@router.post('/bulk', status_code=202, response_model=schemas.BackgroundJob)
+def create_documents(
+    project_id: int,
+    file: UploadFile,
+    format: typing.Optional[str] = None,
+    batch_size: int = 10000,
+    tokenize: bool = False,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required({'admin'})),
+):
+    """Add documents from a JSONL or CSV file in a background job.
+
+    Notes
+    -----
+    Every record must have a `text` field and can have `source_id` and
+    `meta` fields. The format is guessed from the file name if not provided.
+    With `tokenize` the token offsets of the documents are computed in
+    worker processes and stored after the documents are added. Tasks with a
+    trained auto-model pre-annotate the new documents in another job.
+    """
+    if format is None:
+        format = readers.guess_format(file.filename)
+    if format not in readers.FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail='Unable to determine the format of the file'
+        )
+    path = jobs.new_path(f'.{format}')
+    with open(path, 'wb') as fp:
+        shutil.copyfileobj(file.file, fp)
+    return jobs.submit(session, 'import_documents', params={
+        'project_id': project_id,
+        'path': path,
+        'format': format,
+        'batch_size': batch_size,
+        'tokenize': tokenize,
+        'tokenizer': token_cache.tokenizer.name,
+    }, user_id=current_user.id, project_id=project_id)
+
+
+@router.post('/tokens', status_code=202,
+             response_model=schemas.BackgroundJob)
+def create_document_tokens(
+    project_id: int,
+    batch_size: int = 10000,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required({'admin'})),
+):
+    """Store the token offsets of the documents in a background job."""
+    return jobs.submit(session, 'tokenize_documents', params={
+        'project_id': project_id,
+        'tokenizer': token_cache.tokenizer.name,
+        'batch_size': batch_size,
+    }, user_id=current_user.id, project_id=project_id, unique=True)
+
+
+@router.delete('/', status_code=202, response_model=schemas.BackgroundJob)
+def delete_documents(
+    project_id: int,
+    batch_size: int = 10000,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required({'admin'})),
+):
+    """Delete the documents of a project in a background job.
+
+    Notes
+    -----
+    The annotations, token offsets and suggestions of the documents are
+    deleted with them, `batch_size` documents per transaction.
+    """
+    return jobs.submit(session, 'delete_documents', params={
+        'project_id': project_id,
+        'batch_size': batch_size,
+    }, user_id=current_user.id, project_id=project_id, unique=True)
+
+
+@router.get('/next', response_model=schemas.Document)
+def get_next_document(
+    project_id: int,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('default')),
+):
+    """Lease the next document to annotate to the current user.
+
+    Notes
+    -----
+    The same document is returned until the user completes or skips it or
+    the lease expires.
+    """
+    while True:
+        document_id = scheduler.acquire(
+            session, project_id=project_id, user_id=current_user.id,
+        )
+        if document_id is None:
+            raise HTTPException(
+                status_code=404,
+                detail='No documents left to annotate'
+            )
+        document = op.get_document(session, document_id=document_id)
+        if document is not None:
+            return document
+        # the document was deleted
+        scheduler.discard(project_id=project_id, document_id=document_id)
+
+
 @router.put('/')
-async def get_documents_of_project(
+def get_documents_of_project(
     project_id: int,
     session: Session = Depends(get_session),
     _: bool = Depends(roles_required({'admin'})),
@@ -52,10 +171,81 @@ async def get_documents_of_project(
 
 
 @router.put('/{document_id}')
-async def get_document(
+def get_document(
     document_id: int,
     session: Session = Depends(get_session),
     _: bool = Depends(roles_required({'admin'})),
 ):
     documents = op.get_document(session, document_id=document_id)
     return documents
+
+
+@router.get('/{document_id}/tokens')
+def get_document_tokens(
+    project_id: int,
+    document_id: int,
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('default')),
+):
+    """Get the token offsets of a document as `[start, end]` pairs.
+
+    Notes
+    -----
+    Offsets are cached per document and text (see
+    `textflow.utils.text.token_cache`) and read from the stored offsets of
+    the document if it was tokenized at ingestion.
+    """
+    document = op.get_document(session, document_id=document_id)
+    if document is None or document.project_id != project_id:
+        raise HTTPException(
+            status_code=404,
+            detail='Document not found'
+        )
+    offsets = token_cache.get(
+        document.id, document.text,
+        load=lambda ids: op.list_document_tokens(
+            session, document_ids=ids, tokenizer=token_cache.tokenizer.name,
+        ),
+    )
+    return {'document_id': document.id, 'tokens': offsets.tolist()}
+
+
+@router.get('/{document_id}/suggestions',
+            response_model=typing.List[schemas.Suggestion])
+def get_document_suggestions(
+    project_id: int,
+    document_id: int,
+    task_id: typing.Optional[int] = None,
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('default')),
+):
+    """Get the suggestions of the auto-models for a document."""
+    document = op.get_document(session, document_id=document_id)
+    if document is None or document.project_id != project_id:
+        raise HTTPException(
+            status_code=404,
+            detail='Document not found'
+        )
+    return op.list_suggestions(session, document_id=document_id,
+                               task_id=task_id)
+
+
+@router.get('/{document_id}/annotation-sets',
+            response_model=typing.List[schemas.AnnotationSetTree])
+def get_document_annotation_sets(
+    project_id: int,
+    document_id: int,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('default')),
+):
+    """Get the annotation sets of the current user for a document with their
+    annotations, spans and labels."""
+    document = op.get_document(session, document_id=document_id)
+    if document is None or document.project_id != project_id:
+        raise HTTPException(
+            status_code=404,
+            detail='Document not found'
+        )
+    return op.list_annotation_set_trees(session, document_id=document_id,
+                                        user_id=current_user.id)
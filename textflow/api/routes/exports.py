@@ -0,0 +1,123 @@
+"""Routes for exports."""
+import typing
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from sqlalchemy.orm import Session
+
+from textflow.api.dependencies import (
+    get_current_active_user,
+    roles_required,
+    get_session,
+)
+
+from textflow import schemas
+from textflow.database import db, op
+from textflow.services import export
+from textflow.services.jobs import jobs
+
+__all__ = [
+    'router',
+]
+
+
+router = APIRouter(
+    prefix='/projects/{project_id}/export',
+    tags=['Exports'],
+    dependencies=[Depends(get_current_active_user)],
+    responses={
+        404: {'description': 'Not found'}
+    },
+)
+
+
+def _stream(iter_chunks: typing.Callable, **kwargs):
+    # the response is streamed after the request dependencies are closed
+    with db.session() as session:
+        yield from iter_chunks(session, **kwargs)
+
+
+def _get_export_kwargs(session, project_id, format, completed_only, tokens,
+                       batch_size):
+    if op.get_project(session, project_id=project_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail='Project not found'
+        )
+    if batch_size is not None and batch_size < 1:
+        raise HTTPException(
+            status_code=422,
+            detail='Batch size must be positive'
+        )
+    if format != 'ndjson':
+        try:
+            export.import_pyarrow()
+        except ImportError as ex:
+            raise HTTPException(status_code=501, detail=str(ex))
+    kwargs = {'project_id': project_id, 'completed_only': completed_only}
+    if batch_size is not None:
+        kwargs['batch_size'] = batch_size
+    if tokens and format == 'ndjson':
+        kwargs['tokens'] = True
+    return kwargs
+
+
+@router.get('/')
+def export_project(
+    project_id: int,
+    format: str = Query(default='ndjson', regex='^(ndjson|parquet|arrow)$'),
+    completed_only: bool = False,
+    tokens: bool = False,
+    batch_size: typing.Optional[int] = None,
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('admin|manager')),
+):
+    """Export a project.
+
+    Notes
+    -----
+    `ndjson` exports the documents of the project with their annotations
+    (one document per line). `parquet` and `arrow` export a table of the
+    annotations (one row per label of an annotation) and require pyarrow.
+    The batch size is the number of documents (`ndjson`) or rows per row
+    group (`parquet`, `arrow`). `tokens` adds the token offsets of the
+    documents to `ndjson` exports.
+    """
+    kwargs = _get_export_kwargs(session, project_id, format,
+                                completed_only, tokens, batch_size)
+    iter_chunks, media_type, extension = export.FORMATS[format]
+    return StreamingResponse(
+        _stream(iter_chunks, **kwargs),
+        media_type=media_type,
+        headers={
+            'Content-Disposition':
+                f'attachment; filename="project-{project_id}.{extension}"',
+        },
+    )
+
+
+@router.post('/', status_code=202, response_model=schemas.BackgroundJob)
+def create_export_job(
+    project_id: int,
+    format: str = Query(default='ndjson', regex='^(ndjson|parquet|arrow)$'),
+    completed_only: bool = False,
+    tokens: bool = False,
+    batch_size: typing.Optional[int] = None,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('admin|manager')),
+):
+    """Export a project to a file in a background job.
+
+    Notes
+    -----
+    The options are the same as for streamed exports. The file is downloaded
+    from `/jobs/{job_id}/download` when the job is done.
+    """
+    kwargs = _get_export_kwargs(session, project_id, format, completed_only,
+                                tokens, batch_size)
+    extension = export.FORMATS[format][2]
+    kwargs.update(format=format, path=jobs.new_path(f'.{extension}'))
+    return jobs.submit(session, 'export_project', params=kwargs,
+                       user_id=current_user.id, project_id=project_id)
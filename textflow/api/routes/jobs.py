@@ -0,0 +1,117 @@
+"""Routes for background jobs."""
+import os
+import typing
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from sqlalchemy.orm import Session
+
+from textflow.api.dependencies import (
+    get_current_active_user,
+    get_session,
+)
+
+from textflow import schemas
+from textflow.database import op
+# the service modules register their job types
+from textflow.services import activelearning, automodel  # noqa: F401
+from textflow.services import documents, export  # noqa: F401
+from textflow.services import preannotation  # noqa: F401
+from textflow.services.jobs import is_cancellable
+
+__all__ = [
+    'router',
+]
+
+router = APIRouter(
+    prefix='/jobs',
+    tags=['Jobs'],
+    dependencies=[Depends(get_current_active_user)],
+    responses={
+        404: {'description': 'Not found'}
+    },
+)
+
+
+def _get_job(session, job_id, user):
+    job = op.get_background_job(session, job_id=job_id)
+    # users other than admins only see their own jobs
+    if job is None or (user.role != schemas.UserRoleEnum.admin and
+                       job.user_id != user.id):
+        raise HTTPException(
+            status_code=404,
+            detail='Job not found'
+        )
+    return job
+
+
+@router.get('/', response_model=typing.List[schemas.BackgroundJob])
+@router.get('', response_model=typing.List[schemas.BackgroundJob])
+def list_jobs(
+    project_id: typing.Optional[int] = None,
+    status: typing.Optional[typing.List[schemas.JobStatusEnum]] = None,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """List background jobs (latest first)."""
+    user_id = None
+    if current_user.role != schemas.UserRoleEnum.admin:
+        user_id = current_user.id
+    return op.list_background_jobs(session, user_id=user_id,
+                                   project_id=project_id, status=status)
+
+
+@router.get('/{job_id}', response_model=schemas.BackgroundJob)
+def read_job(
+    job_id: str,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    return _get_job(session, job_id, current_user)
+
+
+@router.post('/{job_id}/cancel', response_model=schemas.BackgroundJob)
+def cancel_job(
+    job_id: str,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Cancel a job.
+
+    Notes
+    -----
+    Queued jobs are cancelled immediately. Running jobs stop at their next
+    progress update. Running jobs that report no progress (e.g., training)
+    cannot be cancelled.
+    """
+    job = _get_job(session, job_id, current_user)
+    cancellable = is_cancellable(job.name)
+    if job.status == schemas.JobStatusEnum.running and not cancellable:
+        raise HTTPException(
+            status_code=409,
+            detail='Job cannot be cancelled while it is running'
+        )
+    # a job that started since is left running
+    return op.cancel_background_job(session, job_id=job_id,
+                                    running=cancellable)
+
+
+@router.get('/{job_id}/download')
+def download_job_result(
+    job_id: str,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+):
+    """Download the file written by a finished job (e.g., an export)."""
+    job = _get_job(session, job_id, current_user)
+    result = job.result if isinstance(job.result, dict) else {}
+    path = result.get('path')
+    if job.status != schemas.JobStatusEnum.done or path is None or \
+            not os.path.exists(path):
+        raise HTTPException(
+            status_code=404,
+            detail='Job has no file'
+        )
+    return FileResponse(path, media_type=result.get('media_type'),
+                        filename=result.get('filename'))
@@ -6,14 +6,18 @@ from sqlalchemy.orm import Session
 
 from textflow.api.dependencies import (
     get_current_active_user,
-    get_listing_query_params,
+    listing_query_params,
     roles_required,
     get_session,
 )
 
 from textflow import schemas
 from textflow.database import op, Pagination
+from textflow.models import Project
 from textflow.schemas.user import UserRoleEnum
+from textflow.services.agreement import agreement
+from textflow.services.scheduler import scheduler
+from textflow.services.stats import stats
 
 __all__ = [
     'router',
@@ -33,8 +37,8 @@ router = APIRouter(
     Pagination[schemas.Project],
     typing.List[schemas.Project]
 ])
-async def read_projects(
-    q: dict[typing.Any] = Depends(get_listing_query_params),
+def read_projects(
+    q: dict[typing.Any] = Depends(listing_query_params(Project)),
     current_user: schemas.User = Depends(get_current_active_user),
     session: Session = Depends(get_session),
     # _: bool = Depends(roles_required()),
@@ -49,7 +53,7 @@ async def read_projects(
 
 
 @router.post('/')
-async def create_project(
+def create_project(
     project: schemas.ProjectBase,
     session: Session = Depends(get_session),
     _: bool = Depends(roles_required('admin')),
@@ -60,7 +64,7 @@ async def create_project(
 
 
 @router.get('/{project_id}', response_model=schemas.Project)
-async def read_project(
+def read_project(
     project_id: int,
     session: Session = Depends(get_session),
     _: bool = Depends(roles_required('admin')),
@@ -75,7 +79,7 @@ async def read_project(
 
 
 @router.put('/{project_id}')
-async def update_project(
+def update_project(
     project_id: int,
     project: schemas.ProjectBase,
     session: Session = Depends(get_session),
@@ -83,4 +87,49 @@ async def update_project(
 ):
     project = schemas.Project(id=project_id, **project.dict())
     project = op.update_project(session, project=project)
+    # the redundancy or ordering of the project may have changed
+    stats.invalidate(project_id)
+    scheduler.invalidate(project_id)
     return project
+
+
+@router.get('/{project_id}/stats')
+def read_project_stats(
+    project_id: int,
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('admin|manager')),
+):
+    if op.get_project(session, project_id=project_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail='Project not found'
+        )
+    return stats.get_project_report(session, project_id=project_id)
+
+
+@router.get('/{project_id}/stats/agreement')
+def read_project_agreement(
+    project_id: int,
+    task_id: typing.Optional[int] = None,
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('admin|manager')),
+):
+    if op.get_project(session, project_id=project_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail='Project not found'
+        )
+    return agreement.get_report(session, project_id=project_id,
+                                task_id=task_id)
+
+
+@router.get('/{project_id}/stats/me')
+def read_project_stats_of_current_user(
+    project_id: int,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('default')),
+):
+    return stats.get_user_report(
+        session, project_id=project_id, user_id=current_user.id,
+    )
@@ -6,14 +6,18 @@ from sqlalchemy.orm import Session
 
 from textflow.api.dependencies import (
     get_current_active_user,
-    get_listing_query_params,
+    listing_query_params,
     roles_required,
     get_session,
 )
 
 from textflow import schemas
 from textflow.database import op, Pagination
+from textflow.models import Task
 from textflow.schemas.user import UserRoleEnum
+from textflow.services.automodel import UNCERTAINTY_METHODS, automodels, \
+    get_model_type
+from textflow.services.jobs import jobs
 
 __all__ = [
     'router',
@@ -37,9 +41,9 @@ router = APIRouter(
     Pagination[schemas.Task],
     typing.List[schemas.Task]
 ])
-async def read_tasks(
+def read_tasks(
     project_id: int,
-    q: dict[typing.Any] = Depends(get_listing_query_params),
+    q: dict[typing.Any] = Depends(listing_query_params(Task)),
     current_user: schemas.User = Depends(get_current_active_user),
     session: Session = Depends(get_session),
     _: bool = Depends(roles_required('default')),
@@ -56,7 +60,7 @@ async def read_tasks(
 
 @router.post('/', response_model=schemas.Task, status_code=201)
 @router.post('', response_model=schemas.Task, status_code=201)
-async def create_task(
+def create_task(
     project_id: int,
     task: schemas.TaskBase,
     session: Session = Depends(get_session),
@@ -68,7 +72,7 @@ async def create_task(
 
 
 @router.get('/{task_id}', response_model=schemas.Task)
-async def read_task(
+def read_task(
     project_id: int,
     task_id: int,
     session: Session = Depends(get_session),
@@ -84,7 +88,7 @@ async def read_task(
 
 
 @router.put('/{task_id}')
-async def update_task(
+def update_task(
     project_id: int,
     task_id: int,
     task: schemas.TaskBase,
@@ -94,3 +98,101 @@ async def update_task(
     task = schemas.Task(id=task_id, project_id=project_id, **task.dict())
     task = op.update_task(session, task=task)
     return task
+
+
+@router.post('/{task_id}/automodel', status_code=202,
+             response_model=schemas.BackgroundJob)
+def train_automodel(
+    project_id: int,
+    task_id: int,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('admin|manager')),
+):
+    """Train the auto-model of a task in a background job.
+
+    Notes
+    -----
+    Models are cached by the snapshot of the annotations of the task, so
+    the task is only trained again if its annotations changed.
+    """
+    task = op.get_task(session, project_id=project_id, task_id=task_id)
+    if task is None:
+        raise HTTPException(
+            status_code=404,
+            detail='Task not found'
+        )
+    if get_model_type(task.type) is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f'Tasks of type {task.type!r} have no auto-model'
+        )
+    return jobs.submit(session, 'train_automodel', unique=True,
+                       params={'project_id': project_id, 'task_id': task_id},
+                       user_id=current_user.id, project_id=project_id)
+
+
+@router.get('/{task_id}/automodel')
+def read_automodel_status(
+    project_id: int,
+    task_id: int,
+    _: bool = Depends(roles_required('admin|manager')),
+):
+    return automodels.get_status(project_id, task_id)
+
+
+def _get_trained_task(session, project_id, task_id):
+    task = op.get_task(session, project_id=project_id, task_id=task_id)
+    if task is None:
+        raise HTTPException(
+            status_code=404,
+            detail='Task not found'
+        )
+    if automodels.get_model(project_id, task_id) is None:
+        raise HTTPException(
+            status_code=409,
+            detail='Task has no trained auto-model'
+        )
+    return task
+
+
+@router.post('/{task_id}/suggestions', status_code=202,
+             response_model=schemas.BackgroundJob)
+def preannotate_documents(
+    project_id: int,
+    task_id: int,
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('admin|manager')),
+):
+    """Pre-annotate the unannotated documents with the auto-model of a task
+    in a background job."""
+    _get_trained_task(session, project_id, task_id)
+    return jobs.submit(session, 'preannotate', unique=True,
+                       params={'project_id': project_id, 'task_id': task_id},
+                       user_id=current_user.id, project_id=project_id)
+
+
+@router.post('/{task_id}/priorities', status_code=202,
+             response_model=schemas.BackgroundJob)
+def prioritize_documents(
+    project_id: int,
+    task_id: int,
+    method: str = 'entropy',
+    current_user: schemas.User = Depends(get_current_active_user),
+    session: Session = Depends(get_session),
+    _: bool = Depends(roles_required('admin|manager')),
+):
+    """Set the priorities of the unannotated documents to the uncertainty of
+    the auto-model of a task in a background job (used by projects ordered
+    by `uncertainty`)."""
+    if method not in UNCERTAINTY_METHODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f'Method must be one of {", ".join(UNCERTAINTY_METHODS)}'
+        )
+    _get_trained_task(session, project_id, task_id)
+    return jobs.submit(session, 'prioritize', unique=True,
+                       params={'project_id': project_id, 'task_id': task_id,
+                               'method': method},
+                       user_id=current_user.id, project_id=project_id)
@@ -29,7 +29,7 @@ async def read_tokens(token: str = Depends(oauth2_scheme)):
 
 
 @router.post('/')
-async def login(
+def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     session: Session = Depends(get_session),
 ):
@@ -27,7 +27,7 @@ async def read_users_me(current_user: schemas.User =
 
 
 @router.post('/', response_model=schemas.User)
-async def create_user(
+def create_user(
     user: schemas.User,
     session: Session = Depends(get_session),
 ):
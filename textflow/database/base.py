@@ -15,11 +15,27 @@ Example
 import contextlib
 import typing
 
-from sqlalchemy import Engine, create_engine
+import sqlalchemy as sa
+from sqlalchemy import Engine, Row, and_, or_
 from sqlalchemy.orm import sessionmaker, Query, Session
+from sqlalchemy.sql import operators
 
-from textflow.database.pagination import Pagination, PaginationArgs
+from textflow.database.pagination import (
+    Pagination,
+    PaginationArgs,
+    decode_cursor,
+    encode_cursor,
+)
 from textflow.database.operations import create_user, get_user_by
+from textflow.database import events  # noqa: F401 - registers handlers
+from textflow.database import migrations
+from textflow.database.engine import create_engine
+from textflow.database.routing import (
+    DEFAULT_COOLDOWN,
+    ReplicaSet,
+    RoutingSession,
+)
+from textflow.database import sqlite
 from textflow.models import mapper_registry as default_mapper_registry
 from textflow import schemas
 
@@ -28,29 +44,51 @@ class BaseQuery(Query):
     def paginate(self, page, *, per_page=20, error_out=True):
         """Return `Pagination` instance using already defined query
         parameters.
+
+        Notes
+        -----
+        If `page` is a `PaginationArgs` in keyset mode (`keyset=True` or an
+        `after` cursor is given) the page is located with a `WHERE` on the
+        sort key instead of `OFFSET`, so that deep pages cost the same as
+        the first one.
         """
         if page is None:
             return self.all()
+        with_total, sort, order = True, None, None
         if isinstance(page, PaginationArgs):
             error_out = page.error_out
             per_page = page.per_page
+            with_total = page.with_total
+            sort, order = page.sort, page.order
+            if page.is_keyset:
+                return self._paginate_keyset(page, per_page=per_page)
             page = page.page
         if page < 1:
             if error_out:
                 raise IndexError
             page = PaginationArgs.page.default
-        if per_page is None:
-            per_page = PaginationArgs.per_page.default
-        if per_page > PaginationArgs.per_page.le:
-            per_page = PaginationArgs.per_page.le
+        per_page = self._get_per_page(per_page)
+        query = self
+        if sort is not None:
+            query = query.order_by(None).order_by(
+                *self._get_sort_key(sort, order))
         # query.limit(self.per_page).offset(self._query_offset).all()
         query_offset = (page - 1) * per_page
-        items = self.limit(per_page).offset(query_offset).all()
+        if with_total:
+            items = query.limit(per_page).offset(query_offset).all()
+            has_next = None
+        else:
+            # fetch one more item to see whether there is a next page
+            items = query.limit(per_page + 1).offset(query_offset).all()
+            has_next = len(items) > per_page
+            items = items[:per_page]
         if not items and page != 1 and error_out:
             raise IndexError
         # No need to count if we're on the first page and there are fewer items
         # than we expected.
-        if page == 1 and len(items) < per_page:
+        if not with_total:
+            total = None
+        elif page == 1 and len(items) < per_page:
             total = len(items)
         else:
             total = self.order_by(None).count()
@@ -59,8 +97,175 @@ class BaseQuery(Query):
             per_page=per_page,
             total=total,
             items=items,
+            has_next=has_next,
         )
 
+    def _paginate_keyset(self, args, *, per_page):
+        per_page = self._get_per_page(per_page)
+        key = self._get_sort_key(args.sort, args.order)
+        columns = [c.element for c in key]
+        query = self.order_by(None).order_by(*key)
+        if args.after is not None:
+            values = decode_cursor(args.after, _get_python_types(columns))
+            dialect = self.session.get_bind(mapper=self._get_mapper()) \
+                .dialect
+            query = query.filter(_keyset_filter(
+                key, values, nulls_first=_nulls_first(dialect.name),
+            ))
+        items = query.limit(per_page + 1).all()
+        has_next = len(items) > per_page
+        items = items[:per_page]
+        next_after = None
+        if has_next:
+            last = items[-1]
+            if isinstance(last, Row):
+                last = last[0]
+            next_after = encode_cursor([
+                getattr(last, name) for name in self._get_attr_names(columns)
+            ])
+        total = self.order_by(None).count() if args.with_total else None
+        return Pagination(
+            page=1,
+            per_page=per_page,
+            total=total,
+            items=items,
+            has_prev=args.after is not None,
+            has_next=has_next,
+            after=args.after,
+            next_after=next_after,
+        )
+
+    @staticmethod
+    def _get_per_page(per_page):
+        if per_page is None:
+            per_page = PaginationArgs.per_page.default
+        if per_page > PaginationArgs.per_page.le:
+            per_page = PaginationArgs.per_page.le
+        return per_page
+
+    def _get_mapper(self):
+        return sa.inspect(self.column_descriptions[0]['entity'])
+
+    def _get_sort_key(self, sort=None, order=None):
+        """Get the ordering of the query as a unique key (see
+        `get_sort_key`)."""
+        return get_sort_key(self._get_mapper(), sort, order)
+
+    def _get_attr_names(self, columns):
+        mapper = self._get_mapper()
+        return [mapper.get_property_by_column(c).key for c in columns]
+
+
+# dialects that sort NULL before every value in ascending order (the others,
+# e.g. PostgreSQL, sort it after every value)
+NULLS_FIRST_DIALECTS = ('sqlite', 'mysql', 'mariadb', 'mssql')
+
+
+def _nulls_first(dialect_name):
+    return dialect_name in NULLS_FIRST_DIALECTS
+
+
+def _get_python_types(columns):
+    try:
+        return [c.type.python_type for c in columns]
+    except NotImplementedError:
+        raise ValueError('Unable to sort by a column without a python type.')
+
+
+def get_sort_key(entity, sort=None, order=None):
+    """Get the ordering of the rows of an entity as a unique key.
+
+    The primary key of the entity is always appended so that rows with equal
+    sort values keep a stable order.
+
+    Parameters
+    ----------
+    entity
+        Mapped class (or its mapper).
+    sort : typing.Optional[str]
+        Name of the column to sort by.
+    order : typing.Optional[str]
+        `asc` or `desc`.
+
+    Returns
+    -------
+    list
+        Order by clauses.
+
+    Raises
+    ------
+    ValueError
+        If the entity has no column `sort`.
+    """
+    mapper = sa.inspect(entity)
+    columns = []
+    if sort is not None:
+        if sort not in mapper.column_attrs:
+            raise ValueError(f'Unable to sort by \'{sort}\'.')
+        columns.append(mapper.column_attrs[sort].columns[0])
+    for column in mapper.primary_key:
+        if column not in columns:
+            columns.append(column)
+    if order == 'desc':
+        return [c.desc() for c in columns]
+    return [c.asc() for c in columns]
+
+
+def validate_pagination_args(entity, args: PaginationArgs) -> None:
+    """Check the sort column and the cursor of pagination arguments.
+
+    Parameters
+    ----------
+    entity
+        Mapped class that is paginated.
+    args : PaginationArgs
+        Pagination arguments.
+
+    Raises
+    ------
+    ValueError
+        If the entity cannot be sorted by `args.sort` or `args.after` is not
+        a cursor of the sort key.
+    """
+    key = get_sort_key(entity, args.sort, args.order)
+    python_types = _get_python_types([c.element for c in key])
+    if args.after is not None:
+        decode_cursor(args.after, python_types)
+
+
+def _after(expr, value, nulls_first):
+    """Rows that come after `value` in the order of `expr`."""
+    column = expr.element
+    descending = expr.modifier is operators.desc_op
+    # NULL comes after the values in ascending order unless the dialect sorts
+    # it first (and the other way round in descending order)
+    nulls_after = descending == nulls_first
+    if value is None:
+        return column.isnot(None) if not nulls_after else sa.false()
+    condition = column < value if descending else column > value
+    if nulls_after:
+        condition = or_(condition, column.is_(None))
+    return condition
+
+
+def _equals(expr, value):
+    column = expr.element
+    return column.is_(None) if value is None else column == value
+
+
+def _keyset_filter(key, values, nulls_first=True):
+    """Build `(a > x) OR (a = x AND b > y) OR ...` for the given key.
+
+    NULL values of nullable sort columns are placed where the dialect sorts
+    them (first in ascending order if `nulls_first`, last otherwise).
+    """
+    clauses = []
+    for i, (expr, value) in enumerate(zip(key, values)):
+        clauses.append(and_(*[
+            _equals(c, v) for c, v in zip(key[:i], values[:i])
+        ], _after(expr, value, nulls_first)))
+    return or_(*clauses)
+
 
 class DatabaseContext(object):
     def __init__(self, config) -> None:
@@ -69,19 +274,38 @@ class DatabaseContext(object):
 
         Parameters
         ----------
-        uri : str
-            Database URI.
+        config : dict
+            Configuration with `SQLALCHEMY_DATABASE_URI` and optionally
+            `SQLALCHEMY_ENGINE_OPTIONS`, `SQLALCHEMY_SQLITE_PROFILE`,
+            `SQLALCHEMY_REPLICA_URIS` and `SQLALCHEMY_REPLICA_COOLDOWN`.
         """
         SQLALCHEMY_DATABASE_URL = config['SQLALCHEMY_DATABASE_URI']
         self.engine: Engine = create_engine(
             SQLALCHEMY_DATABASE_URL,
-            connect_args={"check_same_thread": False}
+            config.get('SQLALCHEMY_ENGINE_OPTIONS'),
         )
+        if self.engine.dialect.name == 'sqlite':
+            sqlite.configure(self.engine,
+                             config.get('SQLALCHEMY_SQLITE_PROFILE'))
+        # read replicas (not written to, hence no SQLite profile)
+        replica_uris = config.get('SQLALCHEMY_REPLICA_URIS') or []
+        self.replicas: typing.Optional[ReplicaSet] = None
+        if replica_uris:
+            self.replicas = ReplicaSet(
+                [
+                    create_engine(uri, config.get('SQLALCHEMY_ENGINE_OPTIONS'))
+                    for uri in replica_uris
+                ],
+                cooldown=config.get('SQLALCHEMY_REPLICA_COOLDOWN',
+                                    DEFAULT_COOLDOWN),
+            )
         self.Session: sessionmaker = sessionmaker(
+            class_=RoutingSession,
             autocommit=False,
             autoflush=True,
             bind=self.engine,
             query_cls=BaseQuery,
+            replicas=self.replicas,
         )
 
 
@@ -168,8 +392,8 @@ class Database(object):
         None
             None.
         """
-        # create database tables
-        self.mapper_registry.metadata.create_all(self.engine)
+        # create missing tables and update the ones that already existed
+        self.upgrade()
         admin = schemas.User(username='admin', role='admin', password='admin')
         with self.session() as session:
             if get_user_by(session, username=admin.username) is None:
@@ -179,5 +403,24 @@ class Database(object):
                 print('admin already exists')
         print('database created')
 
+    def upgrade(self) -> typing.List[str]:
+        """Create missing tables and add missing columns and indexes to
+        existing tables.
+
+        Notes
+        -----
+        A new database has nothing to upgrade and is not inspected further.
+
+        Returns
+        -------
+        typing.List[str]
+            Applied changes.
+        """
+        existing = sa.inspect(self.engine).get_table_names()
+        self.mapper_registry.metadata.create_all(self.engine)
+        if not existing:
+            return []
+        return migrations.upgrade(self.engine, self.mapper_registry.metadata)
+
 
 db: Database = Database()
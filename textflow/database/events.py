@@ -0,0 +1,443 @@
+"""Session event handlers.
+
+This module keeps denormalized data in sync with the ORM changes made
+through any session and notifies in-memory services (caches, schedulers)
+about committed changes. Handlers are registered on import.
+
+Example
+-------
+>>> from textflow.database import events
+>>> @events.listen(events.ANNOTATION_SET_CHANGED)
+... def on_change(changes):
+...     for change in changes:
+...         print(change.document_id, change.old_state, change.new_state)
+
+Functions
+---------
+listen
+    Register a callback for committed changes.
+update_document_counters
+    Maintain `Document.num_completed` and `Document.num_in_progress`.
+track_annotation_changes
+    Read the labels of the annotation sets completed, reopened or changed.
+"""
+import collections
+import itertools
+import logging
+import typing
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from textflow.models import Annotation, AnnotationLabel, AnnotationSet, \
+    Assignment, Document, Label, User
+
+__all__ = [
+    'ANNOTATION_SET_CHANGED',
+    'ANNOTATIONS_CHANGED',
+    'ASSIGNMENTS_CHANGED',
+    'DOCUMENTS_CHANGED',
+    'USERS_CHANGED',
+    'AnnotationSetChange',
+    'get_annotation_set_state',
+    'listen',
+    'remove',
+    'track_annotation_changes',
+    'update_document_counters',
+]
+
+logger = logging.getLogger(__name__)
+
+COMPLETED = 'completed'
+IN_PROGRESS = 'in_progress'
+SKIPPED = 'skipped'
+
+# callbacks receive a list of `AnnotationSetChange`
+ANNOTATION_SET_CHANGED = 'annotation_set_changed'
+# callbacks receive a dict that maps (project_id, document_id, user_id) of
+# annotation sets that were completed, reopened or deleted or whose
+# annotations or labels changed while completed to their label ids by task id
+# (None if the annotation set is not completed). a None key stands for
+# annotation sets that are not known.
+ANNOTATIONS_CHANGED = 'annotations_changed'
+# callbacks receive a set of project ids (None if the project is not known)
+DOCUMENTS_CHANGED = 'documents_changed'
+# callbacks receive a set of usernames (None if the user is not known)
+USERS_CHANGED = 'users_changed'
+# callbacks receive a set of (user_id, project_id) (None if not known)
+ASSIGNMENTS_CHANGED = 'assignments_changed'
+
+_listeners = {
+    ANNOTATION_SET_CHANGED: [],
+    ANNOTATIONS_CHANGED: [],
+    ASSIGNMENTS_CHANGED: [],
+    DOCUMENTS_CHANGED: [],
+    USERS_CHANGED: [],
+}
+
+_INFO_KEY = 'textflow.events'
+# (document_id, user_id) of annotation sets completed or reopened by a flush
+_COMPLETED_KEY = 'textflow.events.completed'
+
+
+class AnnotationSetChange(typing.NamedTuple):
+    """Change of the state of an annotation set.
+
+    Attributes
+    ----------
+    project_id : int
+        Project id of document.
+    document_id : int
+        Document id.
+    user_id : int
+        User id.
+    old_state : typing.Optional[str]
+        State before the change (None if the annotation set is new).
+    new_state : typing.Optional[str]
+        State after the change (None if the annotation set is deleted).
+    num_completed : typing.Optional[int]
+        Number of completed annotation sets of document after the flush
+        that included the change.
+    """
+    project_id: typing.Optional[int]
+    document_id: int
+    user_id: int
+    old_state: typing.Optional[str]
+    new_state: typing.Optional[str]
+    num_completed: typing.Optional[int] = None
+
+
+def listen(name: str, fn: typing.Callable = None):
+    """Register a callback that is called after a commit.
+
+    Notes
+    -----
+    Callbacks are called in the thread that committed the session. Errors
+    raised by callbacks are logged and ignored.
+
+    Parameters
+    ----------
+    name : str
+        `ANNOTATION_SET_CHANGED`, `ANNOTATIONS_CHANGED`,
+        `ASSIGNMENTS_CHANGED`, `DOCUMENTS_CHANGED` or `USERS_CHANGED`.
+    fn : typing.Callable
+        Callback. This can be used as a decorator if not provided.
+
+    Returns
+    -------
+    typing.Callable
+        Callback.
+    """
+    if fn is None:
+        return lambda fn: listen(name, fn)
+    _listeners[name].append(fn)
+    return fn
+
+
+def remove(name: str, fn: typing.Callable) -> None:
+    """Remove a callback registered with `listen`.
+
+    Parameters
+    ----------
+    name : str
+        `ANNOTATION_SET_CHANGED`, `ANNOTATIONS_CHANGED`,
+        `ASSIGNMENTS_CHANGED`, `DOCUMENTS_CHANGED` or `USERS_CHANGED`.
+    fn : typing.Callable
+        Callback.
+    """
+    _listeners[name].remove(fn)
+
+
+def get_annotation_set_state(completed, skipped) -> str:
+    """Get the state of an annotation set.
+
+    Parameters
+    ----------
+    completed : bool
+        Whether the annotation set is completed.
+    skipped : bool
+        Whether the annotation set is skipped.
+
+    Returns
+    -------
+    str
+        `COMPLETED`, `SKIPPED` or `IN_PROGRESS`.
+    """
+    if completed:
+        return COMPLETED
+    if skipped:
+        return SKIPPED
+    return IN_PROGRESS
+
+
+def _get_values(obj, key):
+    """Get the (old, new) values of an attribute from its history."""
+    history = sa.inspect(obj).attrs[key].load_history()
+    if history.unchanged:
+        value = history.unchanged[0]
+        return value, value
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    return old, new
+
+
+def _iter_annotation_set_changes(session):
+    """Iterate (document_id, user_id, old_state, new_state) of pending
+    annotation sets."""
+    for obj in session.new:
+        if isinstance(obj, AnnotationSet):
+            yield obj.document_id, obj.user_id, None, \
+                get_annotation_set_state(obj.completed, obj.skipped)
+    for obj in session.deleted:
+        if isinstance(obj, AnnotationSet):
+            old_document_id, _ = _get_values(obj, 'document_id')
+            old_user_id, _ = _get_values(obj, 'user_id')
+            old_completed, _ = _get_values(obj, 'completed')
+            old_skipped, _ = _get_values(obj, 'skipped')
+            yield old_document_id, old_user_id, get_annotation_set_state(
+                old_completed, old_skipped), None
+    for obj in session.dirty:
+        if not isinstance(obj, AnnotationSet) or \
+                not session.is_modified(obj):
+            continue
+        old_document_id, new_document_id = _get_values(obj, 'document_id')
+        old_user_id, new_user_id = _get_values(obj, 'user_id')
+        old_completed, new_completed = _get_values(obj, 'completed')
+        old_skipped, new_skipped = _get_values(obj, 'skipped')
+        old_state = get_annotation_set_state(old_completed, old_skipped)
+        new_state = get_annotation_set_state(new_completed, new_skipped)
+        if (old_document_id, old_user_id) != \
+                (new_document_id, new_user_id):
+            yield old_document_id, old_user_id, old_state, None
+            yield new_document_id, new_user_id, None, new_state
+        elif old_state != new_state:
+            yield new_document_id, new_user_id, old_state, new_state
+
+
+def _get_pending(session):
+    return session.info.setdefault(_INFO_KEY, {
+        ANNOTATION_SET_CHANGED: [],
+        ANNOTATIONS_CHANGED: {},
+        ASSIGNMENTS_CHANGED: set(),
+        DOCUMENTS_CHANGED: set(),
+        USERS_CHANGED: set(),
+    })
+
+
+def _get_documents(session, document_ids):
+    """Get (project_id, num_completed) of documents by id."""
+    document_ids = {i for i in document_ids if i is not None}
+    if not document_ids:
+        return {}
+    table = Document.__table__
+    rows = session.connection().execute(
+        sa.select(table.c.id, table.c.project_id, table.c.num_completed)
+        .where(table.c.id.in_(document_ids))
+    )
+    return {row.id: (row.project_id, row.num_completed) for row in rows}
+
+
+@sa.event.listens_for(Session, 'before_flush')
+def update_document_counters(session, flush_context, instances):
+    """Apply the pending annotation set changes to the document counters.
+
+    Notes
+    -----
+    Counters are updated with `SET x = x + :delta` in the same transaction
+    as the change itself so that concurrent writers do not lose updates.
+    """
+    changes = list(_iter_annotation_set_changes(session))
+    deltas = collections.defaultdict(collections.Counter)
+    for document_id, _, old_state, new_state in changes:
+        if document_id is None:
+            continue
+        if old_state is not None:
+            deltas[document_id][old_state] -= 1
+        if new_state is not None:
+            deltas[document_id][new_state] += 1
+    params = [
+        {
+            '_id': document_id,
+            '_completed': counter[COMPLETED],
+            '_in_progress': counter[IN_PROGRESS],
+        }
+        for document_id, counter in deltas.items()
+        if counter[COMPLETED] != 0 or counter[IN_PROGRESS] != 0
+    ]
+    if params:
+        table = Document.__table__
+        stmt = sa.update(table) \
+            .where(table.c.id == sa.bindparam('_id')) \
+            .values(
+                num_completed=table.c.num_completed +
+                sa.bindparam('_completed'),
+                num_in_progress=table.c.num_in_progress +
+                sa.bindparam('_in_progress'),
+            )
+        session.connection().execute(stmt, params)
+    # remember the changes to notify the listeners after commit
+    pending = _get_pending(session)
+    if _listeners[ANNOTATIONS_CHANGED]:
+        # the labels are read after the flush
+        session.info.setdefault(_COMPLETED_KEY, set()).update(
+            (document_id, user_id)
+            for document_id, user_id, old_state, new_state in changes
+            if document_id is not None and
+            COMPLETED in (old_state, new_state)
+        )
+    if changes and _listeners[ANNOTATION_SET_CHANGED]:
+        documents = _get_documents(session, deltas.keys())
+        for document_id, user_id, old_state, new_state in changes:
+            project_id, num_completed = \
+                documents.get(document_id, (None, None))
+            pending[ANNOTATION_SET_CHANGED].append(AnnotationSetChange(
+                project_id, document_id, user_id, old_state, new_state,
+                num_completed,
+            ))
+    for obj in session.new:
+        if isinstance(obj, Document):
+            pending[DOCUMENTS_CHANGED].add(obj.project_id)
+    for obj in session.deleted:
+        if isinstance(obj, Document):
+            pending[DOCUMENTS_CHANGED].add(_get_values(obj, 'project_id')[0])
+    for obj in itertools.chain(session.dirty, session.deleted):
+        if isinstance(obj, User):
+            pending[USERS_CHANGED].update(_get_values(obj, 'username'))
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Assignment):
+            pending[ASSIGNMENTS_CHANGED].update(zip(
+                _get_values(obj, 'user_id'), _get_values(obj, 'project_id'),
+            ))
+
+
+@sa.event.listens_for(Session, 'after_flush')
+def track_annotation_changes(session, flush_context):
+    """Read the labels of the annotation sets that were completed, reopened
+    or deleted by the flush and of the completed annotation sets whose
+    annotations or labels were changed by the flush.
+
+    Notes
+    -----
+    This runs after the flush so that new annotations have the ids of their
+    annotation sets and the labels are read as committed. The labels of all
+    annotation sets of a flush are read with a single query.
+    """
+    keys = session.info.pop(_COMPLETED_KEY, set())
+    if not _listeners[ANNOTATIONS_CHANGED]:
+        return
+    annotation_set_ids = set()
+    annotation_ids = set()
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Annotation):
+            annotation_set_ids.update(_get_values(obj, 'annotation_set_id'))
+        elif isinstance(obj, AnnotationLabel):
+            annotation_ids.update(_get_values(obj, 'annotation_id'))
+    annotation_set_ids.discard(None)
+    annotation_ids.discard(None)
+    if not keys and not annotation_set_ids and not annotation_ids:
+        return
+    annotation_set = AnnotationSet.__table__
+    annotation = Annotation.__table__
+    annotation_label = AnnotationLabel.__table__
+    document = Document.__table__
+    label = Label.__table__
+    conditions = []
+    if keys:
+        conditions.append(sa.tuple_(
+            annotation_set.c.document_id, annotation_set.c.user_id,
+        ).in_(keys))
+    if annotation_set_ids:
+        conditions.append(annotation_set.c.id.in_(annotation_set_ids))
+    if annotation_ids:
+        conditions.append(annotation_set.c.id.in_(
+            sa.select(annotation.c.annotation_set_id)
+            .where(annotation.c.id.in_(annotation_ids))
+        ))
+    stmt = sa.select(
+        document.c.project_id,
+        annotation_set.c.document_id,
+        annotation_set.c.user_id,
+        label.c.task_id,
+        annotation_label.c.label_id,
+    ) \
+        .select_from(
+            annotation_set
+            .join(document, document.c.id == annotation_set.c.document_id)
+            .outerjoin(annotation,
+                       annotation.c.annotation_set_id == annotation_set.c.id)
+            .outerjoin(annotation_label,
+                       annotation_label.c.annotation_id == annotation.c.id)
+            .outerjoin(label, label.c.id == annotation_label.c.label_id)
+        ) \
+        .where(annotation_set.c.completed.is_(True), sa.or_(*conditions))
+    # annotation sets that are not completed (anymore)
+    documents = _get_documents(session, (d for d, _ in keys))
+    labels = {
+        (documents[document_id][0], document_id, user_id): None
+        for document_id, user_id in keys if document_id in documents
+    }
+    rows = session.connection().execute(stmt)
+    for project_id, document_id, user_id, task_id, label_id in rows:
+        key = (project_id, document_id, user_id)
+        if labels.get(key) is None:
+            labels[key] = collections.defaultdict(set)
+        if label_id is not None:
+            labels[key][task_id].add(label_id)
+    for key, value in labels.items():
+        if value is not None:
+            labels[key] = {task_id: frozenset(label_ids)
+                           for task_id, label_ids in value.items()}
+    _get_pending(session)[ANNOTATIONS_CHANGED].update(labels)
+
+
+@sa.event.listens_for(Session, 'do_orm_execute')
+def track_bulk_changes(orm_execute_state):
+    """Remember the projects (users, assignments) affected by bulk
+    statements on documents (users, assignments) and that bulk statements
+    on annotations changed unknown annotation sets."""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or
+            orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    pending = _get_pending(orm_execute_state.session)
+    if mapper.class_ in (Annotation, AnnotationLabel):
+        pending[ANNOTATIONS_CHANGED][None] = None
+    if mapper.class_ is User and not orm_execute_state.is_insert:
+        pending[USERS_CHANGED].add(None)
+    if mapper.class_ is Assignment:
+        pending[ASSIGNMENTS_CHANGED].add(None)
+    if mapper.class_ is not Document:
+        return
+    params = orm_execute_state.parameters
+    if orm_execute_state.is_insert and params:
+        if isinstance(params, dict):
+            params = [params]
+        pending[DOCUMENTS_CHANGED].update(p.get('project_id') for p in params)
+    else:
+        # the affected projects are not known
+        pending[DOCUMENTS_CHANGED].add(None)
+
+
+@sa.event.listens_for(Session, 'after_commit')
+def _dispatch(session):
+    pending = session.info.pop(_INFO_KEY, None)
+    if pending is None:
+        return
+    for name, changes in pending.items():
+        if not changes:
+            continue
+        for fn in list(_listeners[name]):
+            try:
+                fn(changes)
+            except Exception:
+                logger.exception(f'Error in listener of {name}.')
+
+
+@sa.event.listens_for(Session, 'after_transaction_end')
+def _discard(session, transaction):
+    if transaction.parent is None:
+        # changes of transactions that were rolled back
+        session.info.pop(_INFO_KEY, None)
+        session.info.pop(_COMPLETED_KEY, None)
@@ -0,0 +1,157 @@
+"""Schema upgrades of existing databases.
+
+`Database.create_all` only creates missing tables. This module brings the
+tables of an existing database up to date with the models by adding the
+columns and indexes that were introduced after the tables were created.
+
+Example
+-------
+>>> from textflow.database import db
+>>> db.upgrade()
+['add column document.num_completed', ...]
+
+Functions
+---------
+upgrade
+    Add missing columns and indexes to existing tables.
+"""
+import logging
+import typing
+
+import sqlalchemy as sa
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+
+from textflow.database.operations import refresh_document_counters
+
+__all__ = [
+    'upgrade',
+]
+
+logger = logging.getLogger(__name__)
+
+# columns whose values are derived from other tables and are recomputed
+# after they are added
+_DERIVED_COLUMNS = {
+    ('document', 'num_completed'),
+    ('document', 'num_in_progress'),
+}
+
+# indexes (and their columns) that were replaced by an index of the
+# models, by table
+_SUPERSEDED_INDEXES = {
+    'document': {
+        # by ix_document_project_id_num_completed_desc(_priority)
+        'ix_document_project_id_num_completed':
+            ('project_id', 'num_completed', 'id'),
+        'ix_document_project_id_num_completed_priority':
+            ('project_id', 'num_completed', 'priority', 'id'),
+    },
+    'annotation_set': {
+        # by the unique uq_annotation_set_user_id_document_id
+        'ix_annotation_set_user_id_document_id': ('user_id', 'document_id'),
+    },
+}
+
+# number of duplicate keys listed when a unique index cannot be created
+_MAX_DUPLICATES = 10
+
+
+def _add_column(conn, column):
+    if not column.nullable and column.server_default is None:
+        raise ValueError(
+            f'Column {column.table.name}.{column.name} is not nullable and '
+            'has no server default. Add it manually.'
+        )
+    spec = sa.schema.CreateColumn(column).compile(dialect=conn.dialect)
+    table = conn.dialect.identifier_preparer.format_table(column.table)
+    conn.execute(sa.text(f'ALTER TABLE {table} ADD COLUMN {spec}'))
+
+
+def _check_unique(conn, index):
+    columns = list(index.columns)
+    count = sa.func.count().label('count')
+    rows = conn.execute(
+        sa.select(*columns, count)
+        .group_by(*columns)
+        .having(count > 1)
+        .order_by(*columns)
+        .limit(_MAX_DUPLICATES + 1)
+    ).all()
+    if not rows:
+        return
+    names = ', '.join(column.name for column in columns)
+    duplicates = '; '.join(
+        f'({", ".join(map(repr, row[:-1]))}) x{row[-1]}'
+        for row in rows[:_MAX_DUPLICATES]
+    )
+    if len(rows) > _MAX_DUPLICATES:
+        duplicates += '; ...'
+    raise ValueError(
+        f'Cannot create unique index {index.name}: table '
+        f'{index.table.name} has duplicate ({names}) rows: {duplicates}. '
+        'Remove the duplicates and upgrade again.'
+    )
+
+
+def upgrade(engine: Engine, metadata: sa.MetaData) -> typing.List[str]:
+    """Add missing columns and indexes to existing tables.
+
+    Notes
+    -----
+    Missing tables are not created (use `MetaData.create_all`). Columns and
+    indexes that are not in the models are kept, except indexes that were
+    replaced by an index of the models. The derived document counters are
+    only recomputed when their columns are added.
+
+    Parameters
+    ----------
+    engine : Engine
+        Database engine.
+    metadata : sa.MetaData
+        Metadata of the models.
+
+    Returns
+    -------
+    typing.List[str]
+        Applied changes.
+
+    Raises
+    ------
+    ValueError
+        If a column cannot be added or a unique index cannot be created
+        because of duplicate rows (no change is applied).
+    """
+    applied = []
+    with engine.begin() as conn:
+        inspector = sa.inspect(conn)
+        existing = set(inspector.get_table_names())
+        for table in metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    _add_column(conn, column)
+                    applied.append(f'add column {table.name}.{column.name}')
+                    logger.info(applied[-1])
+            indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    if index.unique:
+                        _check_unique(conn, index)
+                    index.create(conn)
+                    applied.append(f'create index {index.name}')
+                    logger.info(applied[-1])
+            superseded = _SUPERSEDED_INDEXES.get(table.name, {})
+            for name, names in superseded.items():
+                if name in indexes:
+                    # not added to the table of the models
+                    copy = table.to_metadata(sa.MetaData())
+                    sa.Index(name, *(copy.c[n] for n in names)).drop(conn)
+                    applied.append(f'drop index {name}')
+                    logger.info(applied[-1])
+    if any(f'add column {t}.{c}' in applied for t, c in _DERIVED_COLUMNS):
+        with Session(engine) as session:
+            refresh_document_counters(session)
+    return applied
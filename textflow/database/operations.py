@@ -1,19 +1,30 @@
 import functools
+import itertools
+import json
+import os
 import typing
 
-from sqlalchemy import and_, or_, func
-from sqlalchemy.orm import Session
+import joblib
+from sqlalchemy import and_, or_, delete, func, insert, select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from textflow.database.pagination import Pagination, PaginationArgs, ModelType
+from textflow.database.routing import run_readonly
 from textflow import models, schemas
+from textflow.utils import text as text_utils
 from textflow.models import (
     Assignment,
+    BackgroundJob,
     User,
     Document,
+    DocumentTokens,
     AnnotationSet,
     Project,
     Annotation,
+    AnnotationLabel,
+    AnnotationSpan,
     Label,
+    Suggestion,
     Task,
 )
 
@@ -22,6 +33,20 @@ ModelListType = typing.Union[Pagination[ModelType], typing.List[ModelType]]
 
 PageType = typing.Optional[typing.Union[PaginationArgs, int]]
 
+# loader options of annotations with their span and labels: the spans are
+# joined (one-to-one) and the labels of all annotations are read with one
+# `IN` query instead of one lazy load per annotation
+ANNOTATION_LOADER_OPTIONS = (
+    joinedload(Annotation.span),
+    selectinload(Annotation.labels),
+)
+
+# loader options of annotation sets with their annotations (see above)
+ANNOTATION_SET_LOADER_OPTIONS = (
+    selectinload(AnnotationSet.annotations)
+    .options(*ANNOTATION_LOADER_OPTIONS),
+)
+
 
 def from_orm(model):
     if isinstance(model, Pagination):
@@ -39,19 +64,31 @@ def from_orm(model):
     return Schema.from_orm(model)
 
 
-def operation(func: typing.Callable):
+def operation(func: typing.Callable = None, *, readonly: bool = False):
     """Decorator for database operations.
 
     Parameters
     ----------
     func : typing.Callable
-        Function.
+        Function. This can be used as a decorator factory if not provided.
+    readonly : bool
+        Whether the operation only reads (its queries are routed to read
+        replicas if configured, see `textflow.database.routing`).
 
     Returns
     -------
     typing.Callable
         Function.
     """
+    if func is None:
+        return lambda func: operation(func, readonly=readonly)
+
+    def run(session, **kwargs):
+        # perform the operation
+        output = func(session, **kwargs)
+        # convert the orm output to schema model
+        return from_orm(output)
+
     @functools.wraps(func)
     def wrapper(session, **kwargs):
         # convert the schema input to orm model
@@ -65,14 +102,13 @@ def operation(func: typing.Callable):
             Model = getattr(models, schema_name)
             cols = set(Model.__table__.columns.keys())
             kwargs[key] = Model(**value.dict(include=cols))
-        # perform the operation
-        output = func(session, **kwargs)
-        # convert the orm output to schema model
-        return from_orm(output)
+        if readonly:
+            return run_readonly(session, run, **kwargs)
+        return run(session, **kwargs)
     return wrapper
 
 
-@operation
+@operation(readonly=True)
 def list_users(session: Session, *, page: PageType = None) \
         -> ModelListType[User]:
     """List all users.
@@ -155,7 +191,7 @@ def create_user(session: Session, *, user: User) -> User:
     return user
 
 
-@operation
+@operation(readonly=True)
 def list_documents(
         session: Session,
         page: PageType = None,
@@ -178,9 +214,9 @@ def list_documents(
     return session.query(User).paginate(page)
 
 
-@operation
+@operation(readonly=True)
 def list_documents_by(
-        session: Session, *
+        session: Session, *,
         project_id: int,
         user_id: int = None,
         completed: bool = None,
@@ -219,7 +255,7 @@ def list_documents_by(
         # make sure to keep all documents
         # both with and without annotation set can be marked not completed
         query = query \
-            .leftjoin(
+            .outerjoin(
                 AnnotationSet,
                 AnnotationSet.document_id == Document.id
             ).filter(or_(
@@ -257,10 +293,56 @@ def get_document(session: Session, *, document_id: int) -> \
         .first()
 
 
+def _delete_document_rows(session, where):
+    """Delete the documents that match `where` with the rows that reference
+    them (set-based, dependents first)."""
+    annotation_set = AnnotationSet.__table__
+    annotation = Annotation.__table__
+    document_ids = select(Document.id).where(*where)
+    annotation_set_ids = select(annotation_set.c.id) \
+        .where(annotation_set.c.document_id.in_(document_ids))
+    annotation_ids = select(annotation.c.id) \
+        .where(annotation.c.annotation_set_id.in_(annotation_set_ids))
+    for table in (AnnotationLabel.__table__, AnnotationSpan.__table__):
+        session.execute(
+            delete(table).where(table.c.annotation_id.in_(annotation_ids))
+        )
+    session.execute(
+        delete(annotation)
+        .where(annotation.c.annotation_set_id.in_(annotation_set_ids))
+    )
+    for table in (annotation_set, DocumentTokens.__table__,
+                  Suggestion.__table__):
+        session.execute(
+            delete(table).where(table.c.document_id.in_(document_ids))
+        )
+    # an orm statement, services are notified about the deleted documents
+    return session.query(Document) \
+        .filter(*where) \
+        .delete(synchronize_session=False)
+
+
 @operation
-def delete_documents_by(session: Session, *, project_id: int) -> \
-        typing.Optional[Document]:
-    """Delete document by id.
+def delete_documents(
+    session: Session, *, project_id: int, batch_size: int = 10000,
+) -> typing.Generator[typing.Tuple[int, int], None, int]:
+    """Delete the documents of a project in bulk.
+
+    Notes
+    -----
+    Documents are deleted in chunks of consecutive ids. Every chunk is
+    deleted with one `DELETE ... WHERE ... IN (subquery)` statement per
+    table (annotation labels, spans, annotations, annotation sets, token
+    offsets, suggestions and documents) in its own transaction, so no
+    objects are loaded and no orphaned annotations are left. Chunks that
+    were committed before an error stay deleted.
+
+    Examples
+    --------
+    >>> for num_docs_deleted, num_docs_total in delete_documents(...):
+    ...     print(f'{num_docs_deleted} / {num_docs_total} documents deleted')
+    >>> # or if you need only the final result
+    >>> num_docs_deleted = yield from delete_documents(...)
 
     Parameters
     ----------
@@ -268,22 +350,70 @@ def delete_documents_by(session: Session, *, project_id: int) -> \
         Database session.
     project_id : int
         Project id.
+    batch_size : int
+        Number of documents deleted per transaction.
+
+    Yields
+    ------
+    tuple
+        Number of documents deleted and total number of documents.
 
     Returns
     -------
-    typing.Optional[Document]
-        Document.
+    int
+        Number of documents deleted.
     """
-    try:
-        session.query(Document) \
-            .filter(Document.project_id == project_id) \
-            .delete()
-    except Exception:
-        session.rollback()
-        raise
-    else:
-        session.commit()
-    return None
+    num_docs_total = session.query(func.count(Document.id)) \
+        .filter(Document.project_id == project_id) \
+        .scalar()
+    num_docs_deleted = 0
+    while num_docs_deleted < num_docs_total:
+        # last id of the chunk, read through the (project_id, id) index
+        last_id = session.execute(
+            select(Document.id)
+            .where(Document.project_id == project_id)
+            .order_by(Document.id)
+            .offset(max(batch_size, 1) - 1)
+            .limit(1)
+        ).scalar()
+        where = [Document.project_id == project_id]
+        if last_id is not None:
+            where.append(Document.id <= last_id)
+        try:
+            num_docs_found = _delete_document_rows(session, where)
+        except Exception:
+            session.rollback()
+            raise
+        else:
+            session.commit()
+        if num_docs_found == 0:
+            break
+        num_docs_deleted += num_docs_found
+        yield num_docs_deleted, num_docs_total
+    return num_docs_deleted
+
+
+@operation
+def delete_documents_by(session: Session, *, project_id: int) -> int:
+    """Delete the documents of a project.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+
+    Returns
+    -------
+    int
+        Number of documents deleted.
+    """
+    num_docs_deleted = 0
+    for num_docs_deleted, _ in delete_documents(session,
+                                                project_id=project_id):
+        pass
+    return num_docs_deleted
 
 
 @operation
@@ -312,6 +442,288 @@ def create_document(session: Session, *, doc: Document) -> Document:
     return doc
 
 
+def _to_document_row(document, project_id):
+    if isinstance(document, schemas.DocumentBase):
+        document = document.dict(include={'text', 'source_id', 'meta'})
+    text = document.get('text')
+    if not isinstance(text, str) or len(text) == 0:
+        raise ValueError('Document text must be a non-empty string.')
+    source_id = document.get('source_id')
+    if source_id is not None:
+        source_id = str(source_id)
+    meta = document.get('meta')
+    if isinstance(meta, str):
+        # meta of csv rows (and of DocumentBase) is a JSON string
+        meta = json.loads(meta) if meta.strip() else None
+    return {
+        'text': text,
+        'source_id': source_id,
+        'meta': meta,
+        'project_id': project_id,
+    }
+
+
+@operation
+def create_documents(
+    session: Session, *,
+    project_id: int,
+    documents: typing.Iterable[typing.Union[schemas.DocumentBase, dict]],
+    batch_size: int = 10000,
+) -> typing.Generator[typing.Tuple[int, typing.Optional[int]], None, int]:
+    """Add documents in bulk.
+
+    Notes
+    -----
+    Documents are inserted with a single executemany per batch and every
+    batch is committed in its own transaction. Batches that were committed
+    before an error are kept.
+
+    Examples
+    --------
+    >>> for num_docs_created, num_docs_total in create_documents(...):
+    ...     print(f'{num_docs_created} documents created')
+    >>> # or if you need only the final result
+    >>> num_docs_created = yield from create_documents(...)
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    documents : typing.Iterable[typing.Union[DocumentBase, dict]]
+        Documents (or records with `text`, `source_id` and `meta`).
+    batch_size : int
+        Number of documents inserted per transaction.
+
+    Yields
+    ------
+    tuple
+        Number of documents created and total number of documents (None if
+        unknown).
+
+    Returns
+    -------
+    int
+        Number of documents created.
+    """
+    num_docs_total = len(documents) \
+        if isinstance(documents, typing.Sized) else None
+    num_docs_created = 0
+    rows = []
+    for i, document in enumerate(itertools.chain(documents, [None])):
+        if document is not None:
+            try:
+                rows.append(_to_document_row(document, project_id))
+            except (AttributeError, ValueError) as ex:
+                raise ValueError(f'Invalid document at position {i}.') \
+                    from ex
+            if len(rows) < batch_size:
+                continue
+        if len(rows) == 0:
+            break
+        try:
+            session.execute(insert(Document), rows)
+        except Exception:
+            session.rollback()
+            raise
+        else:
+            session.commit()
+        num_docs_created += len(rows)
+        rows = []
+        yield num_docs_created, num_docs_total
+    return num_docs_created
+
+
+def _select_documents_to_tokenize(project_id, after, batch_size):
+    return select(
+        Document.id,
+        Document.text,
+        DocumentTokens.tokenizer,
+        DocumentTokens.text_hash,
+    ) \
+        .outerjoin(DocumentTokens,
+                   DocumentTokens.document_id == Document.id) \
+        .where(Document.project_id == project_id, Document.id > after) \
+        .order_by(Document.id) \
+        .limit(batch_size)
+
+
+@operation
+def create_document_tokens(
+    session: Session, *,
+    project_id: int,
+    tokenizer: typing.Optional[str] = None,
+    batch_size: int = 10000,
+    n_jobs: typing.Optional[int] = 1,
+) -> typing.Generator[typing.Tuple[int, int], None, int]:
+    """Tokenize the documents of a project and store their token offsets.
+
+    Notes
+    -----
+    Documents are read in keyset batches. The documents of a batch without
+    up to date offsets (new documents, edited texts or another tokenizer)
+    are tokenized in `n_jobs` worker processes and their offsets are
+    written and committed per batch.
+
+    Examples
+    --------
+    >>> num_docs_tokenized = yield from create_document_tokens(...)
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    tokenizer : typing.Optional[str]
+        Name of tokenizer (see `textflow.utils.text.tokenizers`).
+    batch_size : int
+        Number of documents per batch.
+    n_jobs : typing.Optional[int]
+        Number of worker processes (all CPUs if None, in process if 1).
+
+    Yields
+    ------
+    tuple
+        Number of documents tokenized and number of documents read.
+
+    Returns
+    -------
+    int
+        Number of documents tokenized.
+    """
+    tokenizer = text_utils.get_tokenizer(tokenizer).name
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(n_jobs, 1)
+    num_docs_tokenized, num_docs_read = 0, 0
+    after = 0
+    with joblib.Parallel(n_jobs=n_jobs) as parallel:
+        while True:
+            rows = session.execute(
+                _select_documents_to_tokenize(project_id, after, batch_size)
+            ).all()
+            if not rows:
+                break
+            after = rows[-1].id
+            num_docs_read += len(rows)
+            stale = [
+                row for row in rows
+                if row.tokenizer != tokenizer or
+                row.text_hash != text_utils.text_hash(row.text)
+            ]
+            if stale:
+                chunk_size = -(-len(stale) // n_jobs)
+                chunks = parallel(
+                    joblib.delayed(text_utils.pack_offsets)(
+                        [row.text for row in stale[i:i + chunk_size]],
+                        tokenizer,
+                    )
+                    for i in range(0, len(stale), chunk_size)
+                )
+                packed = itertools.chain.from_iterable(chunks)
+                # offsets of edited texts or of another tokenizer
+                outdated = [row.id for row in stale
+                            if row.tokenizer is not None]
+                try:
+                    if outdated:
+                        session.execute(
+                            delete(DocumentTokens).where(
+                                DocumentTokens.document_id.in_(outdated)
+                            )
+                        )
+                    session.execute(insert(DocumentTokens), [
+                        {
+                            'document_id': row.id,
+                            'tokenizer': tokenizer,
+                            'text_hash': digest,
+                            'num_tokens': num_tokens,
+                            'offsets': offsets,
+                        }
+                        for row, (digest, num_tokens, offsets)
+                        in zip(stale, packed)
+                    ])
+                except Exception:
+                    session.rollback()
+                    raise
+                else:
+                    session.commit()
+                num_docs_tokenized += len(stale)
+            else:
+                # end the read transaction of the batch
+                session.commit()
+            yield num_docs_tokenized, num_docs_read
+    return num_docs_tokenized
+
+
+@operation(readonly=True)
+def list_document_tokens(
+    session: Session, *,
+    document_ids: typing.Iterable[int],
+    tokenizer: typing.Optional[str] = None,
+) -> typing.Dict[int, typing.Tuple[bytes, text_utils.TokenOffsets]]:
+    """Get the stored token offsets of documents.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    document_ids : typing.Iterable[int]
+        Document ids.
+    tokenizer : typing.Optional[str]
+        Name of tokenizer (offsets of other tokenizers are left out).
+
+    Returns
+    -------
+    typing.Dict[int, typing.Tuple[bytes, TokenOffsets]]
+        Text hash and token offsets by document id (can be passed to
+        `TokenCache.get_many` as `load`).
+    """
+    tokenizer = text_utils.get_tokenizer(tokenizer).name
+    rows = session.execute(
+        select(DocumentTokens.document_id, DocumentTokens.text_hash,
+               DocumentTokens.offsets)
+        .where(DocumentTokens.document_id.in_(list(document_ids)),
+               DocumentTokens.tokenizer == tokenizer)
+    )
+    return {
+        row.document_id: (
+            row.text_hash, text_utils.TokenOffsets.from_bytes(row.offsets),
+        )
+        for row in rows
+    }
+
+
+@operation(readonly=True)
+def list_suggestions(session: Session, *, document_id: int,
+                     task_id: typing.Optional[int] = None) -> \
+        typing.List[Suggestion]:
+    """List the suggestions of a document.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    document_id : int
+        Document id.
+    task_id : typing.Optional[int]
+        Task id (suggestions of all tasks if None).
+
+    Returns
+    -------
+    typing.List[Suggestion]
+        Suggestions (ordered by task and start).
+    """
+    query = session.query(Suggestion) \
+        .filter(Suggestion.document_id == document_id)
+    if task_id is not None:
+        query = query.filter(Suggestion.task_id == task_id)
+    return query \
+        .order_by(Suggestion.task_id, Suggestion.start, Suggestion.id) \
+        .all()
+
+
 @operation
 def delete_document(session: Session, *, doc: Document) -> Document:
     """Delete document.
@@ -329,6 +741,10 @@ def delete_document(session: Session, *, doc: Document) -> Document:
         Document.
     """
     try:
+        for Model in (DocumentTokens, Suggestion):
+            session.query(Model) \
+                .filter(Model.document_id == doc.id) \
+                .delete(synchronize_session=False)
         session.delete(doc)
     except Exception:
         session.rollback()
@@ -346,18 +762,18 @@ def delete_document_by(session: Session, *, document_id: int) -> Document:
     ----------
     session : Session
         Database session.
-    id : int
+    document_id : int
         Document id.
 
     Returns
     -------
     Document
-        Document.
+        Document (None if not found).
     """
-    doc = get_document(session, document_id)
+    doc = session.get(Document, document_id)
     if doc is None:
         return None
-    return delete_document(session, document_id)
+    return delete_document(session, doc=doc)
 
 
 @operation
@@ -365,6 +781,16 @@ def get_next_document(session: Session, *, user_id: int, project_id: int) \
         -> typing.Optional[Document]:
     """Get next document to annotate.
 
+    Notes
+    -----
+    Documents that are closest to reaching the redundancy of the project
+    are handed out first. The candidates are read in a single query in the
+    order of the `(project_id, num_completed DESC, id)` index of documents
+    instead of counting the annotation sets of every document. Projects
+    ordered by `uncertainty` hand out documents of the same completion count
+    by descending `Document.priority` (using the
+    `(project_id, num_completed DESC, priority DESC, id)` index).
+
     Parameters
     ----------
     session : Session
@@ -379,39 +805,90 @@ def get_next_document(session: Session, *, user_id: int, project_id: int) \
     typing.Optional[Document]
         Document.
     """
-    subquery = session.query(
-        AnnotationSet.document_id,
-        func.count(AnnotationSet.user_id).label('frequency')
-    ) \
-        .filter(AnnotationSet.completed.is_(True)) \
-        .group_by(AnnotationSet.document_id) \
-        .subquery()
-    q = session.query(Document) \
-        .join(Project, Project.id == Document.project_id) \
-        .join(Assignment, Assignment.project_id == Project.id) \
-        .outerjoin(subquery, Document.id == subquery.c.document_id) \
+    assignment = session.query(Assignment) \
+        .filter_by(user_id=user_id, project_id=project_id) \
+        .first()
+    if assignment is None:
+        return None
+    redundancy, ordering = session.query(Project.redundancy,
+                                         Project.ordering) \
+        .filter(Project.id == project_id) \
+        .one_or_none() or (None, None)
+    if redundancy is None:
+        redundancy = 1
+    if ordering == 'uncertainty':
+        order_by = (Document.num_completed.desc(), Document.priority.desc(),
+                    Document.id)
+    else:
+        order_by = (Document.num_completed.desc(), Document.id)
+    return session.query(Document) \
         .outerjoin(AnnotationSet, and_(
             AnnotationSet.document_id == Document.id,
-            AnnotationSet.user_id == Assignment.user_id
+            AnnotationSet.user_id == user_id
         )) \
-        .filter(Document.project_id == project_id) \
-        .filter(Assignment.user_id == user_id) \
+        .filter(Document.project_id == project_id,
+                Document.num_completed < redundancy) \
         .filter(or_(
-            subquery.c.frequency.is_(None),
-            Project.redundancy > subquery.c.frequency
-        )) \
-        .filter(or_(
-            AnnotationSet.completed.is_(None),
-            AnnotationSet.completed.is_(False)
+            AnnotationSet.id.is_(None),
+            and_(
+                AnnotationSet.completed.is_(False),
+                AnnotationSet.skipped.is_(False),
+            ),
         )) \
-        .filter(or_(
-            AnnotationSet.skipped.is_(None),
-            AnnotationSet.skipped.is_(False)
-        ))
-    return q.first()
+        .order_by(*order_by) \
+        .first()
 
 
 @operation
+def refresh_document_counters(session: Session, *,
+                              project_id: typing.Optional[int] = None) \
+        -> None:
+    """Recompute the annotation set counters of documents.
+
+    Notes
+    -----
+    Counters are maintained automatically when annotation sets are changed
+    through a session. Use this after modifying annotation sets outside of
+    the ORM or to initialize counters of an existing database.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : typing.Optional[int]
+        Project id (all documents if None).
+
+    Returns
+    -------
+    None
+        None.
+    """
+    def count(*criteria):
+        return select(func.count(AnnotationSet.id)) \
+            .where(AnnotationSet.document_id == Document.id, *criteria) \
+            .scalar_subquery()
+    stmt = update(Document).values(
+        num_completed=count(AnnotationSet.completed.is_(True)),
+        num_in_progress=count(
+            AnnotationSet.completed.is_(False),
+            AnnotationSet.skipped.is_(False),
+        ),
+    )
+    if project_id is not None:
+        stmt = stmt.where(Document.project_id == project_id)
+    try:
+        session.execute(stmt, execution_options={
+            'synchronize_session': False,
+        })
+    except Exception:
+        session.rollback()
+        raise
+    else:
+        session.commit()
+    return None
+
+
+@operation(readonly=True)
 def list_annotations_by_label(
         session: Session, *, user_id: int,
         document_id: int, label: Label,
@@ -474,6 +951,77 @@ def get_annotation_set(session: Session, *,
     return session.query(AnnotationSet).get(annotation_set_id)
 
 
+@operation(readonly=True)
+def get_annotation_set_tree(session: Session, *, annotation_set_id: int) -> \
+        typing.Optional[schemas.AnnotationSetTree]:
+    """Get annotation set by id with its annotations, spans and labels.
+    Return None if not found.
+
+    Notes
+    -----
+    The tree is read in three queries (annotation set, annotations with
+    spans, labels) whatever the number of annotations (see
+    `ANNOTATION_SET_LOADER_OPTIONS`).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    annotation_set_id : int
+        Annotation set id.
+
+    Returns
+    -------
+    typing.Optional[schemas.AnnotationSetTree]
+        Annotation set tree.
+    """
+    annotation_set = session.query(AnnotationSet) \
+        .options(*ANNOTATION_SET_LOADER_OPTIONS) \
+        .filter(AnnotationSet.id == annotation_set_id) \
+        .one_or_none()
+    if annotation_set is None:
+        return None
+    return schemas.AnnotationSetTree.from_orm(annotation_set)
+
+
+@operation(readonly=True)
+def list_annotation_set_trees(
+    session: Session, *, document_id: int,
+    user_id: typing.Optional[int] = None,
+) -> typing.List[schemas.AnnotationSetTree]:
+    """List the annotation sets of a document with their annotations, spans
+    and labels.
+
+    Notes
+    -----
+    The trees are read in three queries whatever the number of annotation
+    sets and annotations (see `ANNOTATION_SET_LOADER_OPTIONS`).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    document_id : int
+        Document id.
+    user_id : typing.Optional[int]
+        User id (annotation sets of all users if None).
+
+    Returns
+    -------
+    typing.List[schemas.AnnotationSetTree]
+        Annotation set trees ordered by id.
+    """
+    q = session.query(AnnotationSet) \
+        .options(*ANNOTATION_SET_LOADER_OPTIONS) \
+        .filter(AnnotationSet.document_id == document_id)
+    if user_id is not None:
+        q = q.filter(AnnotationSet.user_id == user_id)
+    return [
+        schemas.AnnotationSetTree.from_orm(annotation_set)
+        for annotation_set in q.order_by(AnnotationSet.id)
+    ]
+
+
 @operation
 def create_annotation_set(session: Session, *,
                           annotation_set: AnnotationSet) -> \
@@ -531,7 +1079,7 @@ def get_or_create_annotation_set_by_user_and_document(
             user_id=user_id,
             document_id=document_id,
         )
-        create_annotation_set(session, annotation_set)
+        create_annotation_set(session, annotation_set=annotation_set)
     return annotation_set
 
 
@@ -612,7 +1160,7 @@ def get_label_by(session: Session, *,
         .first()
 
 
-@operation
+@operation(readonly=True)
 def list_labels(session: Session, *,
                 project_id: int, page: PageType = None) -> \
         ModelListType[Label]:
@@ -787,7 +1335,7 @@ def get_project(session: Session, *,
     return session.query(Project).get(project_id)
 
 
-@operation
+@operation(readonly=True)
 def list_projects_by(session: Session, *,
                      user_id: int = None,
                      search: str = None,
@@ -823,7 +1371,7 @@ def list_projects_by(session: Session, *,
     return query.paginate(page)
 
 
-@operation
+@operation(readonly=True)
 def list_projects(session: Session) -> \
         ModelListType[Project]:
     """List projects.
@@ -894,7 +1442,7 @@ def update_project(session: Session, *, project: Project) -> Project:
     return project
 
 
-@operation
+@operation(readonly=True)
 def list_tasks_by(session: Session, *,
                   project_id: int = None,
                   user_id: int = None,
@@ -948,7 +1496,7 @@ def get_task(session: Session, *, project_id: int, task_id: int) -> \
         Task.
     """
     task = session.query(Task).get(task_id)
-    if task.project_id != project_id:
+    if task is None or task.project_id != project_id:
         return None
     return task
 
@@ -1112,3 +1660,239 @@ def update_assignment(session: Session, *, assignment: Assignment):
     else:
         session.commit()
     return assignment
+
+
+@operation
+def create_background_job(session: Session, *,
+                          job: BackgroundJob) -> BackgroundJob:
+    """Add background job (queued).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    job : BackgroundJob
+        Background job.
+
+    Returns
+    -------
+    BackgroundJob
+        Background job.
+    """
+    try:
+        session.add(job)
+    except Exception:
+        session.rollback()
+        raise
+    else:
+        session.commit()
+    return job
+
+
+@operation(readonly=True)
+def get_background_job(session: Session, *, job_id: str) -> \
+        typing.Optional[BackgroundJob]:
+    """Get background job by id. Return None if not found.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    job_id : str
+        Job id.
+
+    Returns
+    -------
+    typing.Optional[BackgroundJob]
+        Background job.
+    """
+    return session.get(BackgroundJob, job_id)
+
+
+@operation(readonly=True)
+def list_background_jobs(
+    session: Session, *, user_id: typing.Optional[int] = None,
+    project_id: typing.Optional[int] = None,
+    name: typing.Optional[str] = None,
+    status: typing.Optional[
+        typing.Sequence[schemas.JobStatusEnum]] = None,
+    page: PageType = None,
+) -> ModelListType[BackgroundJob]:
+    """List background jobs (latest first).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    user_id : typing.Optional[int]
+        Only jobs submitted by the user.
+    project_id : typing.Optional[int]
+        Only jobs of the project.
+    name : typing.Optional[str]
+        Only jobs of the job type.
+    status : typing.Optional[typing.Sequence[schemas.JobStatusEnum]]
+        Only jobs with one of the statuses.
+    page : PageType
+        Page.
+
+    Returns
+    -------
+    ModelListType[BackgroundJob]
+        List of background jobs.
+    """
+    q = session.query(BackgroundJob)
+    if user_id is not None:
+        q = q.filter(BackgroundJob.user_id == user_id)
+    if project_id is not None:
+        q = q.filter(BackgroundJob.project_id == project_id)
+    if name is not None:
+        q = q.filter(BackgroundJob.name == name)
+    if status is not None:
+        q = q.filter(BackgroundJob.status.in_(list(status)))
+    return q.order_by(BackgroundJob.created_on.desc(),
+                      BackgroundJob.id.desc()) \
+        .paginate(page)
+
+
+@operation
+def claim_background_job(session: Session, *, worker: str,
+                         job_id: typing.Optional[str] = None) -> \
+        typing.Optional[BackgroundJob]:
+    """Mark the oldest queued job (or a queued job by id) as running.
+
+    Notes
+    -----
+    The status is changed with a conditional update, so a job is claimed by
+    a single worker when several workers poll the same database.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    worker : str
+        Name of the worker.
+    job_id : typing.Optional[str]
+        Job id (the oldest queued job if None).
+
+    Returns
+    -------
+    typing.Optional[BackgroundJob]
+        Claimed job (None if there is no queued job).
+    """
+    queued = schemas.JobStatusEnum.queued
+    candidates = select(BackgroundJob.id) \
+        .where(BackgroundJob.status == queued) \
+        .order_by(BackgroundJob.created_on, BackgroundJob.id) \
+        .limit(1)
+    if job_id is not None:
+        candidates = candidates.where(BackgroundJob.id == job_id)
+    try:
+        while True:
+            candidate = session.execute(candidates).scalar()
+            if candidate is None:
+                break
+            claimed = session.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == candidate,
+                       BackgroundJob.status == queued)
+                .values(status=schemas.JobStatusEnum.running,
+                        worker=worker, started_on=func.now(),
+                        updated_on=func.now()),
+                execution_options={'synchronize_session': False},
+            ).rowcount
+            if claimed:
+                break
+    except Exception:
+        session.rollback()
+        raise
+    else:
+        session.commit()
+    if candidate is None:
+        return None
+    return session.get(BackgroundJob, candidate)
+
+
+@operation
+def update_background_job(session: Session, *, job_id: str,
+                          values: dict) -> typing.Optional[BackgroundJob]:
+    """Update the progress or state of a background job.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    job_id : str
+        Job id.
+    values : dict
+        New column values (`updated_on` is set to the current time).
+
+    Returns
+    -------
+    typing.Optional[BackgroundJob]
+        Updated job (None if not found).
+    """
+    try:
+        session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id)
+            .values(updated_on=func.now(), **values),
+            execution_options={'synchronize_session': False},
+        )
+    except Exception:
+        session.rollback()
+        raise
+    else:
+        session.commit()
+    return session.get(BackgroundJob, job_id, populate_existing=True)
+
+
+@operation
+def cancel_background_job(session: Session, *, job_id: str,
+                          running: bool = True) -> \
+        typing.Optional[BackgroundJob]:
+    """Cancel a background job.
+
+    Notes
+    -----
+    Queued jobs are cancelled immediately. Running jobs stop at their next
+    progress update (work committed before is kept).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    job_id : str
+        Job id.
+    running : bool
+        Whether the job is also cancelled if it is running (only queued
+        jobs are cancelled if False).
+
+    Returns
+    -------
+    typing.Optional[BackgroundJob]
+        Job (None if not found).
+    """
+    status = schemas.JobStatusEnum
+    try:
+        session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id,
+                   BackgroundJob.status == status.queued)
+            .values(status=status.cancelled, cancel_requested=True,
+                    finished_on=func.now(), updated_on=func.now()),
+            execution_options={'synchronize_session': False},
+        )
+        if running:
+            session.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == job_id,
+                       BackgroundJob.status == status.running)
+                .values(cancel_requested=True),
+                execution_options={'synchronize_session': False},
+            )
+    except Exception:
+        session.rollback()
+        raise
+    else:
+        session.commit()
+    return session.get(BackgroundJob, job_id, populate_existing=True)
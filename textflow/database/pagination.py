@@ -1,3 +1,6 @@
+import base64
+import datetime
+import json
 import math
 import typing
 
@@ -11,6 +14,8 @@ ModelType = typing.TypeVar('ModelType')
 __all__ = [
     'PaginationArgs',
     'Pagination',
+    'encode_cursor',
+    'decode_cursor',
 ]
 
 
@@ -19,6 +24,20 @@ class PaginationArgs:
     page: int = pydantic.Field(default=1)
     per_page: int = pydantic.Field(default=10, le=100)
     error_out: bool = pydantic.Field(default=False)
+    # name of the column to sort by (the primary key is used as tie-breaker)
+    sort: typing.Optional[str] = pydantic.Field(default=None)
+    order: typing.Optional[str] = \
+        pydantic.Field(default=None, regex='^(asc|desc)$')
+    # keyset (cursor) pagination - `after` is the opaque token returned as
+    # `Pagination.next_after` of the previous page
+    keyset: bool = pydantic.Field(default=False)
+    after: typing.Optional[str] = pydantic.Field(default=None)
+    # counting is a full scan of the filtered rows, skip it if not needed
+    with_total: bool = pydantic.Field(default=True)
+
+    @property
+    def is_keyset(self) -> bool:
+        return self.keyset or self.after is not None
 
 
 class Pagination(GenericModel, typing.Generic[ModelType]):
@@ -26,8 +45,8 @@ class Pagination(GenericModel, typing.Generic[ModelType]):
     page: int
     # The number of items to be displayed on a page.
     per_page: int
-    # The total number of items matching the query.
-    total: int
+    # The total number of items matching the query (None if not counted).
+    total: typing.Optional[int] = pydantic.Field(default=None)
     # The items for the current page.
     items: typing.List[ModelType]
     # will be initialized by __post_init__
@@ -36,20 +55,91 @@ class Pagination(GenericModel, typing.Generic[ModelType]):
     has_prev: typing.Optional[bool] = pydantic.Field(default=None)
     next_num: typing.Optional[int] = pydantic.Field(default=None)
     has_next: typing.Optional[bool] = pydantic.Field(default=None)
+    # cursor of the current page and of the next page (keyset mode only)
+    after: typing.Optional[str] = pydantic.Field(default=None)
+    next_after: typing.Optional[str] = pydantic.Field(default=None)
 
     def __init__(self, **kwargs):
         super(Pagination, self).__init__(**kwargs)
-        # The items for the current page.
-        if self.per_page == 0:
-            self.pages = 0
-        else:
-            #: The total number of pages.
-            self.pages = int(math.ceil(self.total / float(self.per_page)))
+        if self.total is not None:
+            # The items for the current page.
+            if self.per_page == 0:
+                self.pages = 0
+            else:
+                #: The total number of pages.
+                self.pages = int(math.ceil(self.total / float(self.per_page)))
         #: Number of the previous page.
         self.prev_num = self.page - 1
         #: True if a previous page exists.
-        self.has_prev = self.page > 1
+        if self.has_prev is None:
+            self.has_prev = self.page > 1
         #: Number of the next page.
         self.next_num = self.page + 1
         #: True if a next page exists.
-        self.has_next = self.page < self.pages
+        if self.has_next is None and self.pages is not None:
+            self.has_next = self.page < self.pages
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(value, python_type):
+    if value is None:
+        return None
+    if python_type is datetime.datetime:
+        return datetime.datetime.fromisoformat(value)
+    if python_type is datetime.date:
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def encode_cursor(values: typing.Sequence[typing.Any]) -> str:
+    """Encode key values of the last row of a page as an opaque token.
+
+    Parameters
+    ----------
+    values : typing.Sequence[typing.Any]
+        Values of the key columns.
+
+    Returns
+    -------
+    str
+        URL-safe cursor token.
+    """
+    data = json.dumps(list(map(_encode_value, values)),
+                      separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token: str, python_types: typing.Sequence[type]) -> \
+        typing.List[typing.Any]:
+    """Decode a cursor token created by `encode_cursor`.
+
+    Parameters
+    ----------
+    token : str
+        Cursor token.
+    python_types : typing.Sequence[type]
+        Python types of the key columns.
+
+    Returns
+    -------
+    typing.List[typing.Any]
+        Values of the key columns.
+
+    Raises
+    ------
+    ValueError
+        If the token is malformed.
+    """
+    try:
+        data = base64.urlsafe_b64decode(token.encode('ascii'))
+        values = json.loads(data.decode('utf-8'))
+    except (TypeError, ValueError) as ex:
+        raise ValueError('Invalid pagination cursor.') from ex
+    if not isinstance(values, list) or len(values) != len(python_types):
+        raise ValueError('Invalid pagination cursor.')
+    return [_decode_value(v, t) for v, t in zip(values, python_types)]
@@ -0,0 +1,202 @@
+"""Read replica routing.
+
+Sessions created by `DatabaseContext` route the queries of read-only
+operations (see `operation(readonly=True)`) to read replicas when replicas
+are configured with `SQLALCHEMY_REPLICA_URIS`. Everything else uses the
+primary database.
+
+Notes
+-----
+Once a session has written (flushed changes or executed an insert, update
+or delete statement) all of its queries go to the primary so that a request
+always reads its own writes. Replicas that fail are skipped for a cooldown
+period and the failed operation is retried on the primary.
+
+Example
+-------
+>>> config = {
+...     'SQLALCHEMY_DATABASE_URI': 'postgresql://primary/textflow',
+...     'SQLALCHEMY_REPLICA_URIS': ['postgresql://replica/textflow'],
+... }
+>>> db.init_context(config)
+>>> with db.session() as session:
+...     op.list_projects(session)  # reads from the replica
+"""
+import contextlib
+import itertools
+import logging
+import threading
+import time
+import typing
+
+import sqlalchemy as sa
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+
+__all__ = [
+    'ReplicaSet',
+    'RoutingSession',
+    'run_readonly',
+]
+
+logger = logging.getLogger(__name__)
+
+# time (in seconds) for which a failed replica is not used
+DEFAULT_COOLDOWN = 30
+
+
+class ReplicaSet(object):
+    """Read replicas with round robin selection and failure cooldown.
+
+    Parameters
+    ----------
+    engines : typing.Sequence[Engine]
+        Replica engines.
+    cooldown : float
+        Time (in seconds) for which a failed replica is not used.
+    """
+
+    def __init__(self, engines: typing.Sequence[Engine],
+                 cooldown: float = DEFAULT_COOLDOWN):
+        self.engines = list(engines)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        # engine -> time until which the engine is not used
+        self._down: typing.Dict[Engine, float] = {}
+
+    def choose(self) -> typing.Optional[Engine]:
+        """Get the next available replica.
+
+        Returns
+        -------
+        typing.Optional[Engine]
+            Replica engine or None if all replicas are down.
+        """
+        now = time.monotonic()
+        with self._lock:
+            available = [e for e in self.engines
+                         if self._down.get(e, 0) <= now]
+            if not available:
+                return None
+            return available[next(self._counter) % len(available)]
+
+    def mark_down(self, engine: Engine) -> None:
+        """Skip a replica for the cooldown period.
+
+        Parameters
+        ----------
+        engine : Engine
+            Replica engine.
+        """
+        logger.warning(f'Read replica {engine.url!r} failed. Using the '
+                       f'primary for {self.cooldown} seconds.')
+        with self._lock:
+            self._down[engine] = time.monotonic() + self.cooldown
+
+
+class RoutingSession(Session):
+    """Session that routes the queries of read-only operations to replicas.
+
+    Parameters
+    ----------
+    replicas : typing.Optional[ReplicaSet]
+        Read replicas (all queries go to the primary if None).
+    """
+
+    def __init__(self, *args, replicas: typing.Optional[ReplicaSet] = None,
+                 **kwargs):
+        super(RoutingSession, self).__init__(*args, **kwargs)
+        self.replicas = replicas
+        # replica used by this session (the same one until it fails)
+        self.replica: typing.Optional[Engine] = None
+        # whether the session wrote to the primary
+        self.written = False
+        # whether the session is flushing (loads of flush handlers go to
+        # the primary)
+        self.flushing = False
+        self._readonly = 0
+
+    @contextlib.contextmanager
+    def readonly(self) -> typing.Generator[None, None, None]:
+        """Route the select statements of the block to a replica."""
+        self._readonly += 1
+        try:
+            yield
+        finally:
+            self._readonly -= 1
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if self._readonly and not self.written and not self.flushing and \
+                self.replicas is not None and \
+                isinstance(clause, sa.sql.Select):
+            if self.replica is None:
+                self.replica = self.replicas.choose()
+            if self.replica is not None:
+                return self.replica
+        return super(RoutingSession, self).get_bind(
+            mapper, clause=clause, **kwargs
+        )
+
+
+# registered first so that the loads of other handlers go to the primary
+@sa.event.listens_for(RoutingSession, 'before_flush', insert=True)
+def _before_flush(session, flush_context, instances):
+    session.written = True
+    session.flushing = True
+
+
+@sa.event.listens_for(RoutingSession, 'after_flush_postexec')
+def _after_flush(session, flush_context):
+    session.flushing = False
+
+
+@sa.event.listens_for(RoutingSession, 'after_soft_rollback')
+def _after_rollback(session, previous_transaction):
+    # a failed flush ends without after_flush_postexec
+    session.flushing = False
+
+
+@sa.event.listens_for(RoutingSession, 'do_orm_execute')
+def _before_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or \
+            orm_execute_state.is_delete:
+        orm_execute_state.session.written = True
+
+
+def run_readonly(session: Session, func: typing.Callable, **kwargs):
+    """Run a read-only operation on a replica.
+
+    Notes
+    -----
+    If the replica fails with an `OperationalError` (e.g., it is not
+    reachable) the transaction of the session is rolled back and the
+    operation is retried on the primary.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    func : typing.Callable
+        Operation.
+    kwargs
+        Keyword arguments of the operation.
+
+    Returns
+    -------
+    typing.Any
+        Output of the operation.
+    """
+    if not isinstance(session, RoutingSession) or session.replicas is None:
+        return func(session, **kwargs)
+    try:
+        with session.readonly():
+            return func(session, **kwargs)
+    except sa.exc.OperationalError:
+        replica = session.replica
+        if replica is None or session.written:
+            raise
+        session.replicas.mark_down(replica)
+        session.rollback()
+        session.replica = None
+        return func(session, **kwargs)
@@ -0,0 +1,183 @@
+"""SQLite connection profiles.
+
+SQLite allows a single writer at a time. With the default rollback journal
+readers are blocked while a write is committed and concurrent writers fail
+with "database is locked" errors. The production profile switches to
+write-ahead logging (readers never block and are never blocked by the
+writer), tunes the pragmas of every connection and serializes the write
+transactions of the process so that they queue up instead of failing.
+
+The writer lock is per process. Processes that write to the same database
+(e.g. several application workers or `textflow worker`) are not serialized
+by it and rely on the busy timeout of SQLite to wait for each other.
+
+Example
+-------
+>>> from textflow.database import sqlite
+>>> sqlite.configure(engine, 'production')
+
+Functions
+---------
+configure
+    Apply a profile to a SQLite engine.
+"""
+import logging
+import threading
+import typing
+import weakref
+
+import sqlalchemy as sa
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+
+__all__ = [
+    'PROFILES',
+    'configure',
+]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT = 'default'
+PRODUCTION = 'production'
+
+# pragmas set on every new connection of a profile
+PROFILES: typing.Dict[str, typing.Dict[str, typing.Any]] = {
+    DEFAULT: {},
+    PRODUCTION: {
+        'journal_mode': 'WAL',
+        # durable at checkpoints, commits do not wait for fsync in WAL mode
+        'synchronous': 'NORMAL',
+        # negative values are in KiB (64 MiB)
+        'cache_size': -64 * 1024,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        # milliseconds
+        'busy_timeout': 10000,
+    },
+}
+
+_INFO_KEY = 'textflow.sqlite.writer'
+
+
+class _WriterLock(object):
+    """Reentrant lock of the writing thread.
+
+    A thread that holds the lock acquires it again at once (e.g. for a
+    session that writes while another session of the thread is writing)
+    and the lock is free when every acquisition is released. Unlike
+    `threading.RLock` it may be released by another thread, as a session
+    may be closed by another thread than the one that started writing.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._owner: typing.Optional[int] = None
+        self._depth = 0
+
+    def acquire(self, timeout: float = -1) -> bool:
+        me = threading.get_ident()
+        with self._condition:
+            if self._depth and self._owner == me:
+                self._depth += 1
+                return True
+            if not self._condition.wait_for(
+                    lambda: self._depth == 0,
+                    timeout=None if timeout < 0 else timeout):
+                return False
+            self._owner = me
+            self._depth = 1
+            return True
+
+    def release(self) -> None:
+        with self._condition:
+            if self._depth == 0:
+                raise RuntimeError('release unlocked lock')
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._condition.notify()
+
+    def locked(self) -> bool:
+        return self._depth > 0
+
+
+# engine -> lock held by the sessions that are writing
+_writer_locks: 'weakref.WeakKeyDictionary[Engine, _WriterLock]' = \
+    weakref.WeakKeyDictionary()
+
+
+def configure(engine: Engine, profile: typing.Optional[str] = None) -> None:
+    """Apply a profile to a SQLite engine.
+
+    Notes
+    -----
+    Write transactions of sessions of the engine are serialized for the
+    production profile. A session waits for the writer lock up to the busy
+    timeout before it writes anyway (and relies on the busy timeout of
+    SQLite). Sessions of the thread that holds the lock do not wait for it.
+    The lock only serializes the writers of this process; writers of other
+    processes are only serialized by the busy timeout of SQLite.
+
+    Parameters
+    ----------
+    engine : Engine
+        SQLite engine.
+    profile : typing.Optional[str]
+        `'default'` or `'production'` (default if None).
+    """
+    if profile is None:
+        profile = DEFAULT
+    if profile not in PROFILES:
+        raise ValueError(f'Invalid SQLite profile: {profile}. Expected one '
+                         f'of {", ".join(PROFILES)}.')
+    pragmas = PROFILES[profile]
+    if pragmas:
+        @sa.event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for key, value in pragmas.items():
+                    cursor.execute(f'PRAGMA {key} = {value}')
+            finally:
+                cursor.close()
+    if profile == PRODUCTION:
+        _writer_locks[engine] = _WriterLock()
+
+
+def _get_writer_lock(session):
+    bind = session.get_bind()
+    return _writer_locks.get(getattr(bind, 'engine', bind))
+
+
+def _acquire_writer_lock(session):
+    if _INFO_KEY in session.info:
+        return
+    lock = _get_writer_lock(session)
+    if lock is None:
+        return
+    timeout = PROFILES[PRODUCTION]['busy_timeout'] / 1000
+    if lock.acquire(timeout=timeout):
+        session.info[_INFO_KEY] = lock
+    else:
+        logger.warning('Timed out waiting for the SQLite writer lock.')
+
+
+# registered first so that the lock is held before other handlers write
+@sa.event.listens_for(Session, 'before_flush', insert=True)
+def _before_flush(session, flush_context, instances):
+    _acquire_writer_lock(session)
+
+
+@sa.event.listens_for(Session, 'do_orm_execute', insert=True)
+def _before_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or \
+            orm_execute_state.is_delete:
+        _acquire_writer_lock(orm_execute_state.session)
+
+
+@sa.event.listens_for(Session, 'after_transaction_end')
+def _release_writer_lock(session, transaction):
+    if transaction.parent is None:
+        lock = session.info.pop(_INFO_KEY, None)
+        if lock is not None:
+            lock.release()
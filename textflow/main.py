@@ -4,7 +4,8 @@ import json
 import typer
 
 from textflow import TextFlow
-from textflow.database import db
+from textflow.database import db, op
+from textflow.services.jobs import jobs
 
 app = typer.Typer()
 
@@ -16,6 +17,28 @@ def init():
     if not os.path.exists(config_path):
         config = {
             'SQLALCHEMY_DATABASE_URI': f'sqlite:///{cwd}/textflow.db',
+            'SQLALCHEMY_SQLITE_PROFILE': 'production',
+            # keyword arguments of sqlalchemy.create_engine (merged over the
+            # defaults of the backend, see textflow.database.engine)
+            'SQLALCHEMY_ENGINE_OPTIONS': {},
+            # trained auto-models (see textflow.services.automodel)
+            'AUTOMODEL_DIR': os.path.join(cwd, 'automodels'),
+            # background jobs (see textflow.services.jobs), `local` runs the
+            # jobs in the application and `worker` in `textflow worker`
+            'JOBS_MODE': 'local',
+            'JOBS_DIR': os.path.join(cwd, 'jobs'),
+            # seconds authenticated users are cached per process. changes of
+            # users (e.g. disabling them) made through another process take
+            # effect after at most this many seconds
+            'USER_CACHE_TTL': 5,
+            # seconds assignments are cached per process (a revoked or
+            # changed assignment is still accepted for up to this long)
+            'ASSIGNMENT_CACHE_TTL': 5,
+            # seconds progress reports are cached per process (annotations
+            # made through another process show after up to this long)
+            'STATS_CACHE_TTL': 5,
+            # seconds agreement scores are cached per process
+            'AGREEMENT_CACHE_TTL': 5,
         }
         with open(config_path, 'w') as fp:
             json.dump(config, fp)
@@ -26,5 +49,58 @@ def init():
     db.create_all()
 
 
+@app.command()
+def upgrade():
+    cwd = os.getcwd()
+    config_path = os.path.join(cwd, 'config.json')
+    with open(config_path) as fp:
+        config = json.load(fp)
+    _ = TextFlow(config)
+    db.upgrade()
+
+
+@app.command()
+def tokenize(
+    project_id: int,
+    tokenizer: str = typer.Option(None, help='Name of tokenizer.'),
+    batch_size: int = typer.Option(10000, help='Documents per batch.'),
+    n_jobs: int = typer.Option(None, help='Worker processes (all CPUs if '
+                                          'not set).'),
+):
+    cwd = os.getcwd()
+    config_path = os.path.join(cwd, 'config.json')
+    with open(config_path) as fp:
+        config = json.load(fp)
+    _ = TextFlow(config)
+    with db.session() as session:
+        progress = op.create_document_tokens(
+            session, project_id=project_id, tokenizer=tokenizer,
+            batch_size=batch_size, n_jobs=n_jobs,
+        )
+        for num_docs_tokenized, num_docs_read in progress:
+            print(f'{num_docs_tokenized} of {num_docs_read} documents '
+                  'tokenized')
+
+
+@app.command()
+def worker(
+    max_workers: int = typer.Option(None, help='Jobs run at the same time.'),
+    executor: str = typer.Option(None, help='Executor of jobs: thread or '
+                                            'process.'),
+    burst: bool = typer.Option(False, help='Stop when no jobs are queued.'),
+):
+    cwd = os.getcwd()
+    config_path = os.path.join(cwd, 'config.json')
+    with open(config_path) as fp:
+        config = json.load(fp)
+    if max_workers is not None:
+        config['JOBS_MAX_WORKERS'] = max_workers
+    if executor is not None:
+        config['JOBS_EXECUTOR'] = executor
+    _ = TextFlow(config)
+    jobs.mode = 'worker'
+    jobs.work(burst=burst)
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,16 @@
+"""Annotation quality metrics.
+
+Modules
+-------
+agreement
+    Inter-annotator agreement of labels.
+span_agreement
+    Inter-annotator agreement of spans.
+"""
+from textflow.metrics.agreement import AgreementScore
+from textflow.metrics.span_agreement import SpanAgreementScore
+
+__all__ = [
+    'AgreementScore',
+    'SpanAgreementScore',
+]
@@ -0,0 +1,28 @@
+"""Array helpers shared by the metrics."""
+import numpy as np
+
+__all__ = [
+    'divide',
+]
+
+
+def divide(a, b) -> np.ndarray:
+    """Divide elementwise (NaN where b is zero).
+
+    Parameters
+    ----------
+    a : array_like
+        Dividend.
+    b : array_like
+        Divisor.
+
+    Returns
+    -------
+    np.ndarray
+        Quotient (float64).
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    out = np.full(np.broadcast(a, b).shape, np.nan)
+    np.divide(a, b, out=out, where=b != 0)
+    return out
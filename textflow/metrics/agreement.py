@@ -0,0 +1,336 @@
+"""Inter-annotator agreement.
+
+Agreement is computed from (rater, item, label) triples. An item can have
+several labels per rater (multi-label annotation), so every label is scored
+as a binary (one-vs-rest) decision and the scores are averaged over labels.
+
+Notes
+-----
+Raters, items and labels are integer coded once. The annotations are kept
+as sparse item x rater indicator matrices (one block per label) and all
+metrics are computed with sparse matrix products and array reductions over
+these matrices. The cost grows with the number of annotations, the number
+of labels and the square of the number of raters, not with Python loops
+over items.
+
+Example
+-------
+>>> from textflow.metrics.agreement import AgreementScore
+>>> scorer = AgreementScore([
+...     ('r1', 'I01', 'high'), ('r2', 'I01', 'high'),
+...     ('r1', 'I02', 'low'), ('r2', 'I02', 'high'),
+... ])
+>>> scorer.percentage()
+  Rater 1 Rater 2  Items  Agreement
+0      r1      r2      2        0.5
+"""
+import typing
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from textflow.metrics._utils import divide
+
+__all__ = [
+    'AgreementScore',
+    'alpha_from_counts',
+    'fleiss_from_counts',
+    'kappa_from_counts',
+    'percentage_from_counts',
+]
+
+_PAIR_COLUMNS = ['Rater 1', 'Rater 2', 'Items', 'Agreement']
+_LABEL_COLUMNS = ['Label', 'Items', 'Agreement']
+
+
+def percentage_from_counts(n, n1, n2, n11) -> np.ndarray:
+    """Get the percentage agreement of rater pairs from label counts.
+
+    Parameters
+    ----------
+    n : array_like
+        Number of items rated by both raters (per pair).
+    n1, n2 : array_like
+        Number of those items that the first (second) rater labeled with
+        the label (label x pair).
+    n11 : array_like
+        Number of those items that both raters labeled with the label
+        (label x pair).
+
+    Returns
+    -------
+    np.ndarray
+        Agreement averaged over the labels used by either rater (per pair).
+    """
+    n, n1, n2, n11 = map(np.asarray, (n, n1, n2, n11))
+    agreed = n - n1 - n2 + 2 * n11
+    used = (n1 + n2) > 0
+    return divide((divide(agreed, n) * used).sum(axis=0),
+                   used.sum(axis=0))
+
+
+def kappa_from_counts(n, n1, n2, n11) -> np.ndarray:
+    """Get Cohen's kappa of rater pairs from label counts.
+
+    Parameters
+    ----------
+    n, n1, n2, n11 : array_like
+        See `percentage_from_counts`.
+
+    Returns
+    -------
+    np.ndarray
+        Kappa averaged over the labels for which it is defined (per pair,
+        NaN if it is not defined for any label).
+    """
+    n, n1, n2, n11 = map(np.asarray, (n, n1, n2, n11))
+    observed = divide(n - n1 - n2 + 2 * n11, n)
+    p1, p2 = divide(n1, n), divide(n2, n)
+    expected = p1 * p2 + (1 - p1) * (1 - p2)
+    defined = ~np.isclose(expected, 1)
+    kappa = divide(observed - expected, 1 - expected)
+    kappa[~defined] = 0
+    return divide(kappa.sum(axis=0), defined.sum(axis=0))
+
+
+def fleiss_from_counts(num_items, total, n1, disagreement) -> np.ndarray:
+    """Get Fleiss' kappa of labels from counts over items.
+
+    Parameters
+    ----------
+    num_items : int
+        Number of items with at least two raters.
+    total : int
+        Sum of the number of raters of those items.
+    n1 : array_like
+        Number of ratings with the label (per label).
+    disagreement : array_like
+        Sum over items of 2 x (m - x) / (m (m - 1)) where m is the number
+        of raters of the item and x the number that chose the label
+        (per label).
+
+    Returns
+    -------
+    np.ndarray
+        Kappa per label (NaN if undefined).
+    """
+    observed = divide(num_items - np.asarray(disagreement), num_items)
+    p = divide(n1, total)
+    expected = p ** 2 + (1 - p) ** 2
+    kappa = divide(observed - expected, 1 - expected)
+    kappa[np.isclose(expected, 1)] = np.nan
+    return kappa
+
+
+def alpha_from_counts(total, n1, disagreement) -> np.ndarray:
+    """Get Krippendorff's alpha (nominal) of labels from counts over items.
+
+    Parameters
+    ----------
+    total : int
+        Sum of the number of raters of the items with at least two raters.
+    n1 : array_like
+        Number of ratings with the label (per label).
+    disagreement : array_like
+        Sum over items of x (m - x) / (m - 1), the off-diagonal
+        coincidences (per label).
+
+    Returns
+    -------
+    np.ndarray
+        Alpha per label (NaN if undefined).
+    """
+    n1 = np.asarray(n1, dtype=np.float64)
+    n0 = total - n1
+    return 1 - divide((total - 1) * np.asarray(disagreement), n0 * n1)
+
+
+class AgreementScore(object):
+    """Agreement between raters.
+
+    Parameters
+    ----------
+    data : typing.Union[typing.Iterable[tuple], pd.DataFrame]
+        (rater, item, label) triples or a data frame with the columns
+        `rater`, `item` and `label`. Duplicate triples are ignored.
+    """
+
+    def __init__(self, data: typing.Union[typing.Iterable[tuple],
+                                          pd.DataFrame]):
+        if isinstance(data, pd.DataFrame):
+            frame = data[['rater', 'item', 'label']]
+        else:
+            frame = pd.DataFrame(list(data),
+                                 columns=['rater', 'item', 'label'])
+        frame = frame.drop_duplicates()
+        raters, self.raters = pd.factorize(frame['rater'])
+        items, self.items = pd.factorize(frame['item'])
+        labels, self.labels = pd.factorize(frame['label'])
+        num_items, num_raters = len(self.items), len(self.raters)
+        # rated[i, r] = 1 if rater r labeled item i
+        self._rated = sparse.csc_matrix(
+            (np.ones(len(frame), dtype=np.int64), (items, raters)),
+            shape=(num_items, num_raters),
+        )
+        self._rated.sum_duplicates()
+        self._rated.data[:] = 1
+        # labeled[i, l * num_raters + r] = 1 if rater r labeled item i
+        # with label l
+        self._labeled = sparse.csc_matrix(
+            (np.ones(len(frame), dtype=np.int64),
+             (items, labels.astype(np.int64) * num_raters + raters)),
+            shape=(num_items, len(self.labels) * num_raters),
+        )
+        self._pairwise_counts = None
+
+    def _label_block(self, label):
+        num_raters = len(self.raters)
+        return self._labeled[:, label * num_raters:(label + 1) * num_raters]
+
+    def _pairwise(self):
+        """Get the counts of all rater pairs.
+
+        Returns (n, n1, n11) where n[a, b] is the number of items rated by
+        both a and b, n1[l, a, b] is the number of those items that a labeled
+        with l and n11[l, a, b] the number that both labeled with l.
+        """
+        if self._pairwise_counts is None:
+            num_raters = len(self.raters)
+            n = (self._rated.T @ self._rated).toarray()
+            n1 = np.zeros((len(self.labels), num_raters, num_raters),
+                          dtype=np.int64)
+            n11 = np.zeros_like(n1)
+            for label in range(len(self.labels)):
+                block = self._label_block(label)
+                n1[label] = (block.T @ self._rated).toarray()
+                n11[label] = (block.T @ block).toarray()
+            self._pairwise_counts = n, n1, n11
+        return self._pairwise_counts
+
+    def _pair_scores(self, score):
+        """Build the data frame of pairwise scores.
+
+        `score(n, n1, n2, n11)` gets the counts of the rater pairs with
+        overlapping items (label x pair arrays, n is broadcast) and returns
+        the score of every pair.
+        """
+        n, n1, n11 = self._pairwise()
+        a, b = np.triu_indices(len(self.raters), k=1)
+        overlap = n[a, b] > 0
+        a, b = a[overlap], b[overlap]
+        if len(a) == 0:
+            return pd.DataFrame(columns=_PAIR_COLUMNS)
+        scores = score(n[a, b], n1[:, a, b], n1[:, b, a], n11[:, a, b])
+        return pd.DataFrame({
+            'Rater 1': self.raters[a],
+            'Rater 2': self.raters[b],
+            'Items': n[a, b],
+            'Agreement': scores,
+        }, columns=_PAIR_COLUMNS)
+
+    def percentage(self) -> pd.DataFrame:
+        """Get the percentage agreement of each pair of raters.
+
+        Notes
+        -----
+        For every label that either rater used on the items they both rated,
+        the fraction of those items on which both raters chose or both did
+        not choose the label. Scores are averaged over labels.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per pair of raters with overlapping items.
+        """
+        return self._pair_scores(percentage_from_counts)
+
+    def kappa(self) -> pd.DataFrame:
+        """Get Cohen's kappa of each pair of raters.
+
+        Notes
+        -----
+        Kappa is computed per label (one-vs-rest) and averaged over the
+        labels for which it is defined (labels on which the chance agreement
+        is not 1). The score is NaN if it is not defined for any label.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per pair of raters with overlapping items.
+        """
+        return self._pair_scores(kappa_from_counts)
+
+    def _label_counts(self):
+        """Get (m, x) for the items with at least two raters where m is the
+        number of raters of the item and x (sparse, item x label) is the
+        number of raters that chose the label."""
+        num_raters = len(self.raters)
+        m = np.asarray(self._rated.sum(axis=1)).ravel()
+        keep = m >= 2
+        labeled = self._labeled.tocoo()
+        x = sparse.csr_matrix(
+            (labeled.data, (labeled.row, labeled.col // max(num_raters, 1))),
+            shape=(len(self.items), len(self.labels)),
+        )
+        return m[keep], x[keep].tocoo()
+
+    def _label_scores(self, score):
+        m, x = self._label_counts()
+        if len(m) == 0 or len(self.labels) == 0:
+            return pd.DataFrame(columns=_LABEL_COLUMNS)
+        return pd.DataFrame({
+            'Label': self.labels,
+            'Items': len(m),
+            'Agreement': score(m, x),
+        }, columns=_LABEL_COLUMNS)
+
+    def fleiss(self) -> pd.DataFrame:
+        """Get Fleiss' kappa of each label (one-vs-rest).
+
+        Notes
+        -----
+        All items with at least two raters are used. The number of raters
+        may vary between items.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per label (NaN if undefined).
+        """
+        def score(m, x):
+            num_labels = len(self.labels)
+            mi = m[x.row]
+            # sum over items of one minus the observed agreement
+            disagreement = np.bincount(
+                x.col, weights=2 * x.data * (mi - x.data) / (mi * (mi - 1)),
+                minlength=num_labels,
+            )
+            n1 = np.bincount(x.col, weights=x.data, minlength=num_labels)
+            return fleiss_from_counts(len(m), m.sum(), n1, disagreement)
+        return self._label_scores(score)
+
+    def alpha(self) -> pd.DataFrame:
+        """Get Krippendorff's alpha (nominal) of each label (one-vs-rest).
+
+        Notes
+        -----
+        All items with at least two raters are used.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per label (NaN if undefined).
+        """
+        def score(m, x):
+            num_labels = len(self.labels)
+            mi = m[x.row]
+            # off-diagonal coincidences and the number of pairable values
+            # with the label
+            disagreement = np.bincount(
+                x.col, weights=x.data * (mi - x.data) / (mi - 1),
+                minlength=num_labels,
+            )
+            n1 = np.bincount(x.col, weights=x.data, minlength=num_labels)
+            return alpha_from_counts(m.sum(), n1, disagreement)
+        return self._label_scores(score)
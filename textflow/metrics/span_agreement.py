@@ -0,0 +1,206 @@
+"""Inter-annotator agreement of spans.
+
+Span agreement is computed from (rater, item, start, length, label) rows
+(the label is optional). Spans of two raters match exactly if they have
+the same item, start, length and label, and partially if they have the same
+item and label and overlap. Precision, recall and F1 of a pair of raters
+are computed over the items annotated by both, with the first rater as the
+reference.
+
+Notes
+-----
+Spans are encoded once as integer keys (item and label group times a width
+larger than any offset, plus the offset) so that the spans of a rater are a
+single sorted array over all items. Overlaps are found with a sorted sweep:
+for every span of one rater a binary search finds the last span of the other
+rater starting before its end, and a running maximum of the span ends tells
+whether any of those spans reaches past its start. The cost is
+O(n log n) in the number of spans of the two raters, for any number of
+items and spans per item.
+
+Example
+-------
+>>> from textflow.metrics.span_agreement import SpanAgreementScore
+>>> scorer = SpanAgreementScore([
+...     ('r1', 'I01', 0, 5, 'PER'), ('r2', 'I01', 0, 5, 'PER'),
+...     ('r1', 'I01', 10, 4, 'LOC'), ('r2', 'I01', 11, 4, 'LOC'),
+... ])
+>>> scorer.exact()
+  Rater 1 Rater 2  Items  Precision  Recall   F1
+0      r1      r2      1        0.5     0.5  0.5
+>>> scorer.partial()
+  Rater 1 Rater 2  Items  Precision  Recall   F1
+0      r1      r2      1        1.0     1.0  1.0
+"""
+import collections
+import typing
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from textflow.metrics._utils import divide
+
+__all__ = [
+    'SpanAgreementScore',
+]
+
+_COLUMNS = ['Rater 1', 'Rater 2', 'Items', 'Precision', 'Recall', 'F1']
+
+_RaterSpans = collections.namedtuple('_RaterSpans', [
+    # item of the span
+    'item',
+    # group * width + start (sorted) and group * width + end
+    'start',
+    'end',
+    # running maximum of end
+    'reach',
+    # span id (same for equal spans of different raters, sorted)
+    'exact',
+])
+
+
+class SpanAgreementScore(object):
+    """Agreement between raters on spans.
+
+    Parameters
+    ----------
+    data : typing.Union[typing.Iterable[tuple], pd.DataFrame]
+        (rater, item, start, length) or (rater, item, start, length, label)
+        tuples or a data frame with the columns `rater`, `item`, `start`,
+        `length` and optionally `label`. A row with a missing start marks an
+        item annotated by the rater without spans. Duplicate rows are
+        ignored.
+    """
+
+    def __init__(self, data: typing.Union[typing.Iterable[tuple],
+                                          pd.DataFrame]):
+        if isinstance(data, pd.DataFrame):
+            frame = data
+        else:
+            data = list(data)
+            columns = ['rater', 'item', 'start', 'length']
+            if data and len(data[0]) > 4:
+                columns.append('label')
+            frame = pd.DataFrame(data, columns=columns)
+        if 'label' not in frame.columns:
+            frame = frame.assign(label=0)
+        frame = frame[['rater', 'item', 'start', 'length', 'label']] \
+            .drop_duplicates()
+        raters, self.raters = pd.factorize(frame['rater'])
+        items, self.items = pd.factorize(frame['item'])
+        num_items, num_raters = len(self.items), len(self.raters)
+        # rated[i, r] = 1 if rater r annotated item i
+        self._rated = sparse.csc_matrix(
+            (np.ones(len(frame), dtype=np.int64), (items, raters)),
+            shape=(num_items, num_raters),
+        )
+        self._rated.sum_duplicates()
+        self._rated.data[:] = 1
+        has_span = frame['start'].notna().to_numpy()
+        raters, items = raters[has_span], items[has_span]
+        start = frame['start'].to_numpy()[has_span].astype(np.int64)
+        end = start + frame['length'].to_numpy()[has_span].astype(np.int64)
+        # a missing label is a label of its own
+        labels, _ = pd.factorize(frame['label'][has_span],
+                                 use_na_sentinel=False)
+        group = items.astype(np.int64) * (labels.max(initial=0) + 1) + labels
+        width = int(end.max(initial=0)) + 1
+        start_key, end_key = group * width + start, group * width + end
+        # equal spans get the same id (by rank of (start, end))
+        order = np.lexsort((end_key, start_key))
+        new = np.ones(len(order), dtype=bool)
+        new[1:] = (np.diff(start_key[order]) != 0) | \
+            (np.diff(end_key[order]) != 0)
+        exact = np.empty(len(order), dtype=np.int64)
+        exact[order] = np.cumsum(new) - 1
+        # spans sorted by rater and start, split per rater (spans of a rater
+        # are unique after dropping duplicates)
+        order = np.lexsort((start_key, raters))
+        bounds = np.searchsorted(raters[order], np.arange(num_raters + 1))
+        self._spans = []
+        for rater in range(num_raters):
+            selected = order[bounds[rater]:bounds[rater + 1]]
+            self._spans.append(_RaterSpans(
+                item=items[selected],
+                start=start_key[selected],
+                end=end_key[selected],
+                reach=np.maximum.accumulate(end_key[selected]),
+                exact=np.sort(exact[selected]),
+            ))
+
+    @staticmethod
+    def _overlapping(spans, other):
+        """Get the mask of `spans` that overlap a span of `other`."""
+        # last span of other starting before the end of each span; spans of
+        # other groups never reach past the start (keys are offset by group)
+        last = np.searchsorted(other.start, spans.end, side='left') - 1
+        found = last >= 0
+        overlapping = np.zeros(len(spans.start), dtype=bool)
+        overlapping[found] = other.reach[last[found]] > spans.start[found]
+        return overlapping
+
+    def _pair_scores(self, count):
+        """Build the data frame of pairwise scores.
+
+        `count(a, b)` gets the spans of two raters and returns the number of
+        spans of `a` matched by `b` and the number of spans of `b` matched by
+        `a`.
+        """
+        rows = []
+        for a, b in zip(*np.triu_indices(len(self.raters), k=1)):
+            common = (self._rated[:, a].multiply(self._rated[:, b])) \
+                .toarray().ravel().astype(bool)
+            num_items = int(common.sum())
+            if num_items == 0:
+                continue
+            spans_a, spans_b = self._spans[a], self._spans[b]
+            matched_a, matched_b = count(spans_a, spans_b)
+            rows.append((a, b, num_items,
+                         common[spans_a.item].sum(), matched_a,
+                         common[spans_b.item].sum(), matched_b))
+        if not rows:
+            return pd.DataFrame(columns=_COLUMNS)
+        a, b, num_items, n_a, matched_a, n_b, matched_b = \
+            map(np.asarray, zip(*rows))
+        precision = divide(matched_b, n_b)
+        recall = divide(matched_a, n_a)
+        return pd.DataFrame({
+            'Rater 1': self.raters[a],
+            'Rater 2': self.raters[b],
+            'Items': num_items,
+            'Precision': precision,
+            'Recall': recall,
+            'F1': divide(2 * precision * recall, precision + recall),
+        }, columns=_COLUMNS)
+
+    def exact(self) -> pd.DataFrame:
+        """Get the exact match agreement of each pair of raters.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per pair of raters with common items: the fraction of
+            spans of the second (precision) and first (recall) rater that
+            the other rater annotated identically, and their F1.
+        """
+        def count(a, b):
+            matched = len(np.intersect1d(a.exact, b.exact, assume_unique=True))
+            return matched, matched
+        return self._pair_scores(count)
+
+    def partial(self) -> pd.DataFrame:
+        """Get the partial match agreement of each pair of raters.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per pair of raters with common items: the fraction of
+            spans of the second (precision) and first (recall) rater that
+            overlap a span with the same label of the other rater, and their
+            F1.
+        """
+        def count(a, b):
+            return self._overlapping(a, b).sum(), \
+                self._overlapping(b, a).sum()
+        return self._pair_scores(count)
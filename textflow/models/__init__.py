@@ -8,11 +8,15 @@ The modules in this package are independent of the database package.
 Classes
 -------
 Annotation
+AnnotationLabel
 AnnotationSet
 AnnotationSpan
+BackgroundJob
 Document
+DocumentTokens
 Label
 Project
+Suggestion
 User
 RefreshToken
 Assignment
@@ -22,12 +26,15 @@ TaskSchema
 from textflow.models.annotation import (
     AnnotationSet,
     Annotation,
+    AnnotationLabel,
     AnnotationSpan,
 )
 from textflow.models.base import mapper_registry, ModelType
-from textflow.models.document import Document
+from textflow.models.document import Document, DocumentTokens
+from textflow.models.job import BackgroundJob
 from textflow.models.label import Label
 from textflow.models.project import Project
+from textflow.models.suggestion import Suggestion
 from textflow.models.task import Task
 from textflow.models.user import (
     User,
@@ -38,11 +45,15 @@ from textflow.models.user import (
 
 __all__ = [
     'Annotation',
+    'AnnotationLabel',
     'AnnotationSet',
     'AnnotationSpan',
+    'BackgroundJob',
     'Document',
+    'DocumentTokens',
     'Project',
     'Label',
+    'Suggestion',
     'User',
     'Assignment',
     'RefreshToken',
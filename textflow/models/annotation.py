@@ -102,6 +102,8 @@ class AnnotationLabel(ModelMixin):
             server_default=sa.func.now(),
             server_onupdate=sa.func.now()
         ),
+        # the primary key only serves lookups by label
+        sa.Index('ix_annotation_label_annotation_id', 'annotation_id'),
     )
 
 
@@ -148,6 +150,7 @@ class Annotation(ModelMixin):
             'updated_on', sa.DateTime, server_default=sa.func.now(),
             server_onupdate=sa.func.now()
         ),
+        sa.Index('ix_annotation_annotation_set_id', 'annotation_set_id'),
     )
     __mapper_args__ = {  # type: ignore
         "properties": dict(
@@ -237,6 +240,11 @@ class AnnotationSet(ModelMixin):
             'updated_on', sa.DateTime, server_default=sa.func.now(),
             server_onupdate=sa.func.now()
         ),
+        sa.Index('ix_annotation_set_document_id_completed',
+                 'document_id', 'completed'),
+        # one annotation set per user and document
+        sa.Index('uq_annotation_set_user_id_document_id',
+                 'user_id', 'document_id', unique=True),
     )
 
     __mapper_args__ = {  # type: ignore
@@ -257,7 +265,3 @@ class AnnotationSet(ModelMixin):
             )
         )
     }
-
-    __table_args__ = (
-        sa.UniqueConstraint('user_id', 'document_id'),
-    )
@@ -5,6 +5,7 @@ This module contains the Document model.
 Classes
 -------
 Document
+DocumentTokens
 """
 
 import sqlalchemy as sa
@@ -13,7 +14,8 @@ from sqlalchemy.ext.hybrid import hybrid_property
 from textflow.models.base import mapper_registry, ModelMixin
 
 __all__ = [
-'Document',
+    'Document',
+    'DocumentTokens',
 ]
 
 
@@ -34,6 +36,15 @@ class Document(ModelMixin):
         Meta information of document.
     project_id : int
         Project id.
+    num_completed : int
+        Number of completed annotation sets of document (maintained by
+        `textflow.database.events`).
+    num_in_progress : int
+        Number of annotation sets of document that are neither completed
+        nor skipped (maintained by `textflow.database.events`).
+    priority : float
+        Priority of document in projects ordered by model uncertainty
+        (higher first, see `textflow.services.activelearning`).
     """
     __table__ = sa.Table(
         'document',
@@ -44,7 +55,13 @@ class Document(ModelMixin):
         sa.Column('meta', sa.JSON, nullable=True),
         sa.Column('project_id', sa.Integer, sa.ForeignKey('project.id'),
                   nullable=False),
-
+        sa.Column('num_completed', sa.Integer, nullable=False, default=0,
+                  server_default='0'),
+        sa.Column('num_in_progress', sa.Integer, nullable=False, default=0,
+                  server_default='0'),
+        sa.Column('priority', sa.Float, nullable=False, default=0,
+                  server_default='0'),
+        sa.Index('ix_document_project_id_id', 'project_id', 'id'),
     )
 
     @hybrid_property
@@ -54,3 +71,47 @@ class Document(ModelMixin):
     @id_str.setter
     def id_str(self, value):
         self.source_id = value
+
+
+# documents by descending completion count (next documents are read in the
+# order of the index)
+sa.Index('ix_document_project_id_num_completed_desc',
+         Document.__table__.c.project_id,
+         Document.__table__.c.num_completed.desc(),
+         Document.__table__.c.id)
+# documents by descending completion count and priority
+sa.Index('ix_document_project_id_num_completed_desc_priority',
+         Document.__table__.c.project_id,
+         Document.__table__.c.num_completed.desc(),
+         Document.__table__.c.priority.desc(),
+         Document.__table__.c.id)
+
+
+@mapper_registry.mapped
+class DocumentTokens(ModelMixin):
+    """DocumentTokens Entity. Contains the token offsets of a document.
+
+    Attributes
+    ----------
+    document_id : int
+        Document id (primary key).
+    tokenizer : str
+        Name of the tokenizer (see `textflow.utils.text.tokenizers`).
+    text_hash : bytes
+        Hash of the tokenized text (see `textflow.utils.text.text_hash`).
+    num_tokens : int
+        Number of tokens.
+    offsets : bytes
+        Packed little endian int32 (start, end) pairs (see
+        `textflow.utils.text.TokenOffsets.to_bytes`).
+    """
+    __table__ = sa.Table(
+        'document_token',
+        mapper_registry.metadata,
+        sa.Column('document_id', sa.Integer, sa.ForeignKey('document.id'),
+                  primary_key=True),
+        sa.Column('tokenizer', sa.String(50), nullable=False),
+        sa.Column('text_hash', sa.LargeBinary(16), nullable=False),
+        sa.Column('num_tokens', sa.Integer, nullable=False),
+        sa.Column('offsets', sa.LargeBinary, nullable=False),
+    )
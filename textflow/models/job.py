@@ -0,0 +1,94 @@
+"""Background job model.
+
+This module contains the BackgroundJob model.
+
+Classes
+-------
+BackgroundJob
+"""
+import uuid
+
+import sqlalchemy as sa
+from textflow import schemas
+
+from textflow.models.base import mapper_registry, ModelMixin
+
+__all__ = [
+    'BackgroundJob',
+]
+
+
+def _new_job_id():
+    return uuid.uuid4().hex
+
+
+@mapper_registry.mapped
+class BackgroundJob(ModelMixin):
+    """BackgroundJob Entity. Contains the state of a long running operation
+    (see `textflow.services.jobs`).
+
+    Attributes
+    ----------
+    id : str
+        Primary key (random hex string).
+    name : str
+        Name of the job type.
+    params : dict
+        Keyword arguments of the job.
+    user_id : int
+        Id of the user that submitted the job.
+    project_id : int
+        Id of the project of the job.
+    status : JobStatusEnum
+        Queued, running, done, failed or cancelled.
+    progress : int
+        Number of items processed.
+    total : int
+        Number of items to process (None if not known).
+    result : dict
+        Result of a finished job.
+    error : str
+        Error message of a failed job.
+    cancel_requested : bool
+        Whether the job should stop at its next progress update.
+    worker : str
+        Name of the worker running the job (host:pid).
+    created_on : datetime
+        Submitted on.
+    started_on : datetime
+        Started on.
+    finished_on : datetime
+        Finished on.
+    updated_on : datetime
+        Last progress update.
+    """
+    __table__ = sa.Table(
+        'background_job',
+        mapper_registry.metadata,
+        sa.Column('id', sa.String(32), primary_key=True,
+                  default=_new_job_id),
+        sa.Column('name', sa.String(80), nullable=False),
+        sa.Column('params', sa.JSON, nullable=True),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id'),
+                  nullable=True),
+        sa.Column('project_id', sa.Integer, sa.ForeignKey('project.id'),
+                  nullable=True),
+        sa.Column('status', sa.Enum(schemas.JobStatusEnum), nullable=False,
+                  default=schemas.JobStatusEnum.queued),
+        sa.Column('progress', sa.Integer, nullable=False, default=0),
+        sa.Column('total', sa.Integer, nullable=True),
+        sa.Column('result', sa.JSON, nullable=True),
+        sa.Column('error', sa.Text, nullable=True),
+        sa.Column('cancel_requested', sa.Boolean, nullable=False,
+                  default=False),
+        sa.Column('worker', sa.String(255), nullable=True),
+        sa.Column('created_on', sa.DateTime, server_default=sa.func.now()),
+        sa.Column('started_on', sa.DateTime, nullable=True),
+        sa.Column('finished_on', sa.DateTime, nullable=True),
+        sa.Column('updated_on', sa.DateTime, nullable=True),
+        # workers claim the oldest queued job
+        sa.Index('ix_background_job_status_created_on',
+                 'status', 'created_on'),
+        sa.Index('ix_background_job_project_id_created_on',
+                 'project_id', 'created_on'),
+    )
@@ -34,4 +34,5 @@ class Label(ModelMixin):
         sa.Column('color', sa.String(9), CheckConstraint(
             "color LIKE '#______%'"), nullable=True),
         sa.Column('group', sa.String(50), nullable=True),
+        sa.Index('ix_label_task_id', 'task_id'),
     )
@@ -40,6 +40,9 @@ class Project(ModelMixin):
         Redundancy of number of annotations per document user.
     guideline_template : str
         Template for guideline.
+    ordering : str
+        Order in which documents are handed out to annotators: `sequential`
+        (by id) or `uncertainty` (by `Document.priority`).
     jobs : list of BackgroundJob
         Background jobs related to this project.
     tasks : list of Task
@@ -54,6 +57,8 @@ class Project(ModelMixin):
                   default='Description is not available.'),
         sa.Column('redundancy', sa.Integer, default=3, nullable=True),
         sa.Column('guideline', sa.Text, default=None, nullable=True),
+        sa.Column('ordering', sa.String(20), default='sequential',
+                  nullable=True),
     )
 
     __mapper_args__ = {
@@ -63,5 +68,7 @@ class Project(ModelMixin):
                                             lazy=True, cascade='all, delete'),
             tasks=sa.orm.relationship('Task', backref='project', lazy=True,
                                       order_by='Task.order'),
+            jobs=sa.orm.relationship('BackgroundJob', backref='project',
+                                     lazy=True, cascade='all, delete'),
         )
     }
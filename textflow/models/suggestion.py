@@ -0,0 +1,63 @@
+"""Suggestion model.
+
+This module contains the Suggestion model.
+
+Classes
+-------
+Suggestion
+"""
+import sqlalchemy as sa
+
+from textflow.models.base import mapper_registry, ModelMixin
+
+__all__ = [
+    'Suggestion',
+]
+
+
+@mapper_registry.mapped
+class Suggestion(ModelMixin):
+    """Suggestion Entity. Contains a label predicted by the auto-model of a
+    task (kept apart from the annotation sets of users).
+
+    Attributes
+    ----------
+    id : int
+        Primary key.
+    document_id : int
+        Document id.
+    task_id : int
+        Task id.
+    label_id : int
+        Label id.
+    start : int
+        Start of the span (None for text classification).
+    length : int
+        Length of the span (None for text classification).
+    score : float
+        Probability of the prediction.
+    snapshot : str
+        Training data snapshot of the model that made the prediction.
+    created_on : datetime
+        Created on.
+    """
+    __table__ = sa.Table(
+        'suggestion',
+        mapper_registry.metadata,
+        sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column('document_id', sa.Integer, sa.ForeignKey('document.id'),
+                  nullable=False),
+        sa.Column('task_id', sa.Integer, sa.ForeignKey('task.id'),
+                  nullable=False),
+        sa.Column('label_id', sa.Integer, sa.ForeignKey('label.id'),
+                  nullable=False),
+        sa.Column('start', sa.Integer, nullable=True),
+        sa.Column('length', sa.Integer, nullable=True),
+        sa.Column('score', sa.Float, nullable=False),
+        sa.Column('snapshot', sa.String(32), nullable=False),
+        sa.Column('created_on', sa.DateTime, server_default=sa.func.now()),
+        # suggestions of a document are read with one index lookup
+        sa.Index('ix_suggestion_document_id_task_id',
+                 'document_id', 'task_id'),
+        sa.Index('ix_suggestion_task_id', 'task_id'),
+    )
@@ -55,6 +55,7 @@ class Task(ModelMixin):
         sa.Column('condition', sa.JSON, nullable=True),
         sa.Column('project_id', sa.Integer, sa.ForeignKey('project.id'),
                   nullable=False),
+        sa.Index('ix_task_project_id', 'project_id'),
     )
 
     __mapper_args__ = {
@@ -46,6 +46,8 @@ class Assignment(ModelMixin):
                   primary_key=True),
         sa.Column('role', sa.Enum(schemas.AssignmentRoleEnum),
                   nullable=False, default=schemas.AssignmentRoleEnum.default),
+        # the primary key only serves lookups by user
+        sa.Index('ix_assignment_project_id', 'project_id'),
     )
 
 
@@ -155,6 +157,11 @@ class User(ModelMixin, UserMixin):
                 'Assignment',
                 backref='user', lazy=True,
                 cascade='all, delete-orphan',
-            )
+            ),
+            jobs=sa.orm.relationship(
+                'BackgroundJob',
+                backref='user', lazy=True,
+                cascade='all, delete-orphan',
+            ),
         )
     }
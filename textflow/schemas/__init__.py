@@ -4,11 +4,15 @@ Classes
 -------
 Annotation
 AnnotationSet
+AnnotationSetTree
 AnnotationSpan
+AnnotationTree
+BackgroundJob
 Document
 DocumentBase
 Label
 Project
+Suggestion
 Assignment
 User
 RefreshToken
@@ -18,19 +22,24 @@ TaskSchema
 
 Enums
 -----
+JobStatusEnum
 UserRoleEnum
 AssignmentRoleEnum
 ThemeEnum
 """
 from textflow.schemas.annotation import (
     AnnotationSet,
+    AnnotationSetTree,
     Annotation,
     AnnotationSpan,
+    AnnotationTree,
 )
 from textflow.schemas.base import Schema
 from textflow.schemas.document import Document, DocumentBase
+from textflow.schemas.job import BackgroundJob, JobStatusEnum
 from textflow.schemas.label import Label
 from textflow.schemas.project import Project, ProjectBase
+from textflow.schemas.suggestion import Suggestion
 from textflow.schemas.task import Task, TaskBase
 from textflow.schemas.user import (
     User,
@@ -45,18 +54,23 @@ from textflow.schemas.user import (
 __all__ = [
     'Annotation',
     'AnnotationSet',
+    'AnnotationSetTree',
     'AnnotationSpan',
+    'AnnotationTree',
+    'BackgroundJob',
     'Document',
     'DocumentBase',
     'Project',
     'ProjectBase',
     'Label',
+    'Suggestion',
     'User',
     'Assignment',
     'Task',
     'TaskBase',
     'RefreshToken',
     'Schema',
+    'JobStatusEnum',
     'UserRoleEnum',
     'AssignmentRoleEnum',
     'ThemeEnum',
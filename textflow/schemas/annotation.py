@@ -6,6 +6,8 @@ Annotation
 AnnotationSet
 AnnotationSpan
 AnnotationLabel
+AnnotationTree
+AnnotationSetTree
 """
 import datetime
 import typing
@@ -13,12 +15,15 @@ import typing
 import pydantic
 
 from textflow.schemas.base import Schema
+from textflow.schemas.label import Label
 
 __all__ = [
     'Annotation',
     'AnnotationSet',
     'AnnotationSpan',
     'AnnotationLabel',
+    'AnnotationSetTree',
+    'AnnotationTree',
 ]
 
 
@@ -58,3 +63,13 @@ class AnnotationSet(Schema):
         pydantic.Field(default=None)
     updated_on: typing.Optional[datetime.datetime] = \
         pydantic.Field(default=None)
+
+
+class AnnotationTree(Annotation):
+    span: typing.Optional[AnnotationSpan] = pydantic.Field(default=None)
+    labels: typing.List[Label] = pydantic.Field(default_factory=list)
+
+
+class AnnotationSetTree(AnnotationSet):
+    annotations: typing.List[AnnotationTree] = \
+        pydantic.Field(default_factory=list)
@@ -0,0 +1,53 @@
+"""Background job schema.
+
+Classes
+-------
+BackgroundJob
+
+Enums
+-----
+JobStatusEnum
+"""
+import datetime
+import enum
+import typing
+
+import pydantic
+
+from textflow.schemas.base import Schema
+
+__all__ = [
+    'BackgroundJob',
+    'JobStatusEnum',
+]
+
+
+class JobStatusEnum(enum.Enum):
+    queued = 'queued'
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+    cancelled = 'cancelled'
+
+
+class BackgroundJob(Schema):
+    name: str = pydantic.Field(max_length=80)
+    params: typing.Optional[dict] = pydantic.Field(default=None)
+    user_id: typing.Optional[int] = pydantic.Field(default=None)
+    project_id: typing.Optional[int] = pydantic.Field(default=None)
+    status: JobStatusEnum = pydantic.Field(default=JobStatusEnum.queued)
+    progress: int = pydantic.Field(default=0)
+    total: typing.Optional[int] = pydantic.Field(default=None)
+    result: typing.Optional[typing.Any] = pydantic.Field(default=None)
+    error: typing.Optional[str] = pydantic.Field(default=None)
+    cancel_requested: bool = pydantic.Field(default=False)
+    worker: typing.Optional[str] = pydantic.Field(default=None)
+    id: typing.Optional[str] = pydantic.Field(default=None)
+    created_on: typing.Optional[datetime.datetime] = \
+        pydantic.Field(default=None)
+    started_on: typing.Optional[datetime.datetime] = \
+        pydantic.Field(default=None)
+    finished_on: typing.Optional[datetime.datetime] = \
+        pydantic.Field(default=None)
+    updated_on: typing.Optional[datetime.datetime] = \
+        pydantic.Field(default=None)
@@ -27,6 +27,8 @@ class ProjectBase(Schema):
     redundancy: typing.Optional[int] = pydantic.Field(default=3, ge=1)
     guideline: typing.Optional[str] = \
         pydantic.Field(default=None)
+    ordering: typing.Optional[str] = pydantic.Field(
+        default='sequential', regex='^(sequential|uncertainty)$')
 
 
 class Project(ProjectBase):
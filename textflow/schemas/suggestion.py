@@ -0,0 +1,29 @@
+"""Suggestion schema.
+
+Classes
+-------
+Suggestion
+"""
+import datetime
+import typing
+
+import pydantic
+
+from textflow.schemas.base import Schema
+
+__all__ = [
+    'Suggestion',
+]
+
+
+class Suggestion(Schema):
+    document_id: int = pydantic.Field()
+    task_id: int = pydantic.Field()
+    label_id: int = pydantic.Field()
+    start: typing.Optional[int] = pydantic.Field(default=None)
+    length: typing.Optional[int] = pydantic.Field(default=None)
+    score: float = pydantic.Field()
+    snapshot: str = pydantic.Field()
+    id: typing.Optional[int] = pydantic.Field(default=None)
+    created_on: typing.Optional[datetime.datetime] = \
+        pydantic.Field(default=None)
@@ -0,0 +1,23 @@
+"""In-process services that keep state next to the database.
+
+Modules
+-------
+activelearning
+    Document priorities from the uncertainty of auto-models.
+agreement
+    Incrementally maintained inter-annotator agreement of projects.
+automodel
+    Per task models trained from completed annotation sets.
+documents
+    Imports, tokenization and deletes of documents as background jobs.
+export
+    Streaming export of projects with their annotations.
+jobs
+    Background jobs queued in the database with progress and cancellation.
+preannotation
+    Suggestions of auto-models for unannotated documents.
+scheduler
+    Hand out documents to annotators with time limited leases.
+stats
+    Cached, incrementally maintained project progress reports.
+"""
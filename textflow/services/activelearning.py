@@ -0,0 +1,171 @@
+"""Active learning.
+
+Projects ordered by `uncertainty` (see `textflow.models.Project.ordering`)
+hand out the documents that the auto-model of a task is least certain about
+first, so that fewer annotations are needed to train an accurate model. The
+uncertainty of the model is stored as `Document.priority` of the documents
+without completed annotation sets and is read through the
+`(project_id, num_completed DESC, priority DESC, id)` index of documents by
+`op.get_next_document` and the scheduler.
+
+Notes
+-----
+Documents are scored in keyset batches with one vectorized call of the model
+per batch (see `AutoModel.uncertainty`) and the priorities of a batch are
+written with a single executemany update. Priorities are scored again after
+the model is retrained, as a `prioritize` background job (see
+`textflow.services.jobs`). The scheduler queues of the process that runs the
+job are rebuilt afterwards; other processes pick up the new priorities when
+their queues are rebuilt.
+
+Example
+-------
+>>> from textflow.services.activelearning import iter_prioritize
+>>> for num_docs in iter_prioritize(session, project_id=1, task_id=1,
+...                                 model=model, method='margin'):
+...     print(f'{num_docs} documents scored')
+"""
+import logging
+import typing
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from textflow.models import Document
+from textflow.services.automodel import AutoModel, UNCERTAINTY_METHODS, \
+    automodels
+from textflow.services.jobs import job_type
+from textflow.services.scheduler import scheduler
+
+__all__ = [
+    'DEFAULT_BATCH_SIZE',
+    'iter_prioritize',
+    'prioritize',
+]
+
+logger = logging.getLogger(__name__)
+
+# number of documents scored at once
+DEFAULT_BATCH_SIZE = 5000
+
+
+def iter_prioritize(
+    session: Session, *, project_id: int, task_id: int, model: AutoModel,
+    method: str = 'entropy', batch_size: int = DEFAULT_BATCH_SIZE,
+    n_jobs: typing.Optional[int] = 1,
+) -> typing.Generator[int, None, int]:
+    """Set the priority of the unannotated documents of a project to the
+    uncertainty of a model.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    task_id : int
+        Task id of the model (used in log messages).
+    model : AutoModel
+        Trained model of the task.
+    method : str
+        Uncertainty measure: `entropy` or `margin`.
+    batch_size : int
+        Number of documents scored and committed at once.
+    n_jobs : typing.Optional[int]
+        Number of feature extraction processes (all CPUs if None).
+
+    Yields
+    ------
+    int
+        Number of documents scored.
+
+    Returns
+    -------
+    int
+        Number of documents scored.
+    """
+    if method not in UNCERTAINTY_METHODS:
+        raise ValueError(f'Unknown uncertainty method {method!r}, expected '
+                         f'one of {UNCERTAINTY_METHODS}.')
+    document = Document.__table__
+    # Core statements, the priority is not a change of the documents that
+    # services listen for
+    select = sa.select(document.c.id, document.c.text) \
+        .where(
+            document.c.project_id == project_id,
+            document.c.num_completed == 0,
+            document.c.id > sa.bindparam('after'),
+        ) \
+        .order_by(document.c.id) \
+        .limit(batch_size)
+    update = document.update() \
+        .where(document.c.id == sa.bindparam('document_id')) \
+        .values(priority=sa.bindparam('priority'))
+    num_docs = 0
+    after = 0
+    while True:
+        rows = session.execute(select, {'after': after}).all()
+        if not rows:
+            logger.info(f'{num_docs} documents of project {project_id} '
+                        f'scored by the model of task {task_id}')
+            return num_docs
+        after = rows[-1].id
+        scores = model.uncertainty([row.text for row in rows], method=method,
+                                   n_jobs=n_jobs)
+        try:
+            session.execute(update, [
+                {'document_id': row.id, 'priority': score}
+                for row, score in zip(rows, scores.tolist())
+            ])
+        except Exception:
+            session.rollback()
+            raise
+        else:
+            session.commit()
+        num_docs += len(rows)
+        yield num_docs
+
+
+@job_type('prioritize')
+def prioritize(session: Session, *, project_id: int, task_id: int,
+               method: str = 'entropy',
+               batch_size: int = DEFAULT_BATCH_SIZE) -> \
+        typing.Generator[int, None, dict]:
+    """Score the documents of a project with the latest model of a task
+    (background job).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    task_id : int
+        Task id of the model.
+    method : str
+        Uncertainty measure: `entropy` or `margin`.
+    batch_size : int
+        Number of documents scored at once.
+
+    Yields
+    ------
+    int
+        Number of documents scored.
+
+    Returns
+    -------
+    dict
+        `num_documents` scored and `snapshot` of the model.
+    """
+    model = automodels.get_model(project_id, task_id)
+    if model is None:
+        raise ValueError(f'Task {task_id} has no trained auto-model.')
+    try:
+        num_docs = yield from iter_prioritize(
+            session, project_id=project_id, task_id=task_id, model=model,
+            method=method, batch_size=batch_size, n_jobs=automodels.n_jobs,
+        )
+    finally:
+        # queues are ordered by the priorities at build time
+        scheduler.invalidate(project_id)
+    return {'num_documents': num_docs, 'snapshot': model.snapshot}
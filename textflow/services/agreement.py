@@ -0,0 +1,354 @@
+"""Live inter-annotator agreement.
+
+This module keeps the sufficient statistics of the agreement scores of
+`textflow.metrics.agreement` per task of a project in memory: label counts
+of every pair of annotators over the documents both labeled (for
+percentage agreement and Cohen's kappa) and label counts over documents
+(for Fleiss' kappa and Krippendorff's alpha). Items of a task are documents
+and the labels of an annotator are the labels of the task in their
+completed annotation set (an annotator without labels of the task did not
+rate the document for that task).
+
+Notes
+-----
+The labels of completed (or reopened) annotation sets and of completed
+annotation sets whose annotations or labels changed are read in the flush
+that changed them and applied when they are committed through this process
+(see `textflow.database.events`): each annotation set updates the counts in
+O(annotators x labels) of its document, so reading a report does not query
+the database unless the counts are rebuilt. Changes committed by other
+processes are picked up when the counts expire.
+
+Example
+-------
+>>> from textflow.services.agreement import agreement
+>>> agreement.get_report(session, project_id=1)
+{'tasks': [{'task_id': 1,
+            'pairs': [{'user_ids': [1, 2], 'items': 10, 'percentage': 0.7,
+                       'kappa': 0.348}],
+            'labels': [{'label_id': 1, 'items': 10, 'fleiss': 0.341,
+                        'alpha': 0.374}, ...]}]}
+"""
+import collections
+import math
+import threading
+import time
+import typing
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from textflow.database import events
+from textflow.metrics.agreement import alpha_from_counts, \
+    fleiss_from_counts, kappa_from_counts, percentage_from_counts
+from textflow.models import Annotation, AnnotationSet, Document, Label
+from textflow.models.annotation import AnnotationLabel
+
+__all__ = [
+    'AgreementTracker',
+    'agreement',
+]
+
+# seconds cached counts are used before they are rebuilt (config
+# `AGREEMENT_CACHE_TTL`). changes committed by other processes show after up
+# to this long.
+AGREEMENT_CACHE_TTL = 5
+
+
+class _PairCounts(object):
+    __slots__ = ('n', 'n1', 'n2', 'n11')
+
+    def __init__(self):
+        # documents completed by both annotators
+        self.n = 0
+        # label id -> number of those documents with the label by the
+        # first (second, both) annotator(s)
+        self.n1 = collections.Counter()
+        self.n2 = collections.Counter()
+        self.n11 = collections.Counter()
+
+
+class _TaskCounts(object):
+    def __init__(self):
+        # document_id -> user_id -> label ids
+        self.items: typing.Dict[int, typing.Dict[int, frozenset]] = {}
+        # (user_id, user_id) -> counts (smaller user id first)
+        self.pairs: typing.Dict[typing.Tuple[int, int], _PairCounts] = {}
+        # documents with at least two annotators and their annotators
+        self.num_items = 0
+        self.total = 0
+        # label id -> number of ratings with the label and disagreement
+        # sums (see `textflow.metrics.agreement`)
+        self.n1 = collections.Counter()
+        self.alpha_disagreement = collections.defaultdict(float)
+        self.fleiss_disagreement = collections.defaultdict(float)
+
+    def _update_item(self, raters, sign):
+        m = len(raters)
+        if m < 2:
+            return
+        self.num_items += sign
+        self.total += sign * m
+        counts = collections.Counter(
+            label for labels in raters.values() for label in labels
+        )
+        for label, x in counts.items():
+            self.n1[label] += sign * x
+            self.alpha_disagreement[label] += sign * x * (m - x) / (m - 1)
+            self.fleiss_disagreement[label] += \
+                sign * 2 * x * (m - x) / (m * (m - 1))
+
+    def _update_pair(self, user_id, labels, other_id, other_labels, sign):
+        if user_id > other_id:
+            user_id, labels, other_id, other_labels = \
+                other_id, other_labels, user_id, labels
+        counts = self.pairs.get((user_id, other_id))
+        if counts is None:
+            counts = self.pairs[(user_id, other_id)] = _PairCounts()
+        counts.n += sign
+        for label in labels:
+            counts.n1[label] += sign
+        for label in other_labels:
+            counts.n2[label] += sign
+        for label in labels & other_labels:
+            counts.n11[label] += sign
+
+    def add(self, document_id, user_id, labels):
+        self.remove(document_id, user_id)
+        raters = self.items.setdefault(document_id, {})
+        self._update_item(raters, -1)
+        for other_id, other_labels in raters.items():
+            self._update_pair(user_id, labels, other_id, other_labels, 1)
+        raters[user_id] = labels
+        self._update_item(raters, 1)
+
+    def remove(self, document_id, user_id):
+        raters = self.items.get(document_id)
+        if raters is None or user_id not in raters:
+            return
+        self._update_item(raters, -1)
+        labels = raters.pop(user_id)
+        for other_id, other_labels in raters.items():
+            self._update_pair(user_id, labels, other_id, other_labels, -1)
+        self._update_item(raters, 1)
+        if not raters:
+            del self.items[document_id]
+
+    def report(self):
+        pairs = []
+        for (user_id, other_id), pair in sorted(self.pairs.items()):
+            if pair.n <= 0:
+                continue
+            labels = list(set(pair.n1) | set(pair.n2))
+            args = (
+                [pair.n],
+                [[pair.n1[label]] for label in labels],
+                [[pair.n2[label]] for label in labels],
+                [[pair.n11[label]] for label in labels],
+            )
+            pairs.append({
+                'user_ids': [user_id, other_id],
+                'items': pair.n,
+                'percentage': _nan_to_none(
+                    percentage_from_counts(*args)[0]
+                ),
+                'kappa': _nan_to_none(kappa_from_counts(*args)[0]),
+            })
+        labels = sorted(label for label, n1 in self.n1.items() if n1 > 0)
+        n1 = [self.n1[label] for label in labels]
+        fleiss = fleiss_from_counts(
+            self.num_items, self.total, n1,
+            [self.fleiss_disagreement[label] for label in labels],
+        )
+        alpha = alpha_from_counts(
+            self.total, n1,
+            [self.alpha_disagreement[label] for label in labels],
+        )
+        return {
+            'pairs': pairs,
+            'labels': [
+                {
+                    'label_id': label,
+                    'items': self.num_items,
+                    'fleiss': _nan_to_none(fleiss[i]),
+                    'alpha': _nan_to_none(alpha[i]),
+                }
+                for i, label in enumerate(labels)
+            ],
+        }
+
+
+class _ProjectCounts(object):
+    def __init__(self, expires):
+        self.expires = expires
+        self.lock = threading.Lock()
+        # task_id -> counts
+        self.tasks: typing.Dict[int, _TaskCounts] = {}
+
+    def add(self, document_id, user_id, labels):
+        for task_id in set(self.tasks) | set(labels):
+            if task_id in labels:
+                counts = self.tasks.get(task_id)
+                if counts is None:
+                    counts = self.tasks[task_id] = _TaskCounts()
+                counts.add(document_id, user_id, labels[task_id])
+            else:
+                self.tasks[task_id].remove(document_id, user_id)
+
+    def remove(self, document_id, user_id):
+        for counts in self.tasks.values():
+            counts.remove(document_id, user_id)
+
+
+def _nan_to_none(value):
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def _select_labels(project_id):
+    """Select (document_id, user_id, task_id, label_id) of completed
+    annotation sets (task_id and label_id are None for annotation sets
+    without labels)."""
+    annotation_set = AnnotationSet.__table__
+    annotation = Annotation.__table__
+    annotation_label = AnnotationLabel.__table__
+    document = Document.__table__
+    label = Label.__table__
+    stmt = sa.select(
+        annotation_set.c.document_id,
+        annotation_set.c.user_id,
+        label.c.task_id,
+        annotation_label.c.label_id,
+    ) \
+        .select_from(
+            annotation_set
+            .join(document, document.c.id == annotation_set.c.document_id)
+            .outerjoin(annotation,
+                       annotation.c.annotation_set_id == annotation_set.c.id)
+            .outerjoin(annotation_label,
+                       annotation_label.c.annotation_id == annotation.c.id)
+            .outerjoin(label, label.c.id == annotation_label.c.label_id)
+        ) \
+        .where(
+            document.c.project_id == project_id,
+            annotation_set.c.completed.is_(True),
+        )
+    return stmt
+
+
+def _group_labels(rows):
+    """Group the label ids by annotation set and task."""
+    labels = collections.defaultdict(lambda: collections.defaultdict(set))
+    for document_id, user_id, task_id, label_id in rows:
+        by_task = labels[(document_id, user_id)]
+        if label_id is not None:
+            by_task[task_id].add(label_id)
+    return {
+        key: {task_id: frozenset(value) for task_id, value in by_task.items()}
+        for key, by_task in labels.items()
+    }
+
+
+class AgreementTracker(object):
+    """Incrementally maintained agreement of annotators.
+
+    Parameters
+    ----------
+    ttl : float
+        Time (in seconds) after which cached counts are rebuilt.
+    """
+
+    def __init__(self, ttl: float = AGREEMENT_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._projects: typing.Dict[int, _ProjectCounts] = {}
+        events.listen(events.ANNOTATIONS_CHANGED,
+                      self._on_annotations_changed)
+        events.listen(events.DOCUMENTS_CHANGED, self._on_documents_changed)
+
+    def _build(self, session, project_id):
+        counts = _ProjectCounts(time.monotonic() + self.ttl)
+        rows = session.execute(
+            _select_labels(project_id),
+            execution_options={'stream_results': True, 'yield_per': 10000},
+        )
+        for (document_id, user_id), labels in _group_labels(rows).items():
+            counts.add(document_id, user_id, labels)
+        return counts
+
+    def _get_counts(self, session, project_id):
+        with self._lock:
+            counts = self._projects.get(project_id)
+        if counts is None or counts.expires <= time.monotonic():
+            counts = self._build(session, project_id)
+            with self._lock:
+                self._projects[project_id] = counts
+        return counts
+
+    def get_report(self, session: Session, *, project_id: int,
+                   task_id: typing.Optional[int] = None) -> \
+            typing.Dict[str, list]:
+        """Get the agreement of the annotators of the tasks of a project.
+
+        Parameters
+        ----------
+        session : Session
+            Database session (used on cache misses).
+        project_id : int
+            Project id.
+        task_id : typing.Optional[int]
+            Task id (all tasks with labels if None).
+
+        Returns
+        -------
+        typing.Dict[str, list]
+            `tasks`: the agreement of every task (by task id). `pairs`:
+            percentage agreement and Cohen's kappa of every pair of
+            annotators with common documents. `labels`: Fleiss' kappa and
+            Krippendorff's alpha of every label. Undefined scores are None.
+        """
+        counts = self._get_counts(session, project_id)
+        with counts.lock:
+            tasks = []
+            for key, task_counts in sorted(counts.tasks.items()):
+                if task_id is not None and key != task_id:
+                    continue
+                report = task_counts.report()
+                tasks.append({'task_id': key, **report})
+            return {'tasks': tasks}
+
+    def invalidate(self, project_id: typing.Optional[int] = None) -> None:
+        """Drop the cached counts of project (all projects if None).
+
+        Parameters
+        ----------
+        project_id : typing.Optional[int]
+            Project id.
+        """
+        with self._lock:
+            if project_id is None:
+                self._projects.clear()
+            else:
+                self._projects.pop(project_id, None)
+
+    def _on_annotations_changed(self, changes):
+        if None in changes:
+            self.invalidate()
+            return
+        for (project_id, document_id, user_id), labels in changes.items():
+            with self._lock:
+                counts = self._projects.get(project_id)
+            if counts is None:
+                continue
+            with counts.lock:
+                if labels is None:
+                    counts.remove(document_id, user_id)
+                else:
+                    counts.add(document_id, user_id, labels)
+
+    def _on_documents_changed(self, project_ids):
+        for project_id in project_ids:
+            self.invalidate(project_id)
+
+
+agreement: AgreementTracker = AgreementTracker()
@@ -0,0 +1,827 @@
+"""Auto-models.
+
+Models are trained per task from the completed annotation sets of a project:
+`text-classification` tasks get a logistic regression over tf-idf features
+of the text (one-vs-rest, so that annotation sets can have several labels)
+and `sequence-labeling` tasks get a linear-chain CRF over token features
+with BIO tags (requires `sklearn-crfsuite`).
+
+Notes
+-----
+Features are extracted in a joblib process pool over chunks of documents.
+Trained models are saved in the model directory (config `AUTOMODEL_DIR`)
+under the project, the task and a hash of the training data snapshot, so
+that a task is only trained again after its annotations (or the texts of the
+annotated documents) changed. Training runs off the request path as a
+`train_automodel` background job (see `textflow.services.jobs`).
+
+Example
+-------
+>>> from textflow.services.automodel import automodels
+>>> model = automodels.train(session, project_id=1, task_id=1)
+>>> model.predict(['A great movie'])
+[[{'label_id': 1, 'start': None, 'length': None, 'score': 0.83}]]
+"""
+import collections
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import typing
+
+import joblib
+import numpy as np
+import sqlalchemy as sa
+from sklearn.feature_extraction.text import HashingVectorizer, \
+    TfidfTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.multiclass import OneVsRestClassifier
+from sklearn.preprocessing import MultiLabelBinarizer
+from scipy import sparse
+from sqlalchemy.orm import Session
+
+from textflow.models import Annotation, AnnotationSet, AnnotationSpan, \
+    Document, Label, Task
+from textflow.models.annotation import AnnotationLabel
+from textflow.services.jobs import job_type
+from textflow.utils.plugin import PluginManager
+from textflow.utils.text import get_tokenizer, text_hash
+
+__all__ = [
+    'AutoModel',
+    'AutoModelManager',
+    'UNCERTAINTY_METHODS',
+    'Example',
+    'SequenceTagger',
+    'TextClassifier',
+    'automodel_types',
+    'automodels',
+    'get_model_type',
+    'import_crfsuite',
+    'load_examples',
+    'snapshot_hash',
+    'train_automodel',
+    'uncertainty_scores',
+]
+
+logger = logging.getLogger(__name__)
+
+# changes of the models or their features must increment the version so
+# that models trained before are not reused
+MODEL_VERSION = 1
+
+# number of documents per feature extraction job
+DEFAULT_CHUNK_SIZE = 500
+
+# methods of `AutoModel.uncertainty`
+UNCERTAINTY_METHODS = ('entropy', 'margin')
+
+automodel_types = PluginManager()
+
+# training example of an annotation set: labels is a frozenset of label ids
+# (text classification) or a sorted tuple of (start, end, label id) spans
+# (sequence labeling)
+Example = collections.namedtuple('Example', ['document_id', 'text',
+                                             'labels'])
+
+
+def import_crfsuite():
+    """Import sklearn_crfsuite (required by sequence labeling models).
+
+    Returns
+    -------
+    module
+        sklearn_crfsuite.
+
+    Raises
+    ------
+    ImportError
+        If sklearn-crfsuite is not installed.
+    """
+    try:
+        import sklearn_crfsuite
+    except ImportError as ex:
+        raise ImportError('Sequence labeling models require '
+                          'sklearn-crfsuite. Install it with '
+                          '`pip install sklearn-crfsuite`.') from ex
+    return sklearn_crfsuite
+
+
+def uncertainty_scores(proba: np.ndarray, method: str = 'entropy') -> \
+        np.ndarray:
+    """Get the uncertainty of probability distributions.
+
+    Parameters
+    ----------
+    proba : np.ndarray
+        Probabilities of at least two outcomes (along the last axis).
+    method : str
+        `entropy` (normalized by the entropy of the uniform distribution)
+        or `margin` (one minus the difference of the two largest
+        probabilities).
+
+    Returns
+    -------
+    np.ndarray
+        Uncertainty in [0, 1] of each distribution (the shape of `proba`
+        without the last axis).
+    """
+    proba = np.asarray(proba, dtype=np.float64)
+    if method not in UNCERTAINTY_METHODS:
+        raise ValueError(f'Unknown uncertainty method {method!r}, expected '
+                         f'one of {UNCERTAINTY_METHODS}.')
+    if proba.shape[-1] < 2:
+        # a single outcome is certain
+        return np.zeros(proba.shape[:-1])
+    if method == 'entropy':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = np.where(proba > 0, proba * np.log(proba), 0)
+        return -terms.sum(axis=-1) / np.log(proba.shape[-1])
+    top = np.partition(proba, -2, axis=-1)
+    return 1 - (top[..., -1] - top[..., -2])
+
+
+def _aggregate(scores, method, axis=-1):
+    """Combine uncertainties of labels (tokens): the mean entropy or the
+    smallest margin."""
+    if scores.shape[axis] == 0:
+        return np.zeros(np.delete(scores.shape, axis))
+    if method == 'entropy':
+        return scores.mean(axis=axis)
+    return scores.max(axis=axis)
+
+
+def _map_chunks(func, items, n_jobs, chunk_size=DEFAULT_CHUNK_SIZE,
+                **kwargs):
+    """Apply func to chunks of items in a process pool."""
+    chunks = [items[i:i + chunk_size]
+              for i in range(0, len(items), chunk_size)]
+    if n_jobs == 1 or len(chunks) <= 1:
+        return [func(chunk, **kwargs) for chunk in chunks]
+    return joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(func)(chunk, **kwargs) for chunk in chunks
+    )
+
+
+class AutoModel(object):
+    """Base class of auto-models.
+
+    Parameters
+    ----------
+    label_ids : typing.Sequence[int]
+        Ids of the labels of the task.
+    """
+    # task type of the model
+    task_type: typing.Optional[str] = None
+
+    def __init__(self, label_ids: typing.Sequence[int]):
+        self.label_ids = list(label_ids)
+        # training data snapshot (set when the model is trained)
+        self.snapshot: typing.Optional[str] = None
+
+    def fit(self, examples: typing.Sequence[Example],
+            n_jobs: typing.Optional[int] = 1) -> 'AutoModel':
+        """Train the model.
+
+        Parameters
+        ----------
+        examples : typing.Sequence[Example]
+            Training examples.
+        n_jobs : typing.Optional[int]
+            Number of feature extraction processes (all CPUs if None).
+
+        Returns
+        -------
+        AutoModel
+            The model.
+        """
+        raise NotImplementedError
+
+    def predict(self, texts: typing.Sequence[str],
+                n_jobs: typing.Optional[int] = 1) -> \
+            typing.List[typing.List[dict]]:
+        """Predict the labels of texts.
+
+        Parameters
+        ----------
+        texts : typing.Sequence[str]
+            Texts.
+        n_jobs : typing.Optional[int]
+            Number of feature extraction processes (all CPUs if None).
+
+        Returns
+        -------
+        typing.List[typing.List[dict]]
+            Predictions of each text with `label_id`, `start`, `length`
+            (None for text classification) and `score` (probability).
+        """
+        raise NotImplementedError
+
+    def uncertainty(self, texts: typing.Sequence[str],
+                    method: str = 'entropy',
+                    n_jobs: typing.Optional[int] = 1) -> np.ndarray:
+        """Get the uncertainty of the model about texts.
+
+        Parameters
+        ----------
+        texts : typing.Sequence[str]
+            Texts.
+        method : str
+            `entropy` or `margin` (see `uncertainty_scores`).
+        n_jobs : typing.Optional[int]
+            Number of feature extraction processes (all CPUs if None).
+
+        Returns
+        -------
+        np.ndarray
+            Uncertainty in [0, 1] of each text.
+        """
+        raise NotImplementedError
+
+
+# stateless, so that chunks can be vectorized in separate processes
+_VECTORIZER = HashingVectorizer(n_features=2 ** 20, ngram_range=(1, 2),
+                                alternate_sign=False, norm=None)
+
+
+def _hash_features(texts):
+    return _VECTORIZER.transform(texts)
+
+
+@automodel_types.register('automodel', 'text-classification')
+class TextClassifier(AutoModel):
+    """Logistic regression over tf-idf of word unigrams and bigrams.
+
+    Parameters
+    ----------
+    label_ids : typing.Sequence[int]
+        Ids of the labels of the task.
+    threshold : float
+        Minimum probability of predicted labels.
+    """
+    task_type = 'text-classification'
+
+    def __init__(self, label_ids: typing.Sequence[int],
+                 threshold: float = 0.5):
+        super(TextClassifier, self).__init__(label_ids)
+        self.threshold = threshold
+        self._tfidf = None
+        self._classifier = None
+
+    @staticmethod
+    def _features(texts, n_jobs):
+        return sparse.vstack(_map_chunks(_hash_features, list(texts),
+                                         n_jobs), format='csr')
+
+    def fit(self, examples, n_jobs=1):
+        features = self._features([e.text for e in examples], n_jobs)
+        targets = MultiLabelBinarizer(classes=self.label_ids) \
+            .fit_transform([e.labels for e in examples])
+        self._tfidf = TfidfTransformer().fit(features)
+        self._classifier = OneVsRestClassifier(
+            LogisticRegression(max_iter=1000)
+        ).fit(self._tfidf.transform(features), targets)
+        return self
+
+    def predict_proba(self, texts: typing.Sequence[str],
+                      n_jobs: typing.Optional[int] = 1) -> np.ndarray:
+        """Get the probabilities of the labels of texts.
+
+        Parameters
+        ----------
+        texts : typing.Sequence[str]
+            Texts.
+        n_jobs : typing.Optional[int]
+            Number of feature extraction processes (all CPUs if None).
+
+        Returns
+        -------
+        np.ndarray
+            Text x label (in the order of `label_ids`) probabilities.
+        """
+        if len(texts) == 0:
+            return np.zeros((0, len(self.label_ids)))
+        features = self._tfidf.transform(self._features(texts, n_jobs))
+        return self._classifier.predict_proba(features)
+
+    def predict(self, texts, n_jobs=1):
+        return [
+            [
+                {'label_id': label_id, 'start': None, 'length': None,
+                 'score': float(score)}
+                for label_id, score in zip(self.label_ids, scores)
+                if score >= self.threshold
+            ]
+            for scores in self.predict_proba(texts, n_jobs)
+        ]
+
+    def uncertainty(self, texts, method='entropy', n_jobs=1):
+        # labels are independent: uncertainty of the binary decisions
+        proba = self.predict_proba(texts, n_jobs)
+        scores = uncertainty_scores(np.stack([proba, 1 - proba], axis=-1),
+                                    method)
+        return _aggregate(scores, method)
+
+
+def _word_features(words, i):
+    word = words[i]
+    features = {
+        'bias': 1.0,
+        'word.lower': word.lower(),
+        'word.prefix3': word[:3],
+        'word.suffix3': word[-3:],
+        'word.isupper': word.isupper(),
+        'word.istitle': word.istitle(),
+        'word.isdigit': word.isdigit(),
+    }
+    for offset in (-1, 1):
+        if 0 <= i + offset < len(words):
+            other = words[i + offset]
+            features.update({
+                f'{offset}:word.lower': other.lower(),
+                f'{offset}:word.istitle': other.istitle(),
+                f'{offset}:word.isupper': other.isupper(),
+            })
+        else:
+            features['BOS' if offset < 0 else 'EOS'] = True
+    return features
+
+
+def _token_features(texts, tokenizer=None):
+    tokenizer = get_tokenizer(tokenizer)
+    features = []
+    for text in texts:
+        offsets = tokenizer.offsets(text)
+        words = offsets.tokens(text)
+        features.append((offsets, [_word_features(words, i)
+                                   for i in range(len(words))]))
+    return features
+
+
+def _spans_to_tags(offsets, spans):
+    tags = ['O'] * len(offsets)
+    if not spans:
+        return tags
+    starts, ends, label_ids = zip(*spans)
+    # first and last token overlapped by each span
+    first = np.searchsorted(offsets.ends, starts, side='right')
+    last = np.searchsorted(offsets.starts, ends, side='left') - 1
+    for i, j, label_id in zip(first.tolist(), last.tolist(), label_ids):
+        if i > j:
+            continue
+        tags[i] = f'B-{label_id}'
+        for k in range(i + 1, j + 1):
+            tags[k] = f'I-{label_id}'
+    return tags
+
+
+def _tags_to_spans(offsets, tags, marginals):
+    spans = []
+    current = None
+    for i, tag in enumerate(tags + ['O']):
+        label = None if tag == 'O' else int(tag[2:])
+        continues = current is not None and tag.startswith('I-') and \
+            label == current[2]
+        if current is not None and not continues:
+            i0, i1, label_id = current
+            start = int(offsets.starts[i0])
+            spans.append({
+                'label_id': label_id,
+                'start': start,
+                'length': int(offsets.ends[i1]) - start,
+                'score': float(np.mean([marginals[k][tags[k]]
+                                        for k in range(i0, i1 + 1)])),
+            })
+            current = None
+        if continues:
+            current = (current[0], i, current[2])
+        elif label is not None:
+            current = (i, i, label)
+    return spans
+
+
+@automodel_types.register('automodel', 'sequence-labeling')
+class SequenceTagger(AutoModel):
+    """Linear-chain CRF over token features with BIO tags.
+
+    Parameters
+    ----------
+    label_ids : typing.Sequence[int]
+        Ids of the labels of the task.
+    tokenizer : typing.Optional[str]
+        Name of tokenizer (see `textflow.utils.text.tokenizers`).
+    """
+    task_type = 'sequence-labeling'
+
+    def __init__(self, label_ids: typing.Sequence[int],
+                 tokenizer: typing.Optional[str] = None):
+        super(SequenceTagger, self).__init__(label_ids)
+        self.tokenizer = get_tokenizer(tokenizer).name
+        self._crf = None
+
+    def _features(self, texts, n_jobs):
+        chunks = _map_chunks(_token_features, list(texts), n_jobs,
+                             tokenizer=self.tokenizer)
+        return [features for chunk in chunks for features in chunk]
+
+    def fit(self, examples, n_jobs=1):
+        sklearn_crfsuite = import_crfsuite()
+        features = self._features([e.text for e in examples], n_jobs)
+        self._crf = sklearn_crfsuite.CRF(
+            algorithm='lbfgs', c1=0.1, c2=0.1, max_iterations=100,
+            all_possible_transitions=True,
+        )
+        self._crf.fit(
+            [token_features for _, token_features in features],
+            [_spans_to_tags(offsets, example.labels)
+             for (offsets, _), example in zip(features, examples)],
+        )
+        return self
+
+    def predict(self, texts, n_jobs=1):
+        features = self._features(texts, n_jobs)
+        x = [token_features for _, token_features in features]
+        if not x:
+            return []
+        tags = self._crf.predict(x)
+        marginals = self._crf.predict_marginals(x)
+        return [
+            _tags_to_spans(offsets, list(t), m)
+            for (offsets, _), t, m in zip(features, tags, marginals)
+        ]
+
+    def uncertainty(self, texts, method='entropy', n_jobs=1):
+        # uncertainty of the tags of the tokens
+        features = self._features(texts, n_jobs)
+        x = [token_features for _, token_features in features]
+        if not x:
+            return np.zeros(0)
+        tags = self._crf.classes_
+        return np.array([
+            _aggregate(uncertainty_scores(
+                [[m[tag] for tag in tags] for m in marginals]
+                if marginals else np.zeros((0, len(tags))),
+                method,
+            ), method)
+            for marginals in self._crf.predict_marginals(x)
+        ], dtype=np.float64)
+
+
+def get_model_type(task_type: str) -> \
+        typing.Optional[typing.Type[AutoModel]]:
+    """Get the auto-model of a task type.
+
+    Parameters
+    ----------
+    task_type : str
+        Type of task.
+
+    Returns
+    -------
+    typing.Optional[typing.Type[AutoModel]]
+        Model class (None if the task type has no auto-model).
+    """
+    if task_type not in automodel_types.list_names('automodel'):
+        return None
+    return automodel_types.get_plugin('automodel', task_type)
+
+
+def _select_examples(project_id, task_id):
+    annotation_set = AnnotationSet.__table__
+    annotation = Annotation.__table__
+    annotation_label = AnnotationLabel.__table__
+    annotation_span = AnnotationSpan.__table__
+    document = Document.__table__
+    label = Label.__table__
+    return sa.select(
+        annotation_set.c.id,
+        annotation_set.c.document_id,
+        document.c.text,
+        annotation_span.c.start,
+        annotation_span.c.length,
+        label.c.id.label('label_id'),
+    ) \
+        .select_from(
+            annotation_set
+            .join(document, document.c.id == annotation_set.c.document_id)
+            .outerjoin(annotation,
+                       annotation.c.annotation_set_id == annotation_set.c.id)
+            .outerjoin(annotation_label,
+                       annotation_label.c.annotation_id == annotation.c.id)
+            .outerjoin(label, sa.and_(
+                label.c.id == annotation_label.c.label_id,
+                label.c.task_id == task_id,
+            ))
+            .outerjoin(annotation_span,
+                       annotation_span.c.annotation_id == annotation.c.id)
+        ) \
+        .where(
+            document.c.project_id == project_id,
+            annotation_set.c.completed.is_(True),
+        ) \
+        .order_by(annotation_set.c.id)
+
+
+def load_examples(session: Session, *, project_id: int, task_id: int,
+                  task_type: str) -> typing.List[Example]:
+    """Load the training examples of a task (one per completed annotation
+    set of the project).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    task_id : int
+        Task id.
+    task_type : str
+        Type of task (spans are used for `sequence-labeling` tasks).
+
+    Returns
+    -------
+    typing.List[Example]
+        Examples (ordered by annotation set id).
+    """
+    sequence = task_type == SequenceTagger.task_type
+    examples = {}
+    for row in session.execute(_select_examples(project_id, task_id)):
+        document_id, text, labels = examples.setdefault(
+            row.id, (row.document_id, row.text, set()),
+        )
+        if row.label_id is None:
+            continue
+        if sequence:
+            if row.start is not None:
+                labels.add((row.start, row.start + row.length,
+                            row.label_id))
+        else:
+            labels.add(row.label_id)
+    return [
+        Example(document_id, text,
+                tuple(sorted(labels)) if sequence else frozenset(labels))
+        for document_id, text, labels in examples.values()
+    ]
+
+
+def snapshot_hash(task_type: str, label_ids: typing.Iterable[int],
+                  examples: typing.Iterable[Example]) -> str:
+    """Get the hash of the training data of a model.
+
+    Parameters
+    ----------
+    task_type : str
+        Type of task.
+    label_ids : typing.Iterable[int]
+        Ids of the labels of the task.
+    examples : typing.Iterable[Example]
+        Training examples.
+
+    Returns
+    -------
+    str
+        Hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([MODEL_VERSION, task_type,
+                              sorted(label_ids)]).encode('utf-8'))
+    for example in examples:
+        digest.update(json.dumps([example.document_id,
+                                  sorted(example.labels)]).encode('utf-8'))
+        digest.update(text_hash(example.text))
+    return digest.hexdigest()
+
+
+class AutoModelManager(object):
+    """Train, cache and load the auto-models of tasks.
+
+    Parameters
+    ----------
+    directory : typing.Optional[str]
+        Model directory (`automodels` in the working directory if None).
+    n_jobs : typing.Optional[int]
+        Number of feature extraction processes (all CPUs if None).
+    """
+
+    def __init__(self, directory: typing.Optional[str] = None,
+                 n_jobs: typing.Optional[int] = None):
+        self.directory = directory
+        self.n_jobs = n_jobs
+        self._lock = threading.Lock()
+        # model path -> model
+        self._models: typing.Dict[str, AutoModel] = {}
+
+    def configure(self, directory: typing.Optional[str] = None,
+                  n_jobs: typing.Optional[int] = None) -> None:
+        """Set the model directory and the number of processes.
+
+        Parameters
+        ----------
+        directory : typing.Optional[str]
+            Model directory (`automodels` in the working directory if None).
+        n_jobs : typing.Optional[int]
+            Number of feature extraction processes (all CPUs if None).
+        """
+        with self._lock:
+            self.directory = directory
+            self.n_jobs = n_jobs
+            self._models.clear()
+
+    def _task_directory(self, project_id, task_id):
+        directory = self.directory
+        if directory is None:
+            directory = os.path.join(os.getcwd(), 'automodels')
+        return os.path.join(directory, f'project-{project_id}',
+                            f'task-{task_id}')
+
+    def get_path(self, project_id: int, task_id: int, snapshot: str) -> str:
+        """Get the path of the model of a training data snapshot.
+
+        Parameters
+        ----------
+        project_id : int
+            Project id.
+        task_id : int
+            Task id.
+        snapshot : str
+            Hash of the training data (see `snapshot_hash`).
+
+        Returns
+        -------
+        str
+            Path of model file.
+        """
+        return os.path.join(self._task_directory(project_id, task_id),
+                            f'{snapshot}.joblib')
+
+    def _remember(self, path, model):
+        # keep the latest model of each task in memory
+        directory = os.path.dirname(path)
+        with self._lock:
+            for other in [p for p in self._models
+                          if os.path.dirname(p) == directory]:
+                del self._models[other]
+            self._models[path] = model
+
+    def _load(self, path):
+        with self._lock:
+            model = self._models.get(path)
+        if model is None and os.path.exists(path):
+            model = joblib.load(path)
+            self._remember(path, model)
+        return model
+
+    def _save(self, path, model):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # write to a temporary file so that readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                joblib.dump(model, fp)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def train(self, session: Session, *, project_id: int,
+              task_id: int) -> AutoModel:
+        """Get the model of the current annotations of a task (trained if
+        it is not cached).
+
+        Parameters
+        ----------
+        session : Session
+            Database session.
+        project_id : int
+            Project id.
+        task_id : int
+            Task id.
+
+        Returns
+        -------
+        AutoModel
+            Trained model.
+
+        Raises
+        ------
+        ValueError
+            If the task does not exist, has no auto-model or has no
+            completed annotation sets.
+        """
+        task = session.get(Task, task_id)
+        if task is None or task.project_id != project_id:
+            raise ValueError(f'Task {task_id} not found in project '
+                             f'{project_id}.')
+        Model = get_model_type(task.type)
+        if Model is None:
+            raise ValueError(f'Tasks of type {task.type!r} have no '
+                             'auto-model.')
+        label_ids = session.execute(
+            sa.select(Label.id).where(Label.task_id == task_id)
+            .order_by(Label.id)
+        ).scalars().all()
+        examples = load_examples(session, project_id=project_id,
+                                 task_id=task_id, task_type=task.type)
+        # release the connection while training
+        session.commit()
+        if not examples:
+            raise ValueError(f'Task {task_id} has no completed annotation '
+                             'sets.')
+        snapshot = snapshot_hash(task.type, label_ids, examples)
+        path = self.get_path(project_id, task_id, snapshot)
+        model = self._load(path)
+        if model is None:
+            logger.info(f'Training auto-model of task {task_id} on '
+                        f'{len(examples)} annotation sets.')
+            model = Model(label_ids).fit(examples, n_jobs=self.n_jobs)
+            model.snapshot = snapshot
+            self._save(path, model)
+            self._remember(path, model)
+        else:
+            # the latest model is the most recently written file
+            os.utime(path)
+        return model
+
+    def _latest_path(self, project_id, task_id):
+        # models may be trained by other processes (job workers)
+        directory = self._task_directory(project_id, task_id)
+        if not os.path.isdir(directory):
+            return None
+        paths = [os.path.join(directory, name)
+                 for name in os.listdir(directory)
+                 if name.endswith('.joblib')]
+        if not paths:
+            return None
+        return max(paths, key=os.path.getmtime)
+
+    def get_model(self, project_id: int, task_id: int) -> \
+            typing.Optional[AutoModel]:
+        """Get the latest trained model of a task.
+
+        Parameters
+        ----------
+        project_id : int
+            Project id.
+        task_id : int
+            Task id.
+
+        Returns
+        -------
+        typing.Optional[AutoModel]
+            Model (None if the task was never trained).
+        """
+        path = self._latest_path(project_id, task_id)
+        if path is None:
+            return None
+        return self._load(path)
+
+    def get_status(self, project_id: int, task_id: int) -> dict:
+        """Get the model status of a task.
+
+        Parameters
+        ----------
+        project_id : int
+            Project id.
+        task_id : int
+            Task id.
+
+        Returns
+        -------
+        dict
+            `status` (`ready` or None if the task was never trained) and
+            `snapshot` of the latest model.
+        """
+        path = self._latest_path(project_id, task_id)
+        if path is None:
+            return {'status': None, 'snapshot': None}
+        snapshot = os.path.splitext(os.path.basename(path))[0]
+        return {'status': 'ready', 'snapshot': snapshot}
+
+
+automodels: AutoModelManager = AutoModelManager()
+
+
+@job_type('train_automodel')
+def train_automodel(session: Session, *, project_id: int,
+                    task_id: int) -> dict:
+    """Train the auto-model of a task (background job).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    task_id : int
+        Task id.
+
+    Returns
+    -------
+    dict
+        `snapshot` of the model.
+    """
+    model = automodels.train(session, project_id=project_id, task_id=task_id)
+    return {'snapshot': model.snapshot}
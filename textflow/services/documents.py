@@ -0,0 +1,179 @@
+"""Bulk operations on the documents of a project.
+
+The operations run as background jobs (see `textflow.services.jobs`):
+`import_documents` adds the records of an uploaded file, `tokenize_documents`
+stores the token offsets of documents and `delete_documents` removes the
+documents of a project. Imported documents are pre-annotated by the tasks of
+the project that have a trained auto-model.
+
+Example
+-------
+>>> from textflow.services.jobs import jobs
+>>> job = jobs.submit(session, 'import_documents', project_id=1, params={
+...     'project_id': 1, 'path': 'documents.jsonl', 'format': 'jsonl',
+... })
+"""
+import logging
+import os
+import typing
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from textflow.database import op
+from textflow.models import Document
+from textflow.services.automodel import automodels
+from textflow.services.jobs import job_type, jobs
+from textflow.utils import readers
+
+__all__ = [
+    'delete_documents',
+    'import_documents',
+    'tokenize_documents',
+]
+
+logger = logging.getLogger(__name__)
+
+
+@job_type('import_documents')
+def import_documents(session: Session, *, project_id: int, path: str,
+                     format: str, batch_size: int = 10000,
+                     tokenize: bool = False, tokenizer: str = None,
+                     remove: bool = True) -> \
+        typing.Generator[int, None, dict]:
+    """Add the records of a JSONL or CSV file to a project (background job).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    path : str
+        Path of the file.
+    format : str
+        Format of the file (see `textflow.utils.readers.FORMATS`).
+    batch_size : int
+        Number of documents added (tokenized) at once.
+    tokenize : bool
+        Store the token offsets of the documents.
+    tokenizer : str
+        Name of the tokenizer.
+    remove : bool
+        Remove the file afterwards (uploads).
+
+    Yields
+    ------
+    int
+        Number of documents added.
+
+    Returns
+    -------
+    dict
+        `num_created` documents and `jobs` submitted to pre-annotate them.
+    """
+    num_docs_created = 0
+    try:
+        with open(path, encoding='utf-8', newline='') as fp:
+            progress = op.create_documents(
+                session, project_id=project_id,
+                documents=readers.read_records(fp, format),
+                batch_size=max(batch_size, 1),
+            )
+            for num_docs_created, _ in progress:
+                yield num_docs_created
+    finally:
+        if remove:
+            os.unlink(path)
+    if tokenize:
+        progress = op.create_document_tokens(
+            session, project_id=project_id, tokenizer=tokenizer,
+            batch_size=max(batch_size, 1), n_jobs=None,
+        )
+        for _ in progress:
+            pass
+    job_ids = []
+    for task in op.list_tasks_by(session, project_id=project_id):
+        if automodels.get_model(project_id, task.id) is None:
+            continue
+        job = jobs.submit(session, 'preannotate', project_id=project_id,
+                          params={'project_id': project_id,
+                                  'task_id': task.id},
+                          unique=True)
+        job_ids.append(job.id)
+    return {'num_created': num_docs_created, 'jobs': job_ids}
+
+
+@job_type('tokenize_documents')
+def tokenize_documents(session: Session, *, project_id: int,
+                       tokenizer: str = None, batch_size: int = 10000) -> \
+        typing.Generator[typing.Tuple[int, int], None, dict]:
+    """Store the token offsets of the documents of a project (background
+    job).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    tokenizer : str
+        Name of the tokenizer.
+    batch_size : int
+        Number of documents tokenized at once.
+
+    Yields
+    ------
+    typing.Tuple[int, int]
+        Number of documents read and number of documents of the project.
+
+    Returns
+    -------
+    dict
+        `num_tokenized` documents (documents with current offsets are
+        skipped).
+    """
+    num_docs_total = session.execute(
+        select(func.count(Document.id))
+        .where(Document.project_id == project_id)
+    ).scalar()
+    num_docs_tokenized = 0
+    progress = op.create_document_tokens(
+        session, project_id=project_id, tokenizer=tokenizer,
+        batch_size=max(batch_size, 1), n_jobs=None,
+    )
+    for num_docs_tokenized, num_docs_read in progress:
+        yield num_docs_read, num_docs_total
+    return {'num_tokenized': num_docs_tokenized}
+
+
+@job_type('delete_documents')
+def delete_documents(session: Session, *, project_id: int,
+                     batch_size: int = 10000) -> \
+        typing.Generator[typing.Tuple[int, int], None, dict]:
+    """Delete the documents of a project with their annotations (background
+    job).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    batch_size : int
+        Number of documents deleted at once.
+
+    Yields
+    ------
+    typing.Tuple[int, int]
+        Number of documents deleted and number of documents of the project.
+
+    Returns
+    -------
+    dict
+        `num_deleted` documents.
+    """
+    num_docs_deleted = yield from op.delete_documents(
+        session, project_id=project_id, batch_size=max(batch_size, 1),
+    )
+    return {'num_deleted': num_docs_deleted}
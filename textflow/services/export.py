@@ -0,0 +1,537 @@
+"""Project export.
+
+This module exports the documents of a project together with their
+annotation sets, annotations, spans and labels (the final dataset). Memory
+use does not depend on the size of the project: documents are read in
+keyset batches and the annotations of a batch are read with a single
+joined query whose rows are streamed from the database.
+
+Annotations can also be exported as a table (one row per label of an
+annotation) in Parquet or Arrow IPC format. Each batch of rows streamed from
+the database becomes a row group (record batch). This requires `pyarrow`.
+
+Exports are streamed to the client or written to a file by an
+`export_project` background job (see `textflow.services.jobs`).
+
+Example
+-------
+>>> from textflow.services import export
+>>> with open('project.ndjson', 'wb') as fp:
+...     for chunk in export.iter_ndjson(session, project_id=1):
+...         fp.write(chunk)
+
+Each NDJSON line is a JSON object of a document::
+
+    {"id": 1, "source_id": null, "text": "...", "meta": null,
+     "annotation_sets": [{"id": 1, "user_id": 2, "completed": true,
+                          "skipped": false, "flagged": false,
+                          "annotations": [{"id": 1,
+                                           "span": {"start": 0,
+                                                    "length": 4},
+                                           "labels": [{"id": 1,
+                                                       "task_id": 1,
+                                                       "value": "PER",
+                                                       "label": "Person"}]}]}]}
+
+>>> import pandas as pd
+>>> with open('annotations.parquet', 'wb') as fp:
+...     for chunk in export.iter_parquet(session, project_id=1):
+...         fp.write(chunk)
+>>> pd.read_parquet('annotations.parquet').columns.tolist()
+['document_id', 'annotation_set_id', 'user_id', 'completed',
+ 'annotation_id', 'task_id', 'label_id', 'value', 'start', 'length']
+"""
+import io
+import json
+import os
+import typing
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from textflow.database import op
+from textflow.models import Annotation, AnnotationSet, AnnotationSpan, \
+    Document, Label
+from textflow.models.annotation import AnnotationLabel
+from textflow.services.jobs import job_type
+from textflow.utils.text import token_cache
+
+__all__ = [
+    'DEFAULT_BATCH_SIZE',
+    'DEFAULT_ROW_GROUP_SIZE',
+    'FORMATS',
+    'export_project',
+    'import_pyarrow',
+    'iter_annotation_batches',
+    'iter_arrow',
+    'iter_document_batches',
+    'iter_documents',
+    'iter_ndjson',
+    'iter_parquet',
+]
+
+# number of documents per batch
+DEFAULT_BATCH_SIZE = 1000
+# number of annotation rows per row group (record batch)
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+
+
+def _select_documents(project_id, after, batch_size):
+    table = Document.__table__
+    return sa.select(
+        table.c.id, table.c.source_id, table.c.text, table.c.meta,
+    ) \
+        .where(table.c.project_id == project_id, table.c.id > after) \
+        .order_by(table.c.id) \
+        .limit(batch_size)
+
+
+def _select_annotations(document_ids, completed_only):
+    annotation_set = AnnotationSet.__table__
+    annotation = Annotation.__table__
+    span = AnnotationSpan.__table__
+    annotation_label = AnnotationLabel.__table__
+    label = Label.__table__
+    stmt = sa.select(
+        annotation_set.c.document_id,
+        annotation_set.c.id.label('annotation_set_id'),
+        annotation_set.c.user_id,
+        annotation_set.c.completed,
+        annotation_set.c.skipped,
+        annotation_set.c.flagged,
+        annotation.c.id.label('annotation_id'),
+        span.c.start,
+        span.c.length,
+        label.c.id.label('label_id'),
+        label.c.task_id,
+        label.c.value,
+        label.c.label,
+    ) \
+        .select_from(
+            annotation_set
+            .outerjoin(annotation,
+                       annotation.c.annotation_set_id == annotation_set.c.id)
+            .outerjoin(span, span.c.annotation_id == annotation.c.id)
+            .outerjoin(annotation_label,
+                       annotation_label.c.annotation_id == annotation.c.id)
+            .outerjoin(label, label.c.id == annotation_label.c.label_id)
+        ) \
+        .where(annotation_set.c.document_id.in_(document_ids)) \
+        .order_by(annotation_set.c.document_id, annotation_set.c.id,
+                  annotation.c.id, label.c.id)
+    if completed_only:
+        stmt = stmt.where(annotation_set.c.completed.is_(True))
+    return stmt
+
+
+def _attach_annotations(documents, rows):
+    """Build the annotation trees of documents from the (ordered) rows of
+    the joined annotation query."""
+    annotation_set = annotation = None
+    for row in rows:
+        if annotation_set is None or \
+                annotation_set['id'] != row.annotation_set_id:
+            annotation_set = {
+                'id': row.annotation_set_id,
+                'user_id': row.user_id,
+                'completed': row.completed,
+                'skipped': row.skipped,
+                'flagged': row.flagged,
+                'annotations': [],
+            }
+            annotation = None
+            documents[row.document_id]['annotation_sets'] \
+                .append(annotation_set)
+        if row.annotation_id is None:
+            continue
+        if annotation is None or annotation['id'] != row.annotation_id:
+            span = None
+            if row.start is not None:
+                span = {'start': row.start, 'length': row.length}
+            annotation = {'id': row.annotation_id, 'span': span,
+                          'labels': []}
+            annotation_set['annotations'].append(annotation)
+        if row.label_id is not None:
+            annotation['labels'].append({
+                'id': row.label_id,
+                'task_id': row.task_id,
+                'value': row.value,
+                'label': row.label,
+            })
+
+
+def iter_document_batches(
+    session: Session, *, project_id: int,
+    batch_size: int = DEFAULT_BATCH_SIZE, completed_only: bool = False,
+    tokens: bool = False,
+) -> typing.Generator[typing.List[dict], None, None]:
+    """Iterate batches of documents of a project with their annotations.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    batch_size : int
+        Number of documents per batch.
+    completed_only : bool
+        Whether to export completed annotation sets only.
+    tokens : bool
+        Whether to export the token offsets of the documents (as
+        `[start, end]` pairs, stored offsets are used if up to date, see
+        `textflow.utils.text.token_cache`).
+
+    Returns
+    -------
+    typing.Generator[typing.List[dict], None, None]
+        Batches of documents (ordered by id).
+    """
+    after = 0
+    while True:
+        rows = session.execute(
+            _select_documents(project_id, after, batch_size)
+        ).all()
+        if not rows:
+            return
+        documents = {
+            row.id: {
+                'id': row.id,
+                'source_id': row.source_id,
+                'text': row.text,
+                'meta': row.meta,
+                'annotation_sets': [],
+            }
+            for row in rows
+        }
+        if tokens:
+            offsets = token_cache.get_many(
+                [(row.id, row.text) for row in rows],
+                load=lambda ids: op.list_document_tokens(
+                    session, document_ids=ids,
+                    tokenizer=token_cache.tokenizer.name,
+                ),
+            )
+            for row, value in zip(rows, offsets):
+                documents[row.id]['tokens'] = value.tolist()
+        result = session.execute(
+            _select_annotations(list(documents), completed_only),
+            execution_options={'stream_results': True,
+                               'yield_per': batch_size},
+        )
+        try:
+            _attach_annotations(documents, result)
+        finally:
+            result.close()
+        yield list(documents.values())
+        after = rows[-1].id
+
+
+def iter_documents(session: Session, *, project_id: int,
+                   **kwargs) -> typing.Generator[dict, None, None]:
+    """Iterate documents of a project with their annotations.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    kwargs
+        Keyword arguments of `iter_document_batches`.
+
+    Returns
+    -------
+    typing.Generator[dict, None, None]
+        Documents (ordered by id).
+    """
+    for batch in iter_document_batches(session, project_id=project_id,
+                                       **kwargs):
+        yield from batch
+
+
+def iter_ndjson(session: Session, *, project_id: int,
+                **kwargs) -> typing.Generator[bytes, None, None]:
+    """Iterate the newline delimited JSON export of a project.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    kwargs
+        Keyword arguments of `iter_document_batches`.
+
+    Returns
+    -------
+    typing.Generator[bytes, None, None]
+        Chunks of NDJSON (one chunk per batch of documents).
+    """
+    for batch in iter_document_batches(session, project_id=project_id,
+                                       **kwargs):
+        yield ''.join(
+            json.dumps(document, ensure_ascii=False) + '\n'
+            for document in batch
+        ).encode('utf-8')
+
+
+def import_pyarrow():
+    """Import pyarrow (required by the columnar exports).
+
+    Returns
+    -------
+    module
+        pyarrow.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+    """
+    try:
+        import pyarrow
+    except ImportError as ex:
+        raise ImportError('Columnar exports require pyarrow. Install it with '
+                          '`pip install pyarrow`.') from ex
+    return pyarrow
+
+
+def _annotation_schema(pa):
+    return pa.schema([
+        ('document_id', pa.int64()),
+        ('annotation_set_id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('completed', pa.bool_()),
+        ('annotation_id', pa.int64()),
+        ('task_id', pa.int64()),
+        ('label_id', pa.int64()),
+        ('value', pa.string()),
+        ('start', pa.int32()),
+        ('length', pa.int32()),
+    ])
+
+
+def _select_annotation_rows(project_id, completed_only):
+    document = Document.__table__
+    annotation_set = AnnotationSet.__table__
+    annotation = Annotation.__table__
+    span = AnnotationSpan.__table__
+    annotation_label = AnnotationLabel.__table__
+    label = Label.__table__
+    stmt = sa.select(
+        annotation_set.c.document_id,
+        annotation_set.c.id.label('annotation_set_id'),
+        annotation_set.c.user_id,
+        annotation_set.c.completed,
+        annotation.c.id.label('annotation_id'),
+        label.c.task_id,
+        label.c.id.label('label_id'),
+        label.c.value,
+        span.c.start,
+        span.c.length,
+    ) \
+        .select_from(
+            annotation_set
+            .join(document, document.c.id == annotation_set.c.document_id)
+            .join(annotation,
+                  annotation.c.annotation_set_id == annotation_set.c.id)
+            .outerjoin(span, span.c.annotation_id == annotation.c.id)
+            .outerjoin(annotation_label,
+                       annotation_label.c.annotation_id == annotation.c.id)
+            .outerjoin(label, label.c.id == annotation_label.c.label_id)
+        ) \
+        .where(document.c.project_id == project_id) \
+        .order_by(annotation_set.c.document_id, annotation.c.id,
+                  label.c.id)
+    if completed_only:
+        stmt = stmt.where(annotation_set.c.completed.is_(True))
+    return stmt
+
+
+def iter_annotation_batches(
+    session: Session, *, project_id: int,
+    batch_size: int = DEFAULT_ROW_GROUP_SIZE, completed_only: bool = False,
+) -> typing.Generator['pyarrow.RecordBatch', None, None]:
+    """Iterate the annotations of a project as Arrow record batches.
+
+    Notes
+    -----
+    There is one row per label of an annotation (annotations without labels
+    have a single row with null label columns). Spans are null for
+    annotations without span.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    batch_size : int
+        Number of rows per record batch.
+    completed_only : bool
+        Whether to export annotations of completed annotation sets only.
+
+    Returns
+    -------
+    typing.Generator[pyarrow.RecordBatch, None, None]
+        Record batches (ordered by document id and annotation id).
+    """
+    pa = import_pyarrow()
+    schema = _annotation_schema(pa)
+    result = session.execute(
+        _select_annotation_rows(project_id, completed_only),
+        execution_options={'stream_results': True, 'yield_per': batch_size},
+    )
+    try:
+        for rows in result.partitions():
+            columns = zip(*rows)
+            yield pa.RecordBatch.from_arrays([
+                pa.array(column, type=field.type)
+                for column, field in zip(columns, schema)
+            ], schema=schema)
+    finally:
+        result.close()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Writable file that collects the written bytes until they are taken
+    (pyarrow writers only append)."""
+
+    def __init__(self):
+        super(_ChunkSink, self).__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._position += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._position
+
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet(session: Session, *, project_id: int,
+                 **kwargs) -> typing.Generator[bytes, None, None]:
+    """Iterate the Parquet export of the annotations of a project.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    kwargs
+        Keyword arguments of `iter_annotation_batches`.
+
+    Returns
+    -------
+    typing.Generator[bytes, None, None]
+        Chunks of the Parquet file (one chunk per row group).
+    """
+    pa = import_pyarrow()
+    import pyarrow.parquet as pq
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, _annotation_schema(pa)) as writer:
+        for batch in iter_annotation_batches(session, project_id=project_id,
+                                             **kwargs):
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+def iter_arrow(session: Session, *, project_id: int,
+               **kwargs) -> typing.Generator[bytes, None, None]:
+    """Iterate the Arrow IPC stream export of the annotations of a project.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    kwargs
+        Keyword arguments of `iter_annotation_batches`.
+
+    Returns
+    -------
+    typing.Generator[bytes, None, None]
+        Chunks of the Arrow stream (one chunk per record batch).
+    """
+    pa = import_pyarrow()
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, _annotation_schema(pa)) as writer:
+        for batch in iter_annotation_batches(session, project_id=project_id,
+                                             **kwargs):
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+# format -> (chunk iterator, media type, file extension)
+FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson', 'ndjson'),
+    'parquet': (iter_parquet, 'application/vnd.apache.parquet', 'parquet'),
+    'arrow': (iter_arrow, 'application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+
+@job_type('export_project')
+def export_project(session: Session, *, project_id: int, path: str,
+                   format: str = 'ndjson', **kwargs) -> \
+        typing.Generator[int, None, dict]:
+    """Write the export of a project to a file (background job).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    path : str
+        Path of the file.
+    format : str
+        `ndjson`, `parquet` or `arrow`.
+    kwargs
+        Keyword arguments of the chunk iterator of the format.
+
+    Yields
+    ------
+    int
+        Number of bytes written.
+
+    Returns
+    -------
+    dict
+        `path`, `filename` and `media_type` of the file and its `size`.
+    """
+    iter_chunks, media_type, extension = FORMATS[format]
+    size = 0
+    # written to a temporary file so that the file is complete when found
+    tmp_path = f'{path}.tmp'
+    try:
+        with open(tmp_path, 'wb') as fp:
+            for chunk in iter_chunks(session, project_id=project_id,
+                                     **kwargs):
+                fp.write(chunk)
+                size += len(chunk)
+                yield size
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return {
+        'path': path,
+        'filename': f'project-{project_id}.{extension}',
+        'media_type': media_type,
+        'size': size,
+    }
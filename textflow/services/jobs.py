@@ -0,0 +1,477 @@
+"""Background jobs.
+
+Long running operations (imports, exports, deletes, training) run as
+background jobs instead of inside HTTP requests. Jobs are rows of the
+`background_job` table (see `textflow.models.BackgroundJob`): the database is
+the queue, so no message broker is required, and the progress, result and
+cancellation of a job are visible to every process.
+
+Job types are functions registered with `job_type` by the service modules
+that own the work (importing `textflow.api` registers all of them). A job
+function gets a database session and the parameters of the job as keyword
+arguments. It can return its result (JSON serializable) or be a generator
+that yields its progress (the number of items processed or a
+(processed, total) tuple) and returns its result. Jobs stop at the next
+progress update after they are cancelled; work committed before is kept.
+Only generator jobs can be cancelled once they are running (see
+`is_cancellable`).
+
+Notes
+-----
+In `local` mode (config `JOBS_MODE`, the default) the application process
+claims and runs the jobs. In `worker` mode the application only queues jobs
+and separate processes run them (`textflow worker`). Either way jobs run in
+a thread pool or, with `JOBS_EXECUTOR = 'process'`, in a pool of spawned
+processes that are initialized from the configuration of the application.
+Every claim is a conditional update, so any number of workers can share a
+database.
+
+Example
+-------
+>>> from textflow.services.jobs import job_type, jobs
+>>> @job_type('count_documents')
+... def count_documents(session, *, project_id):
+...     for i in range(10):
+...         yield i + 1, 10
+...     return {'num_documents': 10}
+>>> job = jobs.submit(session, 'count_documents',
+...                   params={'project_id': 1}, project_id=1)
+>>> job.status
+<JobStatusEnum.queued: 'queued'>
+"""
+import concurrent.futures
+import inspect
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import typing
+import uuid
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from textflow import schemas
+from textflow.database import db, op
+from textflow.utils.plugin import PluginManager
+
+__all__ = [
+    'JobCancelled',
+    'JobRunner',
+    'get_job_type',
+    'is_cancellable',
+    'job_type',
+    'job_types',
+    'jobs',
+]
+
+logger = logging.getLogger(__name__)
+
+job_types = PluginManager()
+
+# statuses of jobs that are not finished
+ACTIVE = (schemas.JobStatusEnum.queued, schemas.JobStatusEnum.running)
+
+
+class JobCancelled(Exception):
+    """Raised in a job when it was cancelled."""
+
+
+def job_type(name: str) -> typing.Callable:
+    """Register a job function.
+
+    Parameters
+    ----------
+    name : str
+        Name of the job type.
+
+    Returns
+    -------
+    typing.Callable
+        Decorator.
+    """
+    return job_types.register('job', name)
+
+
+def get_job_type(name: str) -> typing.Optional[typing.Callable]:
+    """Get a registered job function by name.
+
+    Parameters
+    ----------
+    name : str
+        Name of the job type.
+
+    Returns
+    -------
+    typing.Optional[typing.Callable]
+        Job function (None if not registered).
+    """
+    if name not in job_types.list_names('job'):
+        return None
+    return job_types.get_plugin('job', name)
+
+
+def is_cancellable(name: str) -> bool:
+    """Whether running jobs of a type can be cancelled.
+
+    Notes
+    -----
+    Running jobs only check for cancellation at their progress updates, so
+    only jobs whose function is a generator can be cancelled after they
+    started.
+
+    Parameters
+    ----------
+    name : str
+        Name of the job type.
+
+    Returns
+    -------
+    bool
+        True if the job function is a generator function.
+    """
+    return inspect.isgeneratorfunction(get_job_type(name))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _init_process(config):
+    # spawned job processes set up the application like the parent
+    from textflow import TextFlow
+    TextFlow(config)
+    jobs.mode = 'worker'
+
+
+def _execute_in_process(job):
+    jobs.execute(job)
+
+
+class JobRunner(object):
+    """Queue, claim and run background jobs.
+
+    Parameters
+    ----------
+    mode : str
+        `local` (jobs run in this process) or `worker` (jobs are only queued
+        unless `work` is called).
+    max_workers : int
+        Number of jobs that run at the same time.
+    executor : str
+        `thread` or `process`.
+    directory : typing.Optional[str]
+        Directory of the files of jobs (`jobs` in the working directory if
+        None).
+    poll_interval : float
+        Time (in seconds) between checks for new jobs.
+    progress_interval : float
+        Minimum time (in seconds) between progress updates of a job.
+    """
+
+    def __init__(self, mode: str = 'local', max_workers: int = 1,
+                 executor: str = 'thread',
+                 directory: typing.Optional[str] = None,
+                 poll_interval: float = 1.0,
+                 progress_interval: float = 1.0):
+        self.mode = mode
+        self.max_workers = max_workers
+        self.executor = executor
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        # configuration of the application (for spawned processes)
+        self.config: typing.Optional[dict] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def configure(self, config: dict) -> None:
+        """Set the options of the runner from the configuration of the
+        application (`JOBS_MODE`, `JOBS_MAX_WORKERS`, `JOBS_EXECUTOR` and
+        `JOBS_DIR`).
+
+        Parameters
+        ----------
+        config : dict
+            Configuration.
+        """
+        self.config = dict(config)
+        self.mode = config.get('JOBS_MODE') or 'local'
+        self.max_workers = int(config.get('JOBS_MAX_WORKERS') or 1)
+        self.executor = config.get('JOBS_EXECUTOR') or 'thread'
+        self.directory = config.get('JOBS_DIR')
+
+    def new_path(self, suffix: str = '') -> str:
+        """Get a new path for a file of a job (e.g., an upload or export).
+
+        Parameters
+        ----------
+        suffix : str
+            File name suffix.
+
+        Returns
+        -------
+        str
+            Path (the directory is created).
+        """
+        directory = self.directory
+        if directory is None:
+            directory = os.path.join(os.getcwd(), 'jobs')
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f'{uuid.uuid4().hex}{suffix}')
+
+    def submit(self, session: Session, name: str, *,
+               params: typing.Optional[dict] = None,
+               user_id: typing.Optional[int] = None,
+               project_id: typing.Optional[int] = None,
+               unique: bool = False) -> schemas.BackgroundJob:
+        """Queue a job.
+
+        Parameters
+        ----------
+        session : Session
+            Database session.
+        name : str
+            Name of the job type.
+        params : typing.Optional[dict]
+            Keyword arguments of the job function (JSON serializable).
+        user_id : typing.Optional[int]
+            Id of the user that submits the job.
+        project_id : typing.Optional[int]
+            Id of the project of the job.
+        unique : bool
+            Return the queued or running job of the project with the same
+            type and parameters instead of queueing another one.
+
+        Returns
+        -------
+        schemas.BackgroundJob
+            Job.
+
+        Raises
+        ------
+        ValueError
+            If the job type is not registered.
+        """
+        if get_job_type(name) is None:
+            raise ValueError(f'Unknown job type {name!r}.')
+        params = params or {}
+        if unique:
+            active = op.list_background_jobs(session, project_id=project_id,
+                                             name=name, status=ACTIVE)
+            for job in active:
+                if job.params == params:
+                    return job
+        job = op.create_background_job(session, job=schemas.BackgroundJob(
+            name=name, params=params, user_id=user_id, project_id=project_id,
+        ))
+        if self.mode == 'local':
+            self.start()
+            self._wake.set()
+        return job
+
+    def _update(self, job_id, **values):
+        with db.session() as session:
+            return op.update_background_job(session, job_id=job_id,
+                                            values=values)
+
+    def execute(self, job: schemas.BackgroundJob) -> None:
+        """Run a claimed job and store its result.
+
+        Parameters
+        ----------
+        job : schemas.BackgroundJob
+            Job.
+        """
+        status = schemas.JobStatusEnum
+        job_id = job.id
+        progress, total, result = 0, None, None
+        try:
+            with db.session() as session:
+                fn = get_job_type(job.name)
+                if fn is None:
+                    raise ValueError(f'Unknown job type {job.name!r}.')
+                output = fn(session, **(job.params or {}))
+                if not inspect.isgenerator(output):
+                    result = output
+                else:
+                    last_update = time.monotonic()
+                    while True:
+                        try:
+                            step = next(output)
+                        except StopIteration as stop:
+                            result = stop.value
+                            break
+                        if isinstance(step, tuple):
+                            progress, total = step
+                        else:
+                            progress = step
+                        now = time.monotonic()
+                        if now - last_update < self.progress_interval:
+                            continue
+                        last_update = now
+                        values = {'progress': progress}
+                        if total is not None:
+                            values['total'] = total
+                        if self._update(job_id, **values).cancel_requested:
+                            output.close()
+                            raise JobCancelled()
+        except JobCancelled:
+            logger.info(f'Job {job_id} cancelled.')
+            values = {'status': status.cancelled}
+        except Exception as ex:
+            logger.exception(f'Job {job_id} failed.')
+            values = {'status': status.failed, 'error': str(ex)}
+        else:
+            values = {'status': status.done, 'result': result}
+        values['progress'] = progress
+        if total is not None:
+            values['total'] = total
+        self._update(job_id, finished_on=func.now(), **values)
+
+    def run(self, job_id: str) -> bool:
+        """Claim and run a queued job in this thread.
+
+        Parameters
+        ----------
+        job_id : str
+            Job id.
+
+        Returns
+        -------
+        bool
+            False if the job is not queued.
+        """
+        with db.session() as session:
+            job = op.claim_background_job(session, worker=self.name,
+                                          job_id=job_id)
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def recover(self) -> int:
+        """Fail the running jobs of workers of this host that stopped.
+
+        Returns
+        -------
+        int
+            Number of failed jobs.
+        """
+        if os.name != 'posix':
+            return 0
+        host = socket.gethostname()
+        num_jobs = 0
+        with db.session() as session:
+            running = op.list_background_jobs(
+                session, status=[schemas.JobStatusEnum.running],
+            )
+            for job in running:
+                worker_host, _, pid = (job.worker or '').rpartition(':')
+                if worker_host != host or not pid.isdigit() or \
+                        _pid_alive(int(pid)):
+                    continue
+                op.update_background_job(session, job_id=job.id, values={
+                    'status': schemas.JobStatusEnum.failed,
+                    'error': 'The worker of the job stopped.',
+                    'finished_on': func.now(),
+                })
+                num_jobs += 1
+        return num_jobs
+
+    def _create_executor(self):
+        if self.executor == 'process':
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process,
+                initargs=(self.config,),
+            )
+        return concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='textflow-job',
+        )
+
+    def _dispatch(self, burst=False):
+        try:
+            self.recover()
+        except Exception:
+            logger.exception('Recovering jobs failed.')
+        execute = _execute_in_process if self.executor == 'process' \
+            else self.execute
+        running = set()
+        with self._create_executor() as executor:
+            while not self._stopped.is_set():
+                running = {f for f in running if not f.done()}
+                job = None
+                if len(running) < self.max_workers:
+                    try:
+                        with db.session() as session:
+                            job = op.claim_background_job(
+                                session, worker=self.name,
+                            )
+                    except Exception:
+                        logger.exception('Claiming a job failed.')
+                if job is not None:
+                    future = executor.submit(execute, job)
+                    future.add_done_callback(lambda _: self._wake.set())
+                    running.add(future)
+                    continue
+                if burst and not running:
+                    break
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self) -> None:
+        """Run queued jobs in a background thread of this process."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._dispatch,
+                                            name='textflow-jobs',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop running jobs after the running jobs are finished.
+
+        Parameters
+        ----------
+        wait : bool
+            Wait for the running jobs.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stopped.set()
+        self._wake.set()
+        if thread is not None and wait:
+            thread.join()
+
+    def work(self, burst: bool = False) -> None:
+        """Run queued jobs in this thread (for separate worker processes).
+
+        Parameters
+        ----------
+        burst : bool
+            Return when there are no queued jobs (instead of waiting for new
+            jobs until interrupted).
+        """
+        self._stopped.clear()
+        try:
+            self._dispatch(burst=burst)
+        except KeyboardInterrupt:
+            self._stopped.set()
+
+
+jobs: JobRunner = JobRunner()
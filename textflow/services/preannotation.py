@@ -0,0 +1,178 @@
+"""Model-assisted pre-annotation.
+
+The auto-model of a task (see `textflow.services.automodel`) labels the
+documents of a project that have no completed annotation sets. Predictions
+are stored as suggestions (`textflow.models.Suggestion`), apart from the
+annotation sets of users, and are read per document with one index lookup
+(see `op.list_suggestions`).
+
+Notes
+-----
+Documents are read in keyset batches and every batch is predicted at once
+(feature extraction runs in the process pool of the auto-models). Documents
+that already have suggestions of the current model are skipped, so running
+the pipeline again only labels new documents (and documents without any
+prediction). Suggestions of older models are replaced. The pipeline runs as
+a `preannotate` background job (see `textflow.services.jobs`).
+
+Example
+-------
+>>> from textflow.services.preannotation import iter_preannotate
+>>> for num_docs in iter_preannotate(session, project_id=1, task_id=1,
+...                                  model=model):
+...     print(f'{num_docs} documents pre-annotated')
+"""
+import logging
+import typing
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from textflow.models import Document, Suggestion
+from textflow.services.automodel import AutoModel, automodels
+from textflow.services.jobs import job_type
+
+__all__ = [
+    'DEFAULT_BATCH_SIZE',
+    'iter_preannotate',
+    'preannotate',
+]
+
+logger = logging.getLogger(__name__)
+
+# number of documents predicted at once
+DEFAULT_BATCH_SIZE = 5000
+
+
+def _select_documents(project_id, task_id, snapshot, after, batch_size):
+    suggestion = Suggestion.__table__
+    document = Document.__table__
+    suggested = sa.exists().where(
+        suggestion.c.document_id == document.c.id,
+        suggestion.c.task_id == task_id,
+        suggestion.c.snapshot == snapshot,
+    )
+    return sa.select(document.c.id, document.c.text) \
+        .where(
+            document.c.project_id == project_id,
+            document.c.num_completed == 0,
+            document.c.id > after,
+            ~suggested,
+        ) \
+        .order_by(document.c.id) \
+        .limit(batch_size)
+
+
+def iter_preannotate(
+    session: Session, *, project_id: int, task_id: int, model: AutoModel,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    n_jobs: typing.Optional[int] = 1,
+) -> typing.Generator[int, None, int]:
+    """Store the predictions of a model for the unannotated documents of a
+    project.
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    task_id : int
+        Task id.
+    model : AutoModel
+        Trained model of the task.
+    batch_size : int
+        Number of documents predicted and committed at once.
+    n_jobs : typing.Optional[int]
+        Number of feature extraction processes (all CPUs if None).
+
+    Yields
+    ------
+    int
+        Number of documents pre-annotated.
+
+    Returns
+    -------
+    int
+        Number of documents pre-annotated.
+    """
+    suggestion = Suggestion.__table__
+    num_docs = 0
+    after = 0
+    while True:
+        rows = session.execute(_select_documents(
+            project_id, task_id, model.snapshot, after, batch_size,
+        )).all()
+        if not rows:
+            return num_docs
+        after = rows[-1].id
+        predictions = model.predict([row.text for row in rows],
+                                    n_jobs=n_jobs)
+        try:
+            # suggestions of older models
+            session.execute(
+                suggestion.delete().where(
+                    suggestion.c.task_id == task_id,
+                    suggestion.c.document_id.in_([row.id for row in rows]),
+                )
+            )
+            values = [
+                {
+                    'document_id': row.id,
+                    'task_id': task_id,
+                    'label_id': prediction['label_id'],
+                    'start': prediction['start'],
+                    'length': prediction['length'],
+                    'score': prediction['score'],
+                    'snapshot': model.snapshot,
+                }
+                for row, document_predictions in zip(rows, predictions)
+                for prediction in document_predictions
+            ]
+            if values:
+                session.execute(suggestion.insert(), values)
+        except Exception:
+            session.rollback()
+            raise
+        else:
+            session.commit()
+        num_docs += len(rows)
+        yield num_docs
+
+
+@job_type('preannotate')
+def preannotate(session: Session, *, project_id: int, task_id: int,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> \
+        typing.Generator[int, None, dict]:
+    """Pre-annotate the documents of a project with the latest model of a
+    task (background job).
+
+    Parameters
+    ----------
+    session : Session
+        Database session.
+    project_id : int
+        Project id.
+    task_id : int
+        Task id.
+    batch_size : int
+        Number of documents predicted at once.
+
+    Yields
+    ------
+    int
+        Number of documents pre-annotated.
+
+    Returns
+    -------
+    dict
+        `num_documents` pre-annotated and `snapshot` of the model.
+    """
+    model = automodels.get_model(project_id, task_id)
+    if model is None:
+        raise ValueError(f'Task {task_id} has no trained auto-model.')
+    num_docs = yield from iter_preannotate(
+        session, project_id=project_id, task_id=task_id, model=model,
+        batch_size=batch_size, n_jobs=automodels.n_jobs,
+    )
+    return {'num_documents': num_docs, 'snapshot': model.snapshot}
@@ -0,0 +1,469 @@
+"""Document scheduler.
+
+This module hands out documents to annotators from per-project in-memory
+queues. Every document handed out is leased to the annotator for a limited
+time so that concurrent annotators do not receive the same document more
+often than the redundancy of the project allows.
+
+Notes
+-----
+Queues are built from the document counters in the database on first use
+and are kept up to date with the changes committed through this process
+(see `textflow.database.events`). They are rebuilt when documents are
+added or removed. Projects ordered by `uncertainty` queue documents with
+the same number of completed annotation sets by descending priority (see
+`textflow.services.activelearning`).
+
+Example
+-------
+>>> from textflow.services.scheduler import scheduler
+>>> document_id = scheduler.acquire(session, project_id=1, user_id=1)
+"""
+import bisect
+import collections
+import heapq
+import threading
+import time
+import typing
+
+from sqlalchemy.orm import Session
+
+from textflow.database import events
+from textflow.models import AnnotationSet, Document, Project
+
+__all__ = [
+    'DocumentScheduler',
+    'Lease',
+    'scheduler',
+]
+
+# default time (in seconds) for which a document is reserved for a user
+DEFAULT_LEASE_TIME = 30 * 60
+
+
+class Lease(typing.NamedTuple):
+    """Reservation of a document for a user.
+
+    Attributes
+    ----------
+    document_id : int
+        Document id.
+    user_id : int
+        User id.
+    expires : float
+        Time of expiry (`time.monotonic` clock).
+    """
+    document_id: int
+    user_id: int
+    expires: float
+
+
+class _ProjectQueue(object):
+    """Queue of documents of a single project.
+
+    Documents that still need annotations are kept in order of the number of
+    completed annotation sets (descending) so that documents are finished
+    before new ones are started. Only non-zero counts are stored.
+
+    Notes
+    -----
+    Every queued document has an integer key giving its position. Documents
+    queued in front get keys below and documents queued at the back get keys
+    above all keys assigned before, so a key never changes its place among
+    the queued documents. The front keys are kept in `head` (negated and
+    ascending) and the back keys in `tail`, removed documents are skipped
+    until they reach an end or are compacted away. For every user the key
+    ranges of documents that the user already completed or skipped are kept
+    in `passed`, so that handing out a document does not read the documents
+    done by the user again.
+    """
+
+    # compact the key lists when more than half of the entries are removed
+    MIN_COMPACT = 1024
+
+    def __init__(self, project_id, redundancy, documents):
+        self.project_id = project_id
+        self.redundancy = redundancy
+        self.lock = threading.Lock()
+        # document_id -> key of queued documents
+        self.keys = {}
+        # (-key, document_id) of documents queued in front
+        self.head = []
+        # (key, document_id) of documents queued at the back
+        self.tail = []
+        self.start = 0
+        # keys of the next documents queued in front and at the back
+        self.first = -1
+        self.last = 0
+        self.removed = 0
+        self.completed = {}
+        self.leased = collections.Counter()
+        # user_id -> lease
+        self.leases = {}
+        # heap of (expires, user_id, document_id)
+        self.expiry = []
+        # user_id -> ids of documents completed or skipped by user
+        self.done = {}
+        # user_id -> sorted [low, high) key ranges of queued documents done
+        # by user
+        self.passed = {}
+        # rebuilt from the database on next use if True
+        self.stale = False
+        for document_id, num_completed in documents:
+            if num_completed:
+                self.completed[document_id] = num_completed
+            self.keys[document_id] = self.last
+            self.tail.append((self.last, document_id))
+            self.last += 1
+
+    def slots(self, document_id):
+        return self.redundancy - self.completed.get(document_id, 0) \
+            - self.leased[document_id]
+
+    def enqueue(self, document_id, left=True):
+        if document_id in self.keys or self.slots(document_id) <= 0:
+            return
+        if left:
+            key = self.first
+            self.first -= 1
+            self.head.append((-key, document_id))
+        else:
+            key = self.last
+            self.last += 1
+            self.tail.append((key, document_id))
+        self.keys[document_id] = key
+
+    def remove(self, document_id):
+        del self.keys[document_id]
+        self.removed += 1
+        head, tail = self.head, self.tail
+        while head and self.keys.get(head[-1][1]) != -head[-1][0]:
+            head.pop()
+            self.removed -= 1
+        while self.start < len(tail) and \
+                self.keys.get(tail[self.start][1]) != tail[self.start][0]:
+            self.start += 1
+            self.removed -= 1
+        if self.start >= self.MIN_COMPACT and 2 * self.start > len(tail):
+            # new lists, the old ones may be read by `entries`
+            self.tail = tail[self.start:]
+            self.start = 0
+        if self.removed >= self.MIN_COMPACT and \
+                self.removed > len(self.keys):
+            keys = self.keys
+            self.head = [(n, i) for n, i in head if keys.get(i) == -n]
+            self.tail = [(k, i) for k, i in tail[self.start:]
+                         if keys.get(i) == k]
+            self.start = 0
+            self.removed = 0
+
+    def entries(self, low=None, high=None):
+        """Queued (key, document_id) with low <= key < high in order."""
+        head, tail, keys = self.head, self.tail, self.keys
+        end = len(head) if low is None else \
+            bisect.bisect_left(head, (-low + 1,))
+        stop = 0 if high is None else bisect.bisect_left(head, (-high + 1,))
+        for i in range(end - 1, stop - 1, -1):
+            if i >= len(head):
+                # removed from the end while reading
+                continue
+            n, document_id = head[i]
+            if keys.get(document_id) == -n:
+                yield -n, document_id
+        end = len(tail) if high is None else \
+            bisect.bisect_left(tail, (high,), self.start)
+        i = self.start if low is None else \
+            bisect.bisect_left(tail, (low,), self.start)
+        while i < end:
+            key, document_id = tail[i]
+            if keys.get(document_id) == key:
+                yield key, document_id
+            i += 1
+
+    def release(self, user_id):
+        lease = self.leases.pop(user_id, None)
+        if lease is None:
+            return None
+        self.leased[lease.document_id] -= 1
+        if self.leased[lease.document_id] <= 0:
+            del self.leased[lease.document_id]
+        self.enqueue(lease.document_id)
+        return lease
+
+    def expire(self, now):
+        while self.expiry and self.expiry[0][0] <= now:
+            expires, user_id, document_id = heapq.heappop(self.expiry)
+            lease = self.leases.get(user_id)
+            if lease is not None and lease.expires == expires and \
+                    lease.document_id == document_id:
+                self.release(user_id)
+
+    def lease(self, user_id, document_id, lease_time, now):
+        lease = Lease(document_id, user_id, now + lease_time)
+        self.leases[user_id] = lease
+        self.leased[document_id] += 1
+        heapq.heappush(self.expiry, (lease.expires, user_id, document_id))
+        return lease
+
+    def acquire(self, user_id, done, lease_time, now):
+        self.expire(now)
+        lease = self.leases.get(user_id)
+        if lease is not None:
+            # extend the lease of the document that the user is working on
+            self.leases.pop(user_id)
+            self.leased[lease.document_id] -= 1
+            return self.lease(user_id, lease.document_id, lease_time, now)
+        passed = self.passed.get(user_id, [])
+        ranges = []
+        # start of the run of documents done by the user
+        run = None
+        low = None
+        for low_, high in passed + [(None, None)]:
+            for key, document_id in self.entries(low, low_):
+                if self.slots(document_id) <= 0:
+                    # re-queued when a slot becomes available
+                    self.remove(document_id)
+                elif document_id in done:
+                    if run is None:
+                        run = key
+                    continue
+                else:
+                    if run is not None:
+                        ranges.append((run, key))
+                    self.passed[user_id] = ranges + \
+                        [r for r in passed if r[0] > key]
+                    result = self.lease(user_id, document_id, lease_time,
+                                        now)
+                    if self.slots(document_id) <= 0:
+                        self.remove(document_id)
+                    return result
+            if low_ is not None and run is None:
+                run = low_
+            low = high
+        if run is not None:
+            ranges.append((run, self.last))
+        self.passed[user_id] = ranges
+        return None
+
+    def apply(self, change):
+        """Apply a committed change of an annotation set."""
+        document_id, user_id = change.document_id, change.user_id
+        was_completed = change.old_state == events.COMPLETED
+        is_completed = change.new_state == events.COMPLETED
+        done = self.done.get(user_id)
+        if change.new_state in (events.COMPLETED, events.SKIPPED):
+            if done is not None:
+                done.add(document_id)
+        elif done is not None:
+            done.discard(document_id)
+            # the document may be handed out to the user again
+            self.passed.pop(user_id, None)
+        lease = self.leases.get(user_id)
+        if lease is not None and lease.document_id == document_id and \
+                change.new_state != events.IN_PROGRESS:
+            # the lease is over, if the annotation set is completed the
+            # slot is taken by the completed annotation set
+            self.release(user_id)
+        if was_completed != is_completed:
+            count = self.completed.get(document_id, 0) + \
+                (1 if is_completed else -1)
+            if count > 0:
+                self.completed[document_id] = count
+            else:
+                self.completed.pop(document_id, None)
+            if not is_completed:
+                self.enqueue(document_id, left=True)
+
+
+class DocumentScheduler(object):
+    """Hand out documents to annotators with time limited leases.
+
+    Notes
+    -----
+    The scheduler state is kept per process. When the application runs with
+    several worker processes the leases of a process are not visible to the
+    others.
+
+    Parameters
+    ----------
+    lease_time : float
+        Time (in seconds) for which a document is reserved for a user.
+    """
+
+    def __init__(self, lease_time: float = DEFAULT_LEASE_TIME):
+        self.lease_time = lease_time
+        self._lock = threading.Lock()
+        self._projects: typing.Dict[int, _ProjectQueue] = {}
+        events.listen(events.ANNOTATION_SET_CHANGED, self._on_changes)
+        events.listen(events.DOCUMENTS_CHANGED, self._on_documents_changed)
+
+    def _build(self, session: Session, project_id: int) -> \
+            typing.Optional[_ProjectQueue]:
+        redundancy, ordering = session.query(Project.redundancy,
+                                             Project.ordering) \
+            .filter(Project.id == project_id) \
+            .one_or_none() or (None, None)
+        if redundancy is None:
+            redundancy = 1
+        order_by = [Document.num_completed.desc()]
+        if ordering == 'uncertainty':
+            order_by.append(Document.priority.desc())
+        documents = session.query(Document.id, Document.num_completed) \
+            .filter(
+                Document.project_id == project_id,
+                Document.num_completed < redundancy,
+            ) \
+            .order_by(*order_by, Document.id) \
+            .yield_per(10000)
+        return _ProjectQueue(project_id, redundancy, documents)
+
+    def _get_queue(self, session: Session, project_id: int) -> _ProjectQueue:
+        with self._lock:
+            old = self._projects.get(project_id)
+        if old is not None and not old.stale:
+            return old
+        queue = self._build(session, project_id)
+        with self._lock:
+            current = self._projects.get(project_id)
+            if current is not None and current is not old:
+                # keep the queue built by the other thread
+                return current
+            if old is not None:
+                # keep the leases of the stale queue
+                with old.lock:
+                    now = time.monotonic()
+                    for lease in old.leases.values():
+                        if lease.expires > now:
+                            queue.lease(lease.user_id, lease.document_id,
+                                        lease.expires - now, now)
+            self._projects[project_id] = queue
+            return queue
+
+    def _get_done(self, session, queue, user_id):
+        done = queue.done.get(user_id)
+        if done is not None:
+            return done
+        rows = session.query(AnnotationSet.document_id) \
+            .join(Document, Document.id == AnnotationSet.document_id) \
+            .filter(
+                Document.project_id == queue.project_id,
+                AnnotationSet.user_id == user_id,
+            ) \
+            .filter(
+                (AnnotationSet.completed.is_(True)) |
+                (AnnotationSet.skipped.is_(True))
+            )
+        done = {document_id for document_id, in rows}
+        with queue.lock:
+            return queue.done.setdefault(user_id, done)
+
+    def acquire(self, session: Session, *, project_id: int,
+                user_id: int) -> typing.Optional[int]:
+        """Lease the next document of project to user.
+
+        Notes
+        -----
+        The same document is returned (and the lease is extended) until the
+        user completes or skips the document or the lease expires.
+
+        Parameters
+        ----------
+        session : Session
+            Database session (used to build the queue).
+        project_id : int
+            Project id.
+        user_id : int
+            User id.
+
+        Returns
+        -------
+        typing.Optional[int]
+            Document id or None if there are no documents left for the user.
+        """
+        queue = self._get_queue(session, project_id)
+        done = self._get_done(session, queue, user_id)
+        with queue.lock:
+            lease = queue.acquire(user_id, done, self.lease_time,
+                                  time.monotonic())
+        if lease is None:
+            return None
+        return lease.document_id
+
+    def release(self, *, project_id: int, user_id: int) -> \
+            typing.Optional[int]:
+        """Release the lease of user so that the document can be handed out
+        to another user.
+
+        Parameters
+        ----------
+        project_id : int
+            Project id.
+        user_id : int
+            User id.
+
+        Returns
+        -------
+        typing.Optional[int]
+            Document id of the released lease.
+        """
+        with self._lock:
+            queue = self._projects.get(project_id)
+        if queue is None:
+            return None
+        with queue.lock:
+            lease = queue.release(user_id)
+        return None if lease is None else lease.document_id
+
+    def discard(self, *, project_id: int, document_id: int) -> None:
+        """Stop handing out a document (e.g., if it was deleted).
+
+        Parameters
+        ----------
+        project_id : int
+            Project id.
+        document_id : int
+            Document id.
+        """
+        with self._lock:
+            queue = self._projects.get(project_id)
+        if queue is None:
+            return
+        with queue.lock:
+            queue.completed[document_id] = queue.redundancy
+            for lease in list(queue.leases.values()):
+                if lease.document_id == document_id:
+                    queue.release(lease.user_id)
+
+    def invalidate(self, project_id: typing.Optional[int] = None) -> None:
+        """Mark the queue of project (all queues if None) to be rebuilt from
+        the database on next use. Active leases are kept.
+
+        Parameters
+        ----------
+        project_id : typing.Optional[int]
+            Project id.
+        """
+        with self._lock:
+            if project_id is None:
+                queues = list(self._projects.values())
+            else:
+                queues = [self._projects.get(project_id)]
+        for queue in queues:
+            if queue is not None:
+                queue.stale = True
+
+    def _on_changes(self, changes):
+        for change in changes:
+            with self._lock:
+                queue = self._projects.get(change.project_id)
+            if queue is None:
+                continue
+            with queue.lock:
+                queue.apply(change)
+
+    def _on_documents_changed(self, project_ids):
+        for project_id in project_ids:
+            self.invalidate(project_id)
+
+
+scheduler: DocumentScheduler = DocumentScheduler()
@@ -0,0 +1,234 @@
+"""Project statistics.
+
+This module serves project progress reports from an in-memory cache. The
+cached numbers are updated incrementally with the annotation set changes
+committed through this process (see `textflow.database.events`) instead of
+being recounted on every request.
+
+Example
+-------
+>>> from textflow.services.stats import stats
+>>> stats.get_project_report(session, project_id=1)
+{'num_documents': 10, 'num_completed': 4, 'num_remaining': 6,
+ 'progress': 40}
+"""
+import math
+import threading
+import time
+import typing
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+
+from textflow.database import events
+from textflow.models import AnnotationSet, Document, Project
+
+__all__ = [
+    'ProjectStatistics',
+    'stats',
+]
+
+# seconds cached counts are used before they are counted again (config
+# `STATS_CACHE_TTL`). changes committed in this process update the counts at
+# once, changes committed by other processes show after up to this long.
+STATS_CACHE_TTL = 5
+
+
+class _UserCounts(object):
+    def __init__(self, num_completed, num_skipped):
+        self.num_completed = num_completed
+        self.num_skipped = num_skipped
+
+
+class _ProjectCounts(object):
+    def __init__(self, redundancy, num_documents, num_completed, expires):
+        self.redundancy = redundancy
+        self.num_documents = num_documents
+        self.num_completed = num_completed
+        self.expires = expires
+        self.users: typing.Dict[int, _UserCounts] = {}
+
+
+def _make_report(num_documents, num_completed, empty_progress):
+    if num_documents == 0:
+        progress = empty_progress
+    else:
+        progress = math.floor(num_completed * 100 / num_documents)
+    return {
+        'num_documents': num_documents,
+        'num_completed': num_completed,
+        'num_remaining': num_documents - num_completed,
+        'progress': progress,
+    }
+
+
+class ProjectStatistics(object):
+    """Cache of project progress.
+
+    Notes
+    -----
+    A document is completed when the number of its completed annotation sets
+    reaches the redundancy of the project. A user is done with a document
+    when they completed or skipped it.
+
+    Parameters
+    ----------
+    ttl : float
+        Time (in seconds) after which cached counts are recounted.
+    """
+
+    def __init__(self, ttl: float = STATS_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._projects: typing.Dict[int, _ProjectCounts] = {}
+        events.listen(events.ANNOTATION_SET_CHANGED, self._on_changes)
+        events.listen(events.DOCUMENTS_CHANGED, self._on_documents_changed)
+
+    def _count_project(self, session, project_id):
+        redundancy = session.query(Project.redundancy) \
+            .filter(Project.id == project_id) \
+            .scalar()
+        if redundancy is None:
+            redundancy = 1
+        num_documents = session.query(func.count(Document.id)) \
+            .filter(Document.project_id == project_id) \
+            .scalar()
+        num_completed = session.query(func.count(Document.id)) \
+            .filter(
+                Document.project_id == project_id,
+                Document.num_completed >= redundancy,
+            ) \
+            .scalar()
+        return _ProjectCounts(redundancy, num_documents, num_completed,
+                              time.monotonic() + self.ttl)
+
+    def _count_user(self, session, project_id, user_id):
+        completed = func.sum(case(
+            (AnnotationSet.completed.is_(True), 1), else_=0,
+        ))
+        # completed annotation sets are not counted as skipped
+        skipped = func.sum(case((and_(
+            AnnotationSet.completed.is_(False),
+            AnnotationSet.skipped.is_(True),
+        ), 1), else_=0))
+        num_completed, num_skipped = session.query(completed, skipped) \
+            .join(Document, Document.id == AnnotationSet.document_id) \
+            .filter(
+                Document.project_id == project_id,
+                AnnotationSet.user_id == user_id,
+            ) \
+            .one()
+        return _UserCounts(num_completed or 0, num_skipped or 0)
+
+    def _get_counts(self, session, project_id):
+        with self._lock:
+            counts = self._projects.get(project_id)
+        if counts is not None and counts.expires > time.monotonic():
+            return counts
+        counts = self._count_project(session, project_id)
+        with self._lock:
+            self._projects[project_id] = counts
+        return counts
+
+    def get_project_report(self, session: Session, *,
+                           project_id: int) -> typing.Dict[str, int]:
+        """Get progress of project.
+
+        Parameters
+        ----------
+        session : Session
+            Database session (used on cache misses).
+        project_id : int
+            Project id.
+
+        Returns
+        -------
+        dict
+            Project progress report.
+        """
+        counts = self._get_counts(session, project_id)
+        with self._lock:
+            return _make_report(counts.num_documents, counts.num_completed,
+                                empty_progress=0)
+
+    def get_user_report(self, session: Session, *, project_id: int,
+                        user_id: int) -> typing.Dict[str, int]:
+        """Get progress of user in project.
+
+        Parameters
+        ----------
+        session : Session
+            Database session (used on cache misses).
+        project_id : int
+            Project id.
+        user_id : int
+            User id.
+
+        Returns
+        -------
+        dict
+            User progress report (skipped documents are not counted).
+        """
+        counts = self._get_counts(session, project_id)
+        with self._lock:
+            user = counts.users.get(user_id)
+        if user is None:
+            user = self._count_user(session, project_id, user_id)
+            with self._lock:
+                user = counts.users.setdefault(user_id, user)
+        with self._lock:
+            num_documents = counts.num_documents - user.num_skipped
+            return _make_report(num_documents, user.num_completed,
+                                empty_progress=100)
+
+    def invalidate(self, project_id: typing.Optional[int] = None) -> None:
+        """Drop the cached counts of project (all projects if None).
+
+        Parameters
+        ----------
+        project_id : typing.Optional[int]
+            Project id.
+        """
+        with self._lock:
+            if project_id is None:
+                self._projects.clear()
+            else:
+                self._projects.pop(project_id, None)
+
+    def _on_changes(self, changes):
+        # document_id -> (counts, change in number of completed sets,
+        #   number of completed sets after the change)
+        documents = {}
+        with self._lock:
+            for change in changes:
+                counts = self._projects.get(change.project_id)
+                if counts is None:
+                    continue
+                delta = int(change.new_state == events.COMPLETED) - \
+                    int(change.old_state == events.COMPLETED)
+                user = counts.users.get(change.user_id)
+                if user is not None:
+                    user.num_completed += delta
+                    user.num_skipped += \
+                        int(change.new_state == events.SKIPPED) - \
+                        int(change.old_state == events.SKIPPED)
+                _, total, _ = documents.get(change.document_id,
+                                            (counts, 0, None))
+                # the count after the last flush is kept
+                documents[change.document_id] = \
+                    (counts, total + delta, change.num_completed)
+            for counts, delta, after in documents.values():
+                if delta == 0 or after is None:
+                    continue
+                before = after - delta
+                if before < counts.redundancy <= after:
+                    counts.num_completed += 1
+                elif after < counts.redundancy <= before:
+                    counts.num_completed -= 1
+
+    def _on_documents_changed(self, project_ids):
+        for project_id in project_ids:
+            self.invalidate(project_id)
+
+
+stats: ProjectStatistics = ProjectStatistics()
@@ -0,0 +1,113 @@
+""" Thread-safe in-memory caches. """
+import collections
+import threading
+import time
+import typing
+
+__all__ = [
+    'TTLCache',
+]
+
+_MISSING = object()
+
+
+class TTLCache(object):
+    """Least recently used cache with per-entry time to live.
+
+    :param maxsize: maximum number of entries (least recently used entries
+        are evicted first)
+    :param ttl: time to live of entries in seconds (None to never expire)
+    """
+
+    def __init__(self, maxsize: int = 1024,
+                 ttl: typing.Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """Number of invalidations (`pop`, `discard` and `clear` calls).
+
+        Read it before loading a value and pass it to `set` so that values
+        loaded before an invalidation are not cached after it.
+
+        :return: version
+        """
+        return self._version
+
+    def get(self, key, default=None):
+        """Get value of key.
+
+        :param key: key of entry
+        :param default: value returned if the key is missing or expired
+        :return: value
+        """
+        with self._lock:
+            value, expires = self._data.get(key, (_MISSING, None))
+            if value is _MISSING:
+                return default
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, version: typing.Optional[int] = None):
+        """Set value of key.
+
+        :param key: key of entry
+        :param value: value of entry
+        :param version: version read before loading the value (the value is
+            not cached if the cache was invalidated since)
+        :return: None
+        """
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove key from cache.
+
+        :param key: key of entry
+        :param default: value returned if the key is missing
+        :return: removed value
+        """
+        with self._lock:
+            self._version += 1
+            value, _ = self._data.pop(key, (default, None))
+            return value
+
+    def discard(self, predicate: typing.Callable[[typing.Any], bool]):
+        """Remove all keys for which the predicate is true.
+
+        :param predicate: function of key
+        :return: None
+        """
+        with self._lock:
+            self._version += 1
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        """Remove all entries.
+
+        :return: None
+        """
+        with self._lock:
+            self._version += 1
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
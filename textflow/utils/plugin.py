@@ -28,7 +28,7 @@ class PluginManager:
         """
         name = 'Default' if name is None else name
         if category is not None and category in self._plugins:
-            if name in self._plugins[category]:
+            if name not in self._plugins[category]:
                 name = 'Default'
             if name in self._plugins[category]:
                 return self._plugins[category][name]
@@ -0,0 +1,78 @@
+""" Streaming readers for document files.
+
+Readers yield one `dict` per record and never load the whole file into memory
+so that they can be used to ingest very large corpora.
+"""
+import csv
+import json
+import os
+import typing
+
+__all__ = [
+    'FORMATS',
+    'read_jsonl',
+    'read_csv',
+    'read_records',
+    'guess_format',
+]
+
+FORMATS = ('jsonl', 'csv')
+
+
+def read_jsonl(fp: typing.TextIO) -> typing.Iterator[dict]:
+    """Read JSON lines from a text file object.
+
+    :param fp: text file object
+    :return: iterator of records
+    """
+    for line_no, line in enumerate(fp, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as ex:
+            raise ValueError(f'Invalid JSON at line {line_no}.') from ex
+        if not isinstance(record, dict):
+            raise ValueError(f'Expected an object at line {line_no}.')
+        yield record
+
+
+def read_csv(fp: typing.TextIO) -> typing.Iterator[dict]:
+    """Read rows of a CSV file (with header) from a text file object.
+
+    :param fp: text file object
+    :return: iterator of records
+    """
+    for record in csv.DictReader(fp):
+        yield record
+
+
+def read_records(fp: typing.TextIO, format: str) -> typing.Iterator[dict]:
+    """Read records from a text file object in the provided format.
+
+    :param fp: text file object
+    :param format: one of `FORMATS`
+    :return: iterator of records
+    """
+    if format == 'jsonl':
+        return read_jsonl(fp)
+    if format == 'csv':
+        return read_csv(fp)
+    raise ValueError(f'Unsupported format \'{format}\'.')
+
+
+def guess_format(filename: typing.Optional[str]) -> typing.Optional[str]:
+    """Guess the format of a file from its extension.
+
+    :param filename: name of file
+    :return: one of `FORMATS` or None
+    """
+    if not filename:
+        return None
+    ext = os.path.splitext(filename)[1].lower().lstrip('.')
+    if ext in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    if ext in ('csv',):
+        return 'csv'
+    return None
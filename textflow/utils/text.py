@@ -1,7 +1,322 @@
+""" Tokenization of document texts into token offsets.
+
+Tokenizers are registered in the `tokenizers` plugin manager (category
+`tokenizer`) and compile their pattern once. Token offsets are kept as two
+int32 arrays (`TokenOffsets`) instead of Python tuples and are cached per
+document and text by `TokenCache`. The packed offsets of documents can also
+be stored in the database (see `textflow.models.DocumentTokens`).
+
+Example::
+
+    >>> offsets = token_cache.get(1, 'Hello world!')
+    >>> offsets.tolist()
+    [[0, 5], [6, 11], [11, 12]]
+    >>> offsets.snap(1, 8)
+    (0, 11)
+"""
+import array
+import hashlib
 import re
+import typing
+
+import numpy as np
+
+from textflow.utils.cache import TTLCache
+from textflow.utils.plugin import PluginManager
+
+__all__ = [
+    'TokenCache',
+    'TokenOffsets',
+    'Tokenizer',
+    'WhitespaceTokenizer',
+    'get_tokenizer',
+    'pack_offsets',
+    'text_hash',
+    'token_cache',
+    'tokenizers',
+]
+
+tokenizers = PluginManager()
+
+
+def text_hash(text: str) -> bytes:
+    """Get the hash of a text (used to detect edited texts).
+
+    :param text: text
+    :return: 16 byte digest
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class TokenOffsets(object):
+    """Start and end offsets of the tokens of a text.
+
+    :param starts: start offsets of the tokens (increasing)
+    :param ends: end offsets of the tokens (increasing)
+    """
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, starts, ends):
+        self.starts = np.asarray(starts, dtype=np.int32)
+        self.ends = np.asarray(ends, dtype=np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the offset arrays in bytes.
+
+        :return: size
+        """
+        return self.starts.nbytes + self.ends.nbytes
+
+    def copy(self) -> 'TokenOffsets':
+        """Get a copy that owns its arrays (offsets of a batch are views
+        into the arrays of the whole batch).
+
+        :return: offsets
+        """
+        return TokenOffsets(self.starts.copy(), self.ends.copy())
+
+    def tolist(self) -> typing.List[typing.List[int]]:
+        """Get the offsets as a list of [start, end] pairs.
+
+        :return: offsets
+        """
+        return np.stack([self.starts, self.ends], axis=1).tolist()
+
+    def tokens(self, text: str) -> typing.List[str]:
+        """Get the tokens of the text.
+
+        :param text: tokenized text
+        :return: tokens
+        """
+        return [text[s:e] for s, e in zip(self.starts.tolist(),
+                                          self.ends.tolist())]
+
+    def snap_many(self, starts, ends) -> typing.Tuple[np.ndarray,
+                                                      np.ndarray,
+                                                      np.ndarray]:
+        """Extend spans to the boundaries of the tokens they overlap.
+
+        :param starts: start offsets of the spans
+        :param ends: end offsets of the spans
+        :return: snapped starts, snapped ends and a mask of the spans that
+            overlap a token (other spans are returned unchanged)
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        # first token ending after the start, last token starting before
+        # the end
+        first = np.searchsorted(self.ends, starts, side='right')
+        last = np.searchsorted(self.starts, ends, side='left') - 1
+        valid = first <= last
+        snapped_starts, snapped_ends = starts.copy(), ends.copy()
+        snapped_starts[valid] = self.starts[first[valid]]
+        snapped_ends[valid] = self.ends[last[valid]]
+        return snapped_starts, snapped_ends, valid
+
+    def snap(self, start: int, end: int) -> \
+            typing.Optional[typing.Tuple[int, int]]:
+        """Extend a span to the boundaries of the tokens it overlaps.
+
+        :param start: start offset of the span
+        :param end: end offset of the span
+        :return: snapped (start, end) or None if the span overlaps no token
+        """
+        starts, ends, valid = self.snap_many([start], [end])
+        if not valid[0]:
+            return None
+        return int(starts[0]), int(ends[0])
+
+    def to_bytes(self) -> bytes:
+        """Serialize the offsets (little endian int32 start, end pairs).
+
+        :return: serialized offsets
+        """
+        return np.stack([self.starts, self.ends], axis=1) \
+            .astype('<i4').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TokenOffsets':
+        """Deserialize offsets serialized with `to_bytes`.
+
+        :param data: serialized offsets
+        :return: offsets
+        """
+        pairs = np.frombuffer(data, dtype='<i4').reshape(-1, 2)
+        return cls(pairs[:, 0], pairs[:, 1])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts.tolist(), self.ends.tolist())
 
+    def __eq__(self, other):
+        if not isinstance(other, TokenOffsets):
+            return NotImplemented
+        return np.array_equal(self.starts, other.starts) and \
+            np.array_equal(self.ends, other.ends)
 
+
+@tokenizers.register('tokenizer')
 class Tokenizer:
+    """ Regular expression tokenizer: words, amounts and any other runs of
+    non-space characters. Subclasses override the compiled `pattern`. """
+    # name of the tokenizer in `tokenizers`
+    name = 'Default'
+    pattern = re.compile(r'\w+|\$[\d\.]+|\S+')
+
+    @classmethod
+    def tokenize(cls, text):
+        return [(m.start(0), m.end(0), m.group())
+                for m in cls.pattern.finditer(text)]
+
+    @classmethod
+    def offsets(cls, text: str) -> TokenOffsets:
+        """Get the token offsets of a text.
+
+        :param text: text
+        :return: token offsets
+        """
+        return cls.batch_offsets([text])[0]
+
+    @classmethod
+    def batch_offsets(cls, texts: typing.Iterable[str]) -> \
+            typing.List[TokenOffsets]:
+        """Get the token offsets of several texts.
+
+        The start and end offsets of the matches of all texts are collected
+        into one int32 buffer each (without a Python object per token) and
+        the offsets of each text are slices of the arrays of the batch.
+
+        :param texts: texts
+        :return: token offsets of each text
+        """
+        starts = array.array('i')
+        ends = array.array('i')
+        bounds = [0]
+        for text in texts:
+            matches = list(cls.pattern.finditer(text))
+            starts.extend(map(re.Match.start, matches))
+            ends.extend(map(re.Match.end, matches))
+            bounds.append(len(starts))
+        starts = np.frombuffer(starts, dtype=np.int32)
+        ends = np.frombuffer(ends, dtype=np.int32)
+        return [TokenOffsets(starts[i:j], ends[i:j])
+                for i, j in zip(bounds, bounds[1:])]
+
+
+@tokenizers.register('tokenizer', 'whitespace')
+class WhitespaceTokenizer(Tokenizer):
+    """ Runs of non-space characters. """
+    name = 'whitespace'
+    pattern = re.compile(r'\S+')
+
+
+def get_tokenizer(name: typing.Optional[str] = None) -> typing.Type[Tokenizer]:
+    """Get registered tokenizer by name.
+
+    :param name: name of tokenizer (the default tokenizer if None or not
+        registered)
+    :return: tokenizer
+    """
+    return tokenizers.get_plugin('tokenizer', name)
+
+
+def pack_offsets(texts: typing.Iterable[str],
+                 tokenizer: typing.Optional[str] = None) -> \
+        typing.List[typing.Tuple[bytes, int, bytes]]:
+    """Tokenize texts into packed offsets (for bulk storage).
+
+    :param texts: texts
+    :param tokenizer: name of tokenizer
+    :return: (text hash, number of tokens, packed offsets) of each text
+    """
+    texts = list(texts)
+    offsets = get_tokenizer(tokenizer).batch_offsets(texts)
+    return [(text_hash(text), len(o), o.to_bytes())
+            for text, o in zip(texts, offsets)]
+
+
+class TokenCache(object):
+    """Least recently used cache of token offsets of documents.
+
+    Entries are keyed by document id and a hash of the text so that edited
+    texts are tokenized again. Misses can be loaded from a persistent store
+    before they are tokenized.
+
+    :param maxsize: maximum number of documents
+    :param tokenizer: name of tokenizer
+    """
+
+    def __init__(self, maxsize: int = 4096,
+                 tokenizer: typing.Optional[str] = None):
+        self.tokenizer = get_tokenizer(tokenizer)
+        self._cache = TTLCache(maxsize=maxsize)
+
     @staticmethod
-    def tokenize(text):
-        return [(m.start(0), m.end(0), m.group()) for m in re.finditer(r'\w+|\$[\d\.]+|\S+', text)]
+    def key(document_id: int, text: str) -> typing.Tuple[int, bytes]:
+        """Get the cache key of a document.
+
+        :param document_id: document id
+        :param text: text of document
+        :return: key
+        """
+        return document_id, text_hash(text)
+
+    def get(self, document_id: int, text: str,
+            load: typing.Optional[typing.Callable] = None) -> TokenOffsets:
+        """Get the token offsets of a document (tokenized on a miss).
+
+        :param document_id: document id
+        :param text: text of document
+        :param load: see `get_many`
+        :return: token offsets
+        """
+        return self.get_many([(document_id, text)], load=load)[0]
+
+    def get_many(self, documents: typing.Iterable[typing.Tuple[int, str]],
+                 load: typing.Optional[typing.Callable] = None) -> \
+            typing.List[TokenOffsets]:
+        """Get the token offsets of several documents.
+
+        :param documents: (document id, text) pairs
+        :param load: function of a list of document ids returning stored
+            offsets as {document id: (text hash, token offsets)} (offsets of
+            other texts or documents that are not returned are tokenized)
+        :return: token offsets of each document
+        """
+        documents = list(documents)
+        keys = [self.key(document_id, text) for document_id, text in documents]
+        offsets = [self._cache.get(key) for key in keys]
+        missing = [i for i, value in enumerate(offsets) if value is None]
+        if missing and load is not None:
+            stored = load([documents[i][0] for i in missing])
+            for i in missing:
+                digest, value = stored.get(keys[i][0], (None, None))
+                if digest == keys[i][1]:
+                    self._cache.set(keys[i], value)
+                    offsets[i] = value
+            missing = [i for i in missing if offsets[i] is None]
+        computed = self.tokenizer.batch_offsets(
+            documents[i][1] for i in missing
+        )
+        for i, value in zip(missing, computed):
+            # cached offsets must not keep the arrays of the batch alive
+            value = value.copy()
+            self._cache.set(keys[i], value)
+            offsets[i] = value
+        return offsets
+
+    def clear(self):
+        """Remove all entries.
+
+        :return: None
+        """
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+
+token_cache: TokenCache = TokenCache()